@@ -0,0 +1,47 @@
+import io
+import gzip
+import numpy as np
+import wradlib as wrl
+
+import radolan_to_netcdf
+from radolan_to_netcdf import radolan_bin_decoder
+
+from . import common
+
+
+class ReadInOneBinFile(common.ThroughputBenchmark):
+    """Read and decode the gzip compressed RADOLAN binary files"""
+
+    params = ["RW", "RY", "YW"]
+    param_names = ["product_name"]
+
+    def setup(self, product_name):
+        self.fn_list = common.get_test_data_for_product(product_name)
+        self.n_timesteps = len(self.fn_list)
+        self.n_bytes = common.read_test_data(product_name)[2]
+
+    def run(self, product_name):
+        for fn in self.fn_list:
+            radolan_to_netcdf.read_in_one_bin_file(fn)
+
+
+class Decode(common.ThroughputBenchmark):
+    """Compare the decoder of this package with wradlib"""
+
+    params = (["RW", "RY", "YW"], ["radolan_bin_decoder", "wradlib"])
+    param_names = ["product_name", "decoder"]
+
+    def setup(self, product_name, decoder):
+        self.content_list = []
+        for fn in common.get_test_data_for_product(product_name):
+            with gzip.open(fn, "rb") as f:
+                self.content_list.append(f.read())
+        self.n_timesteps = len(self.content_list)
+        self.n_bytes = common.read_test_data(product_name)[2]
+
+    def run(self, product_name, decoder):
+        for content in self.content_list:
+            if decoder == "radolan_bin_decoder":
+                radolan_bin_decoder.decode_radolan_bin(content)
+            else:
+                wrl.io.read_radolan_composite(io.BytesIO(content), missing=np.nan)
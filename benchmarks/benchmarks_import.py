@@ -0,0 +1,9 @@
+class TimeImport:
+    """Time the import of the package in a fresh interpreter"""
+
+    def timeraw_import_radolan_to_netcdf(self):
+        return "import radolan_to_netcdf"
+
+    def timeraw_import_radolan_to_netcdf_without_numpy(self):
+        # The import time of the package itself, without its dependencies
+        return "import radolan_to_netcdf", "import numpy"
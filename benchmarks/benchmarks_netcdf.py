@@ -0,0 +1,241 @@
+import os
+import copy
+import time
+import shutil
+import tempfile
+import concurrent.futures
+
+import radolan_to_netcdf
+from radolan_to_netcdf.radolan_product_netcdf_config import (
+    radolan_product_netcdf_config,
+)
+
+from . import common
+
+
+def product_config_with_encoding(product_name, zlib, chunks):
+    """Product config with changed compression and chunking of all grids"""
+    product_config_dict = copy.deepcopy(radolan_product_netcdf_config[product_name])
+    n_lats = product_config_dict["metadata_fixed"]["n_lats"]
+    n_lons = product_config_dict["metadata_fixed"]["n_lons"]
+    chunksizes = {
+        "config": None,
+        "map": (1, n_lats, n_lons),
+        "tiles": (1, 100, 100),
+    }[chunks]
+    for variable_config in list(product_config_dict["variables"].values()) + list(
+        product_config_dict["metadata_per_timestamp"].values()
+    ):
+        variable_parameters = variable_config["variable_parameters"]
+        if variable_parameters["dimensions"] != ("time", "y", "x"):
+            continue
+        variable_parameters["zlib"] = zlib
+        if chunksizes is not None:
+            variable_parameters["chunksizes"] = chunksizes
+    return product_config_dict
+
+
+class CreateEmptyNetcdf:
+    params = (["RW", "RY", "YW"], [False, True])
+    param_names = ["product_name", "compress_lat_lon"]
+
+    def setup(self, product_name, compress_lat_lon):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+
+    def teardown(self, product_name, compress_lat_lon):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_create_empty_netcdf(self, product_name, compress_lat_lon):
+        radolan_to_netcdf.create_empty_netcdf(
+            self.fn, product_name=product_name, compress_lat_lon=compress_lat_lon
+        )
+
+    def track_file_size(self, product_name, compress_lat_lon):
+        radolan_to_netcdf.create_empty_netcdf(
+            self.fn, product_name=product_name, compress_lat_lon=compress_lat_lon
+        )
+        return os.path.getsize(self.fn)
+
+    track_file_size.unit = "bytes"
+
+
+class AppendToNetcdf(common.PreparedThroughputBenchmark):
+    """Append all test data of a product to a NetCDF file
+
+    "single" calls `append_to_netcdf` once per time step, "batched" appends
+    all time steps via one `RadolanNetCDFWriter`.
+    """
+
+    params = (["RW", "RY", "YW"], ["single", "batched"])
+    param_names = ["product_name", "method"]
+
+    def setup(self, product_name, method):
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.n_timesteps = len(self.data_list)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+        self.fn_empty = os.path.join(self.tmp_dir, "empty.nc")
+        radolan_to_netcdf.create_empty_netcdf(self.fn_empty, product_name=product_name)
+        self.prepare(product_name, method)
+
+    def teardown(self, product_name, method):
+        shutil.rmtree(self.tmp_dir)
+
+    def prepare(self, product_name, method):
+        # Each run appends to an empty file
+        shutil.copyfile(self.fn_empty, self.fn)
+
+    def run(self, product_name, method):
+        if method == "single":
+            for data, metadata in zip(self.data_list, self.metadata_list):
+                radolan_to_netcdf.append_to_netcdf(self.fn, data, metadata)
+        else:
+            with radolan_to_netcdf.RadolanNetCDFWriter(
+                self.fn, flush_interval=self.n_timesteps
+            ) as writer:
+                for data, metadata in zip(self.data_list, self.metadata_list):
+                    writer.append(data, metadata)
+
+
+class AppendToNetcdfEncoding(common.PreparedThroughputBenchmark):
+    """Append all test data with different compression and chunking
+
+    "config" uses the chunks of `radolan_product_netcdf_config`, "map"
+    one chunk per time step and "tiles" chunks of 100 x 100 pixels.
+    """
+
+    params = (["RW", "RY", "YW"], [True, False], ["config", "map", "tiles"])
+    param_names = ["product_name", "zlib", "chunks"]
+
+    def setup(self, product_name, zlib, chunks):
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.n_timesteps = len(self.data_list)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+        self.fn_empty = os.path.join(self.tmp_dir, "empty.nc")
+        radolan_to_netcdf.create_empty_netcdf(
+            self.fn_empty,
+            product_name=product_name,
+            product_config_dict=product_config_with_encoding(
+                product_name, zlib, chunks
+            ),
+        )
+        self.prepare(product_name, zlib, chunks)
+
+    def teardown(self, product_name, zlib, chunks):
+        shutil.rmtree(self.tmp_dir)
+
+    def prepare(self, product_name, zlib, chunks):
+        shutil.copyfile(self.fn_empty, self.fn)
+
+    def run(self, product_name, zlib, chunks):
+        radolan_to_netcdf.append_to_netcdf(self.fn, self.data_list, self.metadata_list)
+
+
+class AppendToNetcdfCompression(common.PreparedThroughputBenchmark):
+    """Append all test data with the compression profiles
+
+    Compare the throughput with `track_file_size` to choose a profile,
+    e.g. for realtime ingest or for cold storage.
+    """
+
+    params = (
+        ["RW", "RY", "YW"],
+        ["none", "fast_ingest", "default", "zstd", "archival", "blosc_lz4"],
+    )
+    param_names = ["product_name", "compression_profile"]
+
+    def setup(self, product_name, compression_profile):
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.n_timesteps = len(self.data_list)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+        self.fn_empty = os.path.join(self.tmp_dir, "empty.nc")
+        # asv skips the parameters if setup raises NotImplementedError
+        try:
+            radolan_to_netcdf.create_empty_netcdf(
+                self.fn_empty,
+                product_name=product_name,
+                compression_profile=compression_profile,
+            )
+        except ValueError as e:
+            shutil.rmtree(self.tmp_dir)
+            raise NotImplementedError(str(e))
+        self.prepare(product_name, compression_profile)
+
+    def teardown(self, product_name, compression_profile):
+        shutil.rmtree(self.tmp_dir)
+
+    def prepare(self, product_name, compression_profile):
+        shutil.copyfile(self.fn_empty, self.fn)
+
+    def run(self, product_name, compression_profile):
+        radolan_to_netcdf.append_to_netcdf(self.fn, self.data_list, self.metadata_list)
+
+    def track_file_size(self, product_name, compression_profile):
+        self.run(product_name, compression_profile)
+        return os.path.getsize(self.fn)
+
+    track_file_size.unit = "bytes"
+
+
+class AppendToNetcdfPrecompressed(common.PreparedThroughputBenchmark):
+    """Append all test data with the chunks compressed by a process pool
+
+    "netcdf4" is `RadolanNetCDFWriter`, which compresses in the writing
+    process, the numbers are the `workers` of `PrecompressedNetCDFWriter`,
+    where 0 compresses in the writing process without a pool. The pool is
+    started in `setup`, so that its start-up is not timed.
+    """
+
+    params = (["RW", "RY", "YW"], ["netcdf4", 0, 2, 4])
+    param_names = ["product_name", "writer"]
+
+    def setup(self, product_name, writer):
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.n_timesteps = len(self.data_list)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+        self.fn_empty = os.path.join(self.tmp_dir, "empty.nc")
+        radolan_to_netcdf.create_empty_netcdf(self.fn_empty, product_name=product_name)
+        self.executor = None
+        if writer not in ["netcdf4", 0]:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=writer)
+            # Start all worker processes
+            list(self.executor.map(time.sleep, [0.1] * writer))
+        self.prepare(product_name, writer)
+
+    def teardown(self, product_name, writer):
+        if self.executor is not None:
+            self.executor.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def prepare(self, product_name, writer):
+        shutil.copyfile(self.fn_empty, self.fn)
+
+    def run(self, product_name, writer):
+        from radolan_to_netcdf.direct_write import PrecompressedNetCDFWriter
+
+        if writer == "netcdf4":
+            netcdf_writer = radolan_to_netcdf.RadolanNetCDFWriter(
+                self.fn, flush_interval=self.n_timesteps
+            )
+        else:
+            netcdf_writer = PrecompressedNetCDFWriter(
+                self.fn,
+                flush_interval=self.n_timesteps,
+                workers=writer,
+                executor=self.executor,
+            )
+        with netcdf_writer:
+            for data, metadata in zip(self.data_list, self.metadata_list):
+                netcdf_writer.append(data, metadata)
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from radolan_to_netcdf import wradlib_to_radolan_bin
+
+from . import common
+
+
+class WriteToRadolanBin(common.ThroughputBenchmark):
+    """Encode and write all test data of a product to RADOLAN binary files
+
+    "single" calls `write_to_radolan_bin_file` per time step, "batch" uses
+    `write_to_radolan_bin_files`. Only RW is supported by the encoder, the
+    other products are skipped.
+    """
+
+    params = (["RW", "RY", "YW"], ["single", "batch"])
+    param_names = ["product_name", "method"]
+
+    def setup(self, product_name, method):
+        if product_name != "RW":
+            raise NotImplementedError()
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.data = np.stack(self.data_list)
+        self.n_timesteps = len(self.data_list)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn_list = [
+            os.path.join(self.tmp_dir, "%d.bin" % i) for i in range(self.n_timesteps)
+        ]
+
+    def teardown(self, product_name, method):
+        shutil.rmtree(self.tmp_dir)
+
+    def run(self, product_name, method):
+        if method == "single":
+            for fn, data, metadata in zip(
+                self.fn_list, self.data_list, self.metadata_list
+            ):
+                wradlib_to_radolan_bin.write_to_radolan_bin_file(fn, data, metadata)
+        else:
+            wradlib_to_radolan_bin.write_to_radolan_bin_files(
+                self.fn_list, self.data, self.metadata_list
+            )
+
+
+class EncodeRadolanBin(common.ThroughputBenchmark):
+    """Encode the header and data of all test data without writing to disk"""
+
+    params = ["RW", "RY", "YW"]
+    param_names = ["product_name"]
+
+    def setup(self, product_name):
+        if product_name != "RW":
+            raise NotImplementedError()
+        self.data_list, self.metadata_list, self.n_bytes = common.read_test_data(
+            product_name
+        )
+        self.n_timesteps = len(self.data_list)
+        self.buffer = np.empty(self.data_list[0].size, dtype=np.uint16)
+
+    def run(self, product_name):
+        for data, metadata in zip(self.data_list, self.metadata_list):
+            wradlib_to_radolan_bin.metadata_to_header(metadata)
+            wradlib_to_radolan_bin.data_to_byte_array(data, metadata, out=self.buffer)
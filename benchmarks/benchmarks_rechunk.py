@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import netCDF4
+
+import radolan_to_netcdf
+
+from . import common
+
+
+class ReadPixelTimeseries:
+    """Read the time series of single pixels from rechunked files"""
+
+    params = ["map", "balanced", "timeseries"]
+    param_names = ["chunk_profile"]
+
+    def setup(self, chunk_profile):
+        data_list, metadata_list, _ = common.read_test_data("RY")
+        self.tmp_dir = tempfile.mkdtemp()
+        fn = os.path.join(self.tmp_dir, "test.nc")
+        radolan_to_netcdf.create_empty_netcdf(fn, product_name="RY")
+        radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+        self.fn = os.path.join(self.tmp_dir, "test_%s.nc" % chunk_profile)
+        radolan_to_netcdf.rechunk_netcdf(fn, self.fn, chunk_profile=chunk_profile)
+
+    def teardown(self, chunk_profile):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_read_100_pixels(self, chunk_profile):
+        with netCDF4.Dataset(self.fn) as ds:
+            for i in range(100):
+                ds["rainfall_amount"][:, 100 + 7 * i, 50 + 8 * i]
+
+
+class RechunkNetcdf:
+    params = ["map", "balanced", "timeseries"]
+    param_names = ["chunk_profile"]
+
+    def setup(self, chunk_profile):
+        data_list, metadata_list, _ = common.read_test_data("RY")
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tmp_dir, "test.nc")
+        radolan_to_netcdf.create_empty_netcdf(self.fn, product_name="RY")
+        radolan_to_netcdf.append_to_netcdf(self.fn, data_list, metadata_list)
+
+    def teardown(self, chunk_profile):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_rechunk_netcdf(self, chunk_profile):
+        radolan_to_netcdf.rechunk_netcdf(
+            self.fn,
+            os.path.join(self.tmp_dir, "test_rechunked.nc"),
+            chunk_profile=chunk_profile,
+        )
@@ -0,0 +1,93 @@
+import os
+import glob
+import timeit
+
+# The test data is not installed with the package, hence it is taken from
+# the source tree of the benchmarked commit.
+test_data_path = os.path.join(
+    os.path.dirname(__file__), os.pardir, "radolan_to_netcdf", "tests", "test_data"
+)
+
+fn_patterns = {
+    "RW": "radolan_rw/raa01-rw_10000-181122*---bin.gz",
+    "YW": "radolan_yw/raa01-yw2017.002_10000*bin.gz",
+    "RY": "radolan_ry/raa01-ry_10000-2001011*-dwd---bin.gz",
+}
+
+
+def get_test_data_for_product(product_name):
+    return sorted(glob.glob(os.path.join(test_data_path, fn_patterns[product_name])))
+
+
+def read_test_data(product_name):
+    """Decode the test data of a product
+
+    Returns
+    -------
+
+    data_list, metadata_list : list
+    n_bytes : int
+        Size of the RADOLAN data as stored in the binary files, i.e.
+        2 bytes per pixel and time step. This is used as data volume for
+        all throughput benchmarks.
+
+    """
+    from radolan_to_netcdf import read_in_one_bin_file
+
+    data_list, metadata_list = [], []
+    for fn in get_test_data_for_product(product_name):
+        data, metadata = read_in_one_bin_file(fn)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    n_bytes = sum(2 * data.size for data in data_list)
+    return data_list, metadata_list, n_bytes
+
+
+class ThroughputBenchmark:
+    """Base class for benchmarks which also report the throughput
+
+    Subclasses implement `run`, which processes `n_timesteps` time steps
+    with a data volume of `n_bytes`. Both have to be set in `setup`.
+    """
+
+    # Number of runs for deriving the throughput. The best run is used.
+    throughput_repeat = 3
+
+    def run(self, *params):
+        raise NotImplementedError()
+
+    def prepare(self, *params):
+        """Prepare one call of `run`, this is not timed"""
+
+    def time_run(self, *params):
+        self.run(*params)
+
+    def _best_run_time(self, *params):
+        run_times = []
+        for _ in range(self.throughput_repeat):
+            self.prepare(*params)
+            run_times.append(timeit.timeit(lambda: self.run(*params), number=1))
+        return min(run_times)
+
+
+class PreparedThroughputBenchmark(ThroughputBenchmark):
+    """Throughput benchmark whose runs each need a fresh state
+
+    E.g. benchmarks appending to a file need an empty file for each run.
+    Subclasses implement `prepare` and call it at the end of `setup`. asv
+    calls `setup` before each repeat and a repeat is only one call of
+    `time_run`, so that `prepare` is not timed.
+    """
+
+    number = 1
+    warmup_time = 0
+
+    def track_timesteps_per_s(self, *params):
+        return self.n_timesteps / self._best_run_time(*params)
+
+    track_timesteps_per_s.unit = "timesteps/s"
+
+    def track_mb_per_s(self, *params):
+        return self.n_bytes / 1e6 / self._best_run_time(*params)
+
+    track_mb_per_s.unit = "MB/s"
@@ -7,3 +7,19 @@ __email__ = "christian.chwala@kit.edu"
 __version__ = "0.1.0"
 
 from .radolan_to_netcdf import *
+
+# The product configuration only depends on numpy and was always exported
+# at package level
+from .radolan_product_netcdf_config import radolan_product_netcdf_config
+from .parallel import convert_files
+from .rechunk import rechunk_netcdf
+from .extract import extract_points, extract_polygon_mean
+from .sync import sync_files
+from .shards import ShardedRadolanNetCDFWriter
+from .radolan_to_zarr import create_empty_zarr, append_to_zarr
+from .instrumentation import Instrumentation
+from .cache import DecodedFileCache
+from .aggregate import aggregate_files, aggregate_netcdf, RadolanAggregator
+from .archive import convert_tar_archive, read_tar_archive
+from .reader import open_radolan_netcdf
+from .direct_write import PrecompressedNetCDFWriter
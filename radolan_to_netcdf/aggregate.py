@@ -0,0 +1,467 @@
+import os
+import copy
+from datetime import datetime, timedelta
+import numpy as np
+
+from .radolan_to_netcdf import create_empty_netcdf, read_in_one_bin_file, _write_times
+from .extract import _read_in_time_blocks
+
+
+def aggregate_files(
+    fn_list,
+    fn_netcdf,
+    product_name,
+    period="hourly",
+    offset=None,
+    cache=None,
+    create_kwargs=None,
+):
+    """Aggregate RADOLAN binary files to hourly, daily or monthly sums
+
+    Each file is decoded once and added to the sums of its period, see
+    `RadolanAggregator`. The files have to be in chronological order, at
+    least the periods, e.g. via sorting the DWD filenames.
+
+    Parameters
+    ----------
+    fn_list : list of str
+        Filenames of the RADOLAN binary files
+    fn_netcdf : str
+        Filename of the NetCDF file for the sums
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RY'
+    period : str, optional
+        "hourly", "daily" or "monthly"
+    offset : datetime.timedelta, optional
+        Offset of the period boundaries, see `RadolanAggregator`
+    cache : DecodedFileCache, optional
+        Cache passed on to `read_in_one_bin_file`
+    create_kwargs : dict, optional
+        Keyword arguments passed on to `create_empty_netcdf`
+
+    """
+    with RadolanAggregator(
+        fn_netcdf,
+        product_name,
+        period=period,
+        offset=offset,
+        create_kwargs=create_kwargs,
+    ) as aggregator:
+        for fn in fn_list:
+            aggregator.add(*read_in_one_bin_file(fn, cache=cache))
+
+
+def aggregate_netcdf(
+    fn_in,
+    fn_out,
+    period="hourly",
+    offset=None,
+    t_start=None,
+    t_end=None,
+    max_memory=100e6,
+    create_kwargs=None,
+):
+    """Aggregate a NetCDF created via `create_empty_netcdf` to sums
+
+    The data is read in blocks of time chunks, so that each chunk is
+    read only once and at most about `max_memory` bytes are held in
+    memory. Empty time steps, e.g. gaps in files written via `sync_files`,
+    are skipped.
+
+    Parameters
+    ----------
+    fn_in : str
+        Filename of the NetCDF with the RADOLAN data
+    fn_out : str
+        Filename of the NetCDF file for the sums
+    period : str, optional
+        "hourly", "daily" or "monthly"
+    offset : datetime.timedelta, optional
+        Offset of the period boundaries, see `RadolanAggregator`
+    t_start, t_end : datetime.datetime, optional
+        First and last time stamp which are aggregated
+    max_memory : float, optional
+        Approximate maximum memory in bytes used for reading the data
+    create_kwargs : dict, optional
+        Keyword arguments passed on to `create_empty_netcdf`
+
+    """
+    import netCDF4
+    from .sync import _read_times
+
+    i_times, times = _read_times(fn_in)
+    is_selected = np.ones(len(times), dtype="bool")
+    if t_start is not None:
+        is_selected &= np.array([t >= t_start for t in times], dtype="bool")
+    if t_end is not None:
+        is_selected &= np.array([t <= t_end for t in times], dtype="bool")
+    times_by_index = {
+        i_time: t
+        for i_time, t, selected in zip(i_times, times, is_selected)
+        if selected
+    }
+    if not times_by_index:
+        return
+
+    with netCDF4.Dataset(fn_in, "r") as nc_fh:
+        product_name = nc_fh.producttype
+        nc_var = nc_fh["rainfall_amount"]
+        time_slice = slice(min(times_by_index), max(times_by_index) + 1)
+        with RadolanAggregator(
+            fn_out,
+            product_name,
+            period=period,
+            offset=offset,
+            create_kwargs=create_kwargs,
+        ) as aggregator:
+            for block_slice, block in _read_in_time_blocks(
+                nc_var,
+                time_slice,
+                slice(0, nc_var.shape[1]),
+                slice(0, nc_var.shape[2]),
+                max_memory=max_memory,
+            ):
+                for i, data in enumerate(block, time_slice.start + block_slice.start):
+                    if i in times_by_index:
+                        aggregator.add(
+                            data,
+                            {
+                                "producttype": product_name,
+                                "datetime": times_by_index[i],
+                            },
+                        )
+
+
+class RadolanAggregator(object):
+    """Aggregate a stream of RADOLAN time steps to sums over periods
+
+    The data of the current period is summed up in place, so that only a
+    few grids are held in memory, independent of the length of the
+    period. When a time step of the next period is added, the sums are
+    written to the NetCDF file, together with the number of time steps
+    with valid data per pixel, `valid_count`, and the number of aggregated
+    time steps, `n_time_steps`. Pixels without valid data are masked.
+
+    As for the RADOLAN products, the time stamps are the end of the
+    periods and the time stamp of a time step is the end of its interval.
+    Hence, with the 5-minute products, the hourly sum at 11:00 includes
+    the time steps from 10:05 to 11:00.
+
+    The time steps have to be added in chronological order of their
+    periods, within a period the order does not matter. When the
+    aggregator is closed, the sums of the current period are written even
+    if it is incomplete, which is indicated by `n_time_steps`. Time steps
+    of the last period of the file can be added later on, e.g. when
+    aggregating new files as they arrive. The sums of this period are then
+    read from the file and updated. Since only the time stamp of the last
+    aggregated time step, `last_time_step`, is stored, the time steps
+    added later on have to be after it.
+
+    Parameters
+    ----------
+    fn_netcdf : str
+        Filename of the NetCDF file. If it does not exist, it is created via
+        `create_empty_netcdf` with the config from
+        `get_aggregated_product_config`. Otherwise the sums are appended.
+    product_name : str
+        The two-character RADOLAN product name of the time steps, e.g. 'RY'
+    period : str, optional
+        "hourly", "daily" or "monthly"
+    offset : datetime.timedelta, optional
+        Offset of the period boundaries from full hours, days or months,
+        e.g. 50 minutes for hourly sums of RW data or 5 hours and 50
+        minutes for daily sums like the DWD daily products
+    dtype : str, optional
+        Data type of the sums in memory
+    create_kwargs : dict, optional
+        Keyword arguments passed on to `create_empty_netcdf`
+
+    Examples
+    --------
+    >>> with RadolanAggregator(fn_netcdf, "RY", period="daily") as aggregator:
+    ...     for fn in fn_list:
+    ...         aggregator.add(*read_in_one_bin_file(fn))
+
+    """
+
+    def __init__(
+        self,
+        fn_netcdf,
+        product_name,
+        period="hourly",
+        offset=None,
+        dtype="f4",
+        create_kwargs=None,
+    ):
+        from .radolan_product_netcdf_config import (
+            radolan_product_netcdf_config,
+            aggregation_periods,
+        )
+
+        if period not in aggregation_periods:
+            raise ValueError(
+                "`period` has to be one of %s" % list(aggregation_periods.keys())
+            )
+        self.fn_netcdf = fn_netcdf
+        self.product_name = product_name
+        self.period = period
+        self.offset = offset or timedelta(0)
+        self.dtype = dtype
+        self.create_kwargs = create_kwargs or {}
+        self.interval = timedelta(
+            seconds=radolan_product_netcdf_config[product_name]["metadata_fixed"][
+                "interval_seconds"
+            ]
+        )
+        self.period_start = None
+        self.period_end = None
+        self._datetimes = set()
+        self._last_period_end = None
+        self._i_time = None
+        self._n_previous_time_steps = 0
+        self._previous_last_time_step = None
+        self._sum = None
+        self._valid_count = None
+        self._is_valid = None
+        self._nc_fh = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        import netCDF4
+        from .sync import _read_times
+
+        if not os.path.exists(self.fn_netcdf):
+            create_empty_netcdf(
+                self.fn_netcdf,
+                product_name="%s_%s" % (self.product_name, self.period),
+                product_config_dict=get_aggregated_product_config(
+                    self.product_name, self.period
+                ),
+                flag_encoding="none",
+                **self.create_kwargs
+            )
+        else:
+            times = _read_times(self.fn_netcdf)[1]
+            if times:
+                self._last_period_end = times[-1]
+        self._nc_fh = netCDF4.Dataset(self.fn_netcdf, "a")
+
+    def close(self):
+        """Write the sums of the current, possibly incomplete, period"""
+        if self._nc_fh is not None:
+            if self.period_end is not None:
+                self._write_period()
+            self._nc_fh.close()
+            self._nc_fh = None
+
+    def add(self, data, metadata):
+        """Add one time step to the sums of its period
+
+        Parameters
+        ----------
+        data : np.ndarray
+            RADOLAN data with NaN for missing values
+        metadata : dict
+            RADOLAN metadata, only `producttype` and `datetime` are used
+
+        """
+        if metadata["producttype"] != self.product_name:
+            raise ValueError(
+                "RADOLAN product of data is `%s` and not `%s`"
+                % (metadata["producttype"], self.product_name)
+            )
+        t = metadata["datetime"]
+        period_start, period_end = get_period_bounds(
+            t - self.interval, self.period, self.offset
+        )
+        if self.period_end is not None and period_end != self.period_end:
+            if period_end < self.period_end:
+                raise ValueError(
+                    "Time stamp `%s` is before the current period ending at `%s`"
+                    % (t, self.period_end)
+                )
+            self._write_period()
+        if self.period_end is None:
+            if self._last_period_end is not None and period_end < (
+                self._last_period_end
+            ):
+                raise ValueError(
+                    "Time stamp `%s` is in a period which was already written" % t
+                )
+            self._start_period(period_start, period_end, data.shape)
+            if period_end == self._last_period_end:
+                self._reopen_last_period(t)
+        if t in self._datetimes:
+            raise ValueError("Time stamp `%s` was already added" % t)
+        if (
+            self._previous_last_time_step is not None
+            and t <= self._previous_last_time_step
+        ):
+            raise ValueError(
+                "Time stamp `%s` is not after the last time step `%s` which was "
+                "already aggregated" % (t, self._previous_last_time_step)
+            )
+        if self._n_previous_time_steps + len(self._datetimes) >= (
+            self._get_n_expected_time_steps()
+        ):
+            raise ValueError(
+                "Time stamp `%s` is in a period which is already complete" % t
+            )
+        self._datetimes.add(t)
+
+        np.isnan(data, out=self._is_valid)
+        np.logical_not(self._is_valid, out=self._is_valid)
+        np.add(self._sum, data, out=self._sum, where=self._is_valid, casting="unsafe")
+        np.add(self._valid_count, self._is_valid, out=self._valid_count)
+
+    def _start_period(self, period_start, period_end, shape):
+        if self._sum is None or self._sum.shape != shape:
+            self._sum = np.zeros(shape, dtype=self.dtype)
+            self._valid_count = np.zeros(shape, dtype="i4")
+            self._is_valid = np.zeros(shape, dtype="bool")
+        else:
+            self._sum.fill(0)
+            self._valid_count.fill(0)
+        self.period_start, self.period_end = period_start, period_end
+        self._datetimes = set()
+        self._i_time = None
+        self._n_previous_time_steps = 0
+        self._previous_last_time_step = None
+
+    def _reopen_last_period(self, t):
+        """Continue the sums of the last period of the file"""
+        nc_fh = self._nc_fh
+        i_time = nc_fh.dimensions["time"].size - 1
+        n_previous_time_steps = int(nc_fh["n_time_steps"][i_time])
+        if n_previous_time_steps >= self._get_n_expected_time_steps():
+            self.period_start, self.period_end = None, None
+            raise ValueError(
+                "Time stamp `%s` is in a period which was already written" % t
+            )
+        self._sum[:] = nc_fh["rainfall_amount"][i_time, :, :].filled(0)
+        self._valid_count[:] = nc_fh["valid_count"][i_time, :, :].filled(0)
+        self._i_time = i_time
+        self._n_previous_time_steps = n_previous_time_steps
+        self._previous_last_time_step = _read_time(nc_fh["last_time_step"], i_time)
+
+    def _get_n_expected_time_steps(self):
+        return (self.period_end - self.period_start) // self.interval
+
+    def _write_period(self):
+        import netCDF4
+
+        nc_fh = self._nc_fh
+        i_time = self._i_time
+        if i_time is None:
+            i_time = nc_fh.dimensions["time"].size
+            _write_times(nc_fh, [i_time], [self.period_end])
+
+        nc_var = nc_fh["rainfall_amount"]
+        fill_value = getattr(
+            nc_var, "_FillValue", netCDF4.default_fillvals[nc_var.dtype.str[1:]]
+        )
+        np.equal(self._valid_count, 0, out=self._is_valid)
+        np.copyto(self._sum, fill_value, where=self._is_valid, casting="unsafe")
+        nc_var[i_time, :, :] = self._sum
+        nc_fh["valid_count"][i_time, :, :] = self._valid_count
+        nc_fh["n_time_steps"][i_time] = self._n_previous_time_steps + len(
+            self._datetimes
+        )
+        nc_fh["n_expected_time_steps"][i_time] = self._get_n_expected_time_steps()
+        last_time_step = max(
+            (self._datetimes | {self._previous_last_time_step}) - {None}
+        )
+        _write_times(nc_fh, [i_time], [last_time_step], name="last_time_step")
+        nc_fh.sync()
+
+        self._last_period_end = self.period_end
+        self.period_start, self.period_end = None, None
+        self._i_time = None
+        self._n_previous_time_steps = 0
+        self._previous_last_time_step = None
+
+
+def _read_time(nc_var, i_time):
+    import netCDF4
+
+    return netCDF4.num2date(
+        nc_var[i_time],
+        nc_var.units,
+        nc_var.calendar,
+        only_use_cftime_datetimes=False,
+        only_use_python_datetimes=True,
+    )
+
+
+def get_period_bounds(t, period, offset=timedelta(0)):
+    """Get the start and end of the period which contains `t`
+
+    Parameters
+    ----------
+    t : datetime.datetime
+    period : str
+        "hourly", "daily" or "monthly"
+    offset : datetime.timedelta, optional
+        Offset of the period boundaries from full hours, days or months
+
+    Returns
+    -------
+
+    period_start, period_end : datetime.datetime
+
+    """
+    t = t - offset
+    if period == "hourly":
+        period_start = t.replace(minute=0, second=0, microsecond=0)
+        period_end = period_start + timedelta(hours=1)
+    elif period == "daily":
+        period_start = t.replace(hour=0, minute=0, second=0, microsecond=0)
+        period_end = period_start + timedelta(days=1)
+    elif period == "monthly":
+        period_start = datetime(t.year, t.month, 1)
+        period_end = datetime(t.year + t.month // 12, t.month % 12 + 1, 1)
+    else:
+        raise ValueError("Unknown period `%s`" % period)
+    return period_start + offset, period_end + offset
+
+
+def get_aggregated_product_config(product_name, period):
+    """Get the config for `create_empty_netcdf` of the sums of a product
+
+    The grid and the chunks are the same as for the product, the variables
+    are defined in `aggregated_variables`.
+    """
+    from .radolan_product_netcdf_config import (
+        radolan_product_netcdf_config,
+        aggregated_variables,
+        aggregated_metadata_per_timestamp,
+        aggregation_periods,
+    )
+
+    product_config_dict = radolan_product_netcdf_config[product_name]
+    chunksizes = product_config_dict["variables"]["rainfall_amount"][
+        "variable_parameters"
+    ].get("chunksizes")
+
+    variables = copy.deepcopy(aggregated_variables)
+    for variable_config in variables.values():
+        if chunksizes is not None:
+            variable_config["variable_parameters"]["chunksizes"] = chunksizes
+    variables["rainfall_amount"]["attributes"]["long_name"] = "%s rainfall sum" % (
+        period.capitalize()
+    )
+
+    return {
+        "variables": variables,
+        "metadata_per_timestamp": aggregated_metadata_per_timestamp,
+        "metadata_fixed": dict(
+            product_config_dict["metadata_fixed"],
+            interval_seconds=aggregation_periods[period],
+        ),
+    }
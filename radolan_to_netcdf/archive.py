@@ -0,0 +1,167 @@
+import io
+import os
+import gzip
+import fnmatch
+import tarfile
+import concurrent.futures
+
+from .utils import ordered_bounded_map
+from .parallel import append_in_chronological_order
+from .radolan_to_netcdf import (
+    create_empty_netcdf,
+    read_in_one_bin_file,
+    RadolanNetCDFWriter,
+)
+
+# Suffixes of tar archives which are contained in other archives, e.g. the
+# daily archives in the monthly archives of the DWD
+tar_suffixes = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def convert_tar_archive(
+    fn_tar,
+    fn_netcdf,
+    product_name,
+    pattern="*",
+    workers=None,
+    max_queue_size=None,
+    batch_size=12,
+):
+    """Convert the RADOLAN binary files in tar archives to NetCDF
+
+    The archives are read as stream and the files are decompressed in
+    memory, so that they do not have to be extracted to disk. The files
+    are decoded by `workers` processes as in `convert_files`.
+
+    Parameters
+    ----------
+    fn_tar : str or file-like or list
+        Filename of a tar archive, which can be compressed, a file-like
+        object of it or a list of them in chronological order
+    fn_netcdf : str
+        Filename of the NetCDF file. It is created via `create_empty_netcdf`
+        if it does not exist yet.
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RW'
+    pattern : str, optional
+        Only members whose basename matches this `fnmatch` pattern are read
+    workers : int, optional
+        Number of decoding processes. Defaults to `os.cpu_count()`.
+    max_queue_size : int, optional
+        Maximum number of files held in memory. Defaults to twice the
+        number of workers plus `batch_size`.
+    batch_size : int, optional
+        Number of time steps appended to the NetCDF in one go
+
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_queue_size is None:
+        max_queue_size = 2 * workers + batch_size
+
+    if not os.path.exists(fn_netcdf):
+        create_empty_netcdf(fn_netcdf, product_name=product_name)
+
+    with RadolanNetCDFWriter(fn_netcdf, flush_interval=batch_size) as writer:
+        append_in_chronological_order(
+            writer,
+            read_tar_archive(
+                fn_tar, pattern=pattern, workers=workers, max_in_flight=max_queue_size
+            ),
+        )
+
+
+def read_tar_archive(fn_tar, pattern="*", workers=0, max_in_flight=None):
+    """Read the RADOLAN binary files in tar archives one after another
+
+    The members are read in the order in which they are stored, also from
+    tar archives contained in the archive. Members ending with `.gz` are
+    decompressed in memory.
+
+    Parameters
+    ----------
+    fn_tar : str or file-like or list
+        Filename of a tar archive, which can be compressed, a file-like
+        object of it or a list of them
+    pattern : str, optional
+        Only members whose basename matches this `fnmatch` pattern are read
+    workers : int, optional
+        Number of decoding processes. With 0, the default, the files are
+        decoded in the calling process.
+    max_in_flight : int, optional
+        Maximum number of files held in memory when using `workers`.
+        Defaults to twice the number of workers.
+
+    Yields
+    ------
+    data : np.ndarray
+    metadata : dict
+        As returned by `read_in_one_bin_file`
+
+    """
+    members = iter_tar_members(fn_tar, pattern=pattern)
+    if not workers:
+        for member in members:
+            yield read_tar_member(member)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for data, metadata in ordered_bounded_map(
+            executor, read_tar_member, members, max_in_flight=max_in_flight
+        ):
+            yield data, metadata
+
+
+def iter_tar_members(fn_tar, pattern="*"):
+    """Iterate over the files in tar archives in the order they are stored
+
+    Parameters
+    ----------
+    fn_tar : str or file-like or list
+        Filename of a tar archive, which can be compressed, a file-like
+        object of it or a list of them
+    pattern : str, optional
+        Only members whose basename matches this `fnmatch` pattern are read.
+        Contained tar archives are always read.
+
+    Yields
+    ------
+    name : str
+        Name of the member, prefixed by the names of the contained archives
+    content : bytes
+        The content of the member as stored in the archive
+
+    """
+    if isinstance(fn_tar, (list, tuple)):
+        for fn in fn_tar:
+            for member in iter_tar_members(fn, pattern=pattern):
+                yield member
+        return
+
+    if isinstance(fn_tar, str):
+        tar_fh = tarfile.open(fn_tar, mode="r|*")
+    else:
+        tar_fh = tarfile.open(fileobj=fn_tar, mode="r|*")
+    with tar_fh:
+        for tar_info in tar_fh:
+            if not tar_info.isfile():
+                continue
+            if tar_info.name.endswith(tar_suffixes):
+                # Contained archives are streamed from the outer stream,
+                # hence they are not read into memory
+                for name, content in iter_tar_members(
+                    tar_fh.extractfile(tar_info), pattern=pattern
+                ):
+                    yield tar_info.name + "/" + name, content
+            elif fnmatch.fnmatch(os.path.basename(tar_info.name), pattern):
+                yield tar_info.name, tar_fh.extractfile(tar_info).read()
+
+
+def read_tar_member(member):
+    """Decode a member of a tar archive as returned by `iter_tar_members`"""
+    name, content = member
+    if name.endswith(".gz"):
+        content = gzip.decompress(content)
+    return read_in_one_bin_file(io.BytesIO(content))
@@ -0,0 +1,213 @@
+import os
+import json
+import hashlib
+import datetime
+import threading
+import collections
+import numpy as np
+
+from .utils import save_atomic
+
+
+class DecodedFileCache(object):
+    """Cache of decoded RADOLAN files for `read_in_one_bin_file`
+
+    Decoded files are kept in memory in a least recently used (LRU) cache
+    which is bounded by the size of the arrays. If `cache_dir` is supplied,
+    they are also stored there as `.npy` files and a JSON file of the
+    remaining metadata, which are memory-mapped when read again, also by
+    other processes. The files are identified by their absolute path,
+    modification time and size, hence changed files are decoded again.
+    Entries of changed files are not removed from `cache_dir`, use
+    `clear` for that.
+
+    The arrays returned from the cache are read-only, since they are
+    shared by all readers of the same file. The arrays passed to `put`
+    are made read-only, too, so that they cannot change the cached data.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum size of the arrays kept in memory
+    cache_dir : str, optional
+        Directory for caching the decoded files on disk
+    mmap : bool, optional
+        Memory-map the arrays from `cache_dir` instead of reading them
+
+    Examples
+    --------
+    >>> cache = DecodedFileCache(max_bytes=2e9, cache_dir="/tmp/radolan_cache")
+    >>> data, metadata = read_in_one_bin_file(fn, cache=cache)
+
+    """
+
+    def __init__(self, max_bytes=1e9, cache_dir=None, mmap=True):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self.current_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_key(self, fn):
+        """Get the key of a file from its path, modification time and size"""
+        stat = os.stat(fn)
+        return (os.path.abspath(fn), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key):
+        """Get the decoded data and metadata or None if not cached
+
+        Returns
+        -------
+
+        data : np.ndarray
+        metadata : dict
+            A copy of the cached metadata, so that it can be modified
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        if entry is None and self.cache_dir is not None:
+            entry = self._load(key)
+            if entry is not None:
+                self.stats["disk_hits"] += 1
+                self._add(key, entry)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        data, metadata = entry
+        return data, dict(metadata)
+
+    def put(self, key, data, metadata):
+        """Add decoded data and metadata to the cache
+
+        The arrays are made read-only. If `cache_dir` is set, they are
+        also written to disk, unless the metadata contains values which
+        cannot be stored as JSON. Failing to write them to disk, e.g.
+        since the disk is full, is not an error.
+        """
+        metadata = dict(metadata)
+        for array in [data] + _get_arrays(metadata):
+            array.flags.writeable = False
+        entry = (data, metadata)
+        self._add(key, entry)
+        if self.cache_dir is not None:
+            self._save(key, entry)
+
+    def clear(self):
+        """Remove all entries from memory and from `cache_dir`"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+        if self.cache_dir is not None and os.path.exists(self.cache_dir):
+            for fn in os.listdir(self.cache_dir):
+                if fn.endswith((".npy", ".json", ".tmp")):
+                    os.remove(os.path.join(self.cache_dir, fn))
+
+    def _add(self, key, entry):
+        nbytes = _get_nbytes(entry)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted_entry = self._entries.popitem(last=False)
+                self.current_bytes -= _get_nbytes(evicted_entry)
+
+    def _get_fn_base(self, key):
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(repr(key).encode()).hexdigest()
+        )
+
+    def _save(self, key, entry):
+        data, metadata = entry
+        fn_base = self._get_fn_base(key)
+        try:
+            encoded_metadata = _encode_metadata(metadata)
+        except TypeError:
+            return
+        arrays = {"data": data}
+        arrays.update(
+            (name, value)
+            for name, value in metadata.items()
+            if isinstance(value, np.ndarray)
+        )
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for name, array in arrays.items():
+                save_atomic(
+                    fn_base + "." + name + ".npy", lambda fh: np.save(fh, array)
+                )
+            # The JSON file is written last, since it marks a complete entry
+            save_atomic(
+                fn_base + ".json",
+                lambda fh: fh.write(json.dumps(encoded_metadata).encode()),
+            )
+        except OSError:
+            pass
+
+    def _load(self, key):
+        fn_base = self._get_fn_base(key)
+        try:
+            with open(fn_base + ".json", "r") as fh:
+                encoded_metadata = json.load(fh)
+        except FileNotFoundError:
+            return None
+        mmap_mode = "r" if self.mmap else None
+
+        def load_array(name):
+            array = np.load(fn_base + "." + name + ".npy", mmap_mode=mmap_mode)
+            array.flags.writeable = False
+            return array
+
+        # The arrays can have been removed by `clear` of another process
+        # after the JSON file was read
+        try:
+            return load_array("data"), _decode_metadata(encoded_metadata, load_array)
+        except (OSError, ValueError):
+            return None
+
+
+def _get_arrays(metadata):
+    return [value for value in metadata.values() if isinstance(value, np.ndarray)]
+
+
+def _get_nbytes(entry):
+    data, metadata = entry
+    return data.nbytes + sum(array.nbytes for array in _get_arrays(metadata))
+
+
+def _encode_metadata(metadata):
+    """Encode metadata as JSON compatible dict, arrays are stored separately"""
+    encoded = {}
+    for name, value in metadata.items():
+        if isinstance(value, np.ndarray):
+            value = {"__ndarray__": name}
+        elif isinstance(value, datetime.datetime):
+            value = {"__datetime__": value.isoformat()}
+        elif isinstance(value, np.generic):
+            value = value.item()
+        elif not isinstance(value, (str, int, float, list, type(None))):
+            raise TypeError(
+                "Metadata `%s` of type %s cannot be cached" % (name, type(value))
+            )
+        encoded[name] = value
+    return encoded
+
+
+def _decode_metadata(encoded, load_array):
+    metadata = {}
+    for name, value in encoded.items():
+        if isinstance(value, dict) and "__ndarray__" in value:
+            value = load_array(value["__ndarray__"])
+        elif isinstance(value, dict) and "__datetime__" in value:
+            value = datetime.datetime.fromisoformat(value["__datetime__"])
+        metadata[name] = value
+    return metadata
@@ -0,0 +1,85 @@
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="radolan-to-netcdf",
+        description="Convert RADOLAN binary files to NetCDF",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    watch = subparsers.add_parser(
+        "watch",
+        help="Ingest new RADOLAN files arriving in a directory",
+        description="Watch a directory and append new RADOLAN files to a "
+        "NetCDF until stopped via SIGINT or SIGTERM",
+    )
+    watch.add_argument("directory", help="Directory to watch")
+    watch.add_argument("target", help="NetCDF file, which is created if needed")
+    watch.add_argument("--product", required=True, help="RADOLAN product name, e.g. RY")
+    watch.add_argument(
+        "--pattern", default="*", help="Only ingest files matching this pattern"
+    )
+    watch.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between two polls of the directory (default: 1)",
+    )
+    watch.add_argument(
+        "--workers", type=int, default=1, help="Number of decoding processes"
+    )
+    watch.add_argument(
+        "--index",
+        help="JSON index of the ingested files (default: <target>.index.json)",
+    )
+    watch.add_argument(
+        "--metrics-file", help="JSON file to which the ingest metrics are written"
+    )
+    watch.add_argument("--log-level", default="INFO")
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(name)s %(levelname)s %(message)s",
+    )
+    if args.command == "watch":
+        asyncio.run(_watch(args))
+    return 0
+
+
+async def _watch(args):
+    from .watch import watch_directory
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop_event.set)
+        except NotImplementedError:
+            # Not available on Windows, where Ctrl+C raises KeyboardInterrupt
+            pass
+
+    await watch_directory(
+        args.directory,
+        args.target,
+        args.product,
+        pattern=args.pattern,
+        poll_interval=args.poll_interval,
+        workers=args.workers,
+        fn_index=args.index,
+        fn_metrics=args.metrics_file,
+        stop_event=stop_event,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import os
+import zlib
+import concurrent.futures
+import numpy as np
+
+from .instrumentation import stage as _stage
+from .radolan_to_netcdf import (
+    RadolanNetCDFWriter,
+    get_consecutive_runs,
+    get_flag_grids,
+    pack_data,
+    _get_buffer,
+    _write_flags,
+    _write_metadata,
+)
+
+# Ids of the HDF5 filters which can be applied by `compress_chunk`
+hdf5_filter_ids = {
+    "deflate": 1,
+    "shuffle": 2,
+}
+
+
+class PrecompressedNetCDFWriter(RadolanNetCDFWriter):
+    """Append RADOLAN data with the chunks compressed by a process pool
+
+    With `RadolanNetCDFWriter`, the HDF5 library compresses all chunks in
+    the writing process, which takes most of the time of writing. This
+    writer packs the data and the pixel flag grids, compresses their
+    chunks in `workers` processes and writes the compressed chunks via the
+    direct chunk write of HDF5 using `h5py`, which bypasses the filter
+    pipeline. The chunks are compressed with the filters of the variables
+    as stored in the file, i.e. the shuffle and deflate settings of the
+    product config or of the `compression_profile` used in
+    `create_empty_netcdf`. Time, maxrange, radar locations and ragged
+    flags are written via netCDF4 as by `RadolanNetCDFWriter`, hence the
+    result is the same NetCDF4 file.
+
+    Since the HDF5 file cannot be opened by netCDF4 and h5py at the same
+    time, the file is only opened while the buffered time steps are
+    flushed. Use a larger `flush_interval` than for `RadolanNetCDFWriter`
+    to make up for this.
+
+    Only (time, y, x) variables with one time step per chunk and without
+    other filters than shuffle and deflate are supported. Requires `h5py`.
+
+    Parameters
+    ----------
+    fn : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    flush_interval : int, optional
+        Number of buffered time steps after which they are written to
+        the NetCDF file
+    time_axis : tuple, optional
+        Start and interval of a regular time axis, see `RadolanNetCDFWriter`
+    workers : int, optional
+        Number of compressing processes. Defaults to `os.cpu_count()`.
+        With 0, the chunks are compressed in the calling process.
+    executor : concurrent.futures.Executor, optional
+        Executor used for compressing instead of creating a process pool,
+        e.g. the one which decodes the files in `convert_files`
+
+    Examples
+    --------
+    >>> with PrecompressedNetCDFWriter(fn_netcdf, workers=4) as writer:
+    ...     for fn in fn_list:
+    ...         writer.append(*read_in_one_bin_file(fn))
+
+    """
+
+    def __init__(
+        self, fn, flush_interval=48, time_axis=None, workers=None, executor=None
+    ):
+        super(PrecompressedNetCDFWriter, self).__init__(
+            fn, flush_interval=flush_interval, time_axis=time_axis
+        )
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunk_layouts = None
+        self._executor = executor
+        self._owns_executor = False
+        self._is_open = False
+
+    def open(self):
+        import h5py
+        from .radolan_product_netcdf_config import (
+            radolan_product_netcdf_config,
+            flag_encodings,
+        )
+
+        super(PrecompressedNetCDFWriter, self).open()
+        self._nc_fh.close()
+        self._nc_fh = None
+
+        self._product_config_dict = radolan_product_netcdf_config[self.producttype]
+        variable_names = list(self._product_config_dict["variables"].keys())
+        if len(variable_names) != 1:
+            raise NotImplementedError(
+                "Writting the actual RADOLAN data "
+                "to NetCDF is only supported for "
+                "one `variable`."
+            )
+        self._variable_name = variable_names[0]
+        self._flag_variable_names = [
+            name
+            for name, variable_config in flag_encodings[self.flag_encoding][
+                "variables"
+            ].items()
+            if variable_config["variable_parameters"]["dimensions"]
+            == ("time", "y", "x")
+        ]
+        with h5py.File(self.fn, "r") as h5_fh:
+            self.chunk_layouts = {
+                name: get_chunk_layout(h5_fh[name])
+                for name in [self._variable_name] + self._flag_variable_names
+            }
+
+        if self._executor is None and self.workers:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers
+            )
+            self._owns_executor = True
+        self._is_open = True
+
+    def close(self, flush=True):
+        if not self._is_open:
+            return
+        try:
+            if flush:
+                self.flush()
+        finally:
+            self._discard_buffer()
+            self._is_open = False
+            if self._owns_executor:
+                self._executor.shutdown()
+                self._executor = None
+                self._owns_executor = False
+
+    def flush(self):
+        """Write all buffered time steps to the NetCDF file
+
+        The chunks of the grids are compressed and written via h5py first,
+        then the remaining variables are written via netCDF4.
+        """
+        import h5py
+        import netCDF4
+
+        if not self._data_buffer:
+            return
+        compressed = self._compress_buffer()
+
+        i_end = max(self._index_buffer) + 1
+        with _stage("write_data", n_time=len(compressed)) as s:
+            with h5py.File(self.fn, "r+") as h5_fh:
+                for name in self.chunk_layouts:
+                    if h5_fh[name].shape[0] < i_end:
+                        h5_fh[name].resize(i_end, axis=0)
+                for i_time, chunks_per_variable in compressed:
+                    for name, chunks in chunks_per_variable.items():
+                        dataset_id = h5_fh[name].id
+                        for offset, chunk in chunks:
+                            dataset_id.write_direct_chunk((i_time,) + offset, chunk)
+                            s.bytes_in += len(chunk)
+
+        self._nc_fh = netCDF4.Dataset(self.fn, "a")
+        try:
+            super(PrecompressedNetCDFWriter, self).flush()
+        finally:
+            self._nc_fh.close()
+            self._nc_fh = None
+
+    def _compress_buffer(self):
+        """Pack the buffered time steps and compress the chunks of their grids
+
+        Returns
+        -------
+
+        compressed : list of tuple
+            Time index and the compressed chunks of each variable as
+            returned by `compress_grid`
+
+        """
+        variable_config = self._product_config_dict["variables"][self._variable_name]
+        layout = self.chunk_layouts[self._variable_name]
+        pending = []
+        for i_start, run in get_consecutive_runs(self._index_buffer):
+            for i, position in enumerate(run):
+                data = self._data_buffer[position]
+                with _stage("pack", n_time=1, bytes_in=data.nbytes) as s:
+                    grids = {
+                        self._variable_name: pack_data(
+                            data,
+                            variable_config,
+                            out=np.empty(data.shape, dtype=layout["dtype"]),
+                            float_buffer=_get_buffer(
+                                self._packing_buffers, "float_buffer", data.shape, "f8"
+                            ),
+                        )
+                    }
+                    if self._flag_variable_names:
+                        flag_grids = get_flag_grids(
+                            self.flag_encoding,
+                            (1,) + data.shape,
+                            [self._metadata_buffer[position]],
+                        )
+                        for name in self._flag_variable_names:
+                            grids[name] = flag_grids[name][0].astype(
+                                self.chunk_layouts[name]["dtype"]
+                            )
+                    s.bytes_out = sum(grid.nbytes for grid in grids.values())
+                pending.append(
+                    (
+                        i_start + i,
+                        {
+                            name: self._submit(grid, self.chunk_layouts[name])
+                            for name, grid in grids.items()
+                        },
+                    )
+                )
+
+        with _stage("compress", n_time=len(pending)) as s:
+            compressed = []
+            for i_time, futures in pending:
+                chunks_per_variable = {
+                    name: future.result() if self._executor else future
+                    for name, future in futures.items()
+                }
+                s.bytes_out += sum(
+                    len(chunk)
+                    for chunks in chunks_per_variable.values()
+                    for _, chunk in chunks
+                )
+                compressed.append((i_time, chunks_per_variable))
+        return compressed
+
+    def _submit(self, grid, layout):
+        args = (grid, layout["chunks"][1:], layout["fill_value"], layout["filters"])
+        if self._executor is None:
+            return compress_grid(*args)
+        return self._executor.submit(compress_grid, *args)
+
+    def _write_run(self, i_start, data_list, metadata_list):
+        """Write the variables which are not written as compressed chunks"""
+        if self.flag_encoding == "ragged":
+            with _stage("flags", n_time=len(metadata_list)):
+                _write_flags(
+                    self._nc_fh,
+                    i_start,
+                    (len(data_list),) + data_list[0].shape,
+                    metadata_list,
+                )
+        _write_metadata(self._nc_fh, i_start, metadata_list)
+
+
+def get_chunk_layout(dataset):
+    """Get the chunks, data type and filters of a (time, y, x) HDF5 dataset
+
+    Parameters
+    ----------
+    dataset : h5py.Dataset
+
+    Returns
+    -------
+
+    layout : dict
+        `chunks`, `dtype`, `fill_value` and `filters`, the latter as list
+        of the filter name and its parameters in the order of the HDF5
+        filter pipeline
+
+    """
+    filter_names = {filter_id: name for name, filter_id in hdf5_filter_ids.items()}
+    if dataset.chunks is None or dataset.ndim != 3 or dataset.chunks[0] != 1:
+        raise NotImplementedError(
+            "Writing precompressed chunks requires (time, y, x) variables "
+            "with one time step per chunk, but `%s` has chunks %s"
+            % (dataset.name, dataset.chunks)
+        )
+    create_plist = dataset.id.get_create_plist()
+    filters = []
+    for i in range(create_plist.get_nfilters()):
+        filter_id, _, values, name = create_plist.get_filter(i)
+        if filter_id not in filter_names:
+            raise NotImplementedError(
+                "Writing precompressed chunks is only supported for the "
+                "filters %s, but `%s` uses the filter `%s`"
+                % (list(hdf5_filter_ids.keys()), dataset.name, name.decode())
+            )
+        filters.append((filter_names[filter_id], tuple(values)))
+    return {
+        "chunks": dataset.chunks,
+        "dtype": dataset.dtype,
+        "fill_value": dataset.fillvalue,
+        "filters": filters,
+    }
+
+
+def compress_grid(grid, chunk_shape, fill_value, filters):
+    """Split a (y, x) grid into chunks and compress them
+
+    Chunks at the edges of the grid are padded with `fill_value` to the
+    full chunk shape, as HDF5 stores them.
+
+    Parameters
+    ----------
+    grid : np.ndarray
+    chunk_shape : tuple of int
+        Chunk shape (y, x)
+    fill_value : scalar
+    filters : list of tuple
+        Filter names and parameters as returned by `get_chunk_layout`
+
+    Returns
+    -------
+
+    chunks : list of tuple
+        Offset (y, x) of each chunk and the compressed chunk
+
+    """
+    chunk_y, chunk_x = chunk_shape
+    chunks = []
+    for y in range(0, grid.shape[0], chunk_y):
+        for x in range(0, grid.shape[1], chunk_x):
+            chunk = grid[y : y + chunk_y, x : x + chunk_x]
+            if chunk.shape != (chunk_y, chunk_x):
+                padded = np.full((chunk_y, chunk_x), fill_value, dtype=grid.dtype)
+                padded[: chunk.shape[0], : chunk.shape[1]] = chunk
+                chunk = padded
+            chunks.append(((y, x), compress_chunk(chunk, filters)))
+    return chunks
+
+
+def compress_chunk(chunk, filters):
+    """Apply the HDF5 filters `filters` to a chunk
+
+    Parameters
+    ----------
+    chunk : np.ndarray
+    filters : list of tuple
+        Filter names and parameters as returned by `get_chunk_layout`
+
+    Returns
+    -------
+
+    content : bytes
+
+    """
+    content = np.ascontiguousarray(chunk).tobytes()
+    for name, values in filters:
+        if name == "shuffle":
+            # Bytes are grouped by their position in the elements
+            itemsize = chunk.dtype.itemsize
+            if itemsize > 1:
+                content = (
+                    np.frombuffer(content, dtype="u1").reshape(-1, itemsize).T.tobytes()
+                )
+        elif name == "deflate":
+            content = zlib.compress(content, values[0])
+        else:
+            raise NotImplementedError("Filter `%s` is not supported" % name)
+    return content
@@ -0,0 +1,342 @@
+import os
+import numpy as np
+
+# KD-trees of the grid coordinates of files without usable projection
+# parameters, see `_get_kdtree`
+_kdtree_cache = {}
+
+
+def extract_points(
+    fn, lats, lons, t_start=None, t_end=None, variable_name="rainfall_amount"
+):
+    """Extract the time series at the grid cells nearest to some points
+
+    Only the chunks of the NetCDF file which contain the points are read,
+    in blocks of time steps. Hence, files using the "timeseries" chunk
+    profile are read much faster than files with one chunk per time step.
+
+    Parameters
+    ----------
+    fn : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    lats, lons : array_like
+        WGS84 coordinates of the points
+    t_start, t_end : datetime.datetime, optional
+        First and last time stamp to extract. Default is to extract all.
+    variable_name : str, optional
+
+    Returns
+    -------
+
+    times : np.ndarray of datetime.datetime
+    values : np.ndarray
+        Array of shape (time, points) with NaN for missing values
+
+    """
+    import netCDF4
+
+    lats = np.atleast_1d(np.asarray(lats, dtype="f8"))
+    lons = np.atleast_1d(np.asarray(lons, dtype="f8"))
+
+    with netCDF4.Dataset(fn, "r") as nc_fh:
+        times, time_slice = _get_times(nc_fh, t_start, t_end)
+        i_y, i_x = lat_lon_to_grid_index(nc_fh, lats, lons)
+
+        nc_var = nc_fh[variable_name]
+        values = np.full((len(times), len(lats)), np.nan)
+        chunk_shape = _get_chunk_shape(nc_var)
+
+        # Read the bounding box of the points of each spatial chunk
+        chunk_ids = (i_y // chunk_shape[1]) * nc_var.shape[2] + i_x // chunk_shape[2]
+        for chunk_id in np.unique(chunk_ids):
+            i_points = np.flatnonzero(chunk_ids == chunk_id)
+            y_slice = slice(i_y[i_points].min(), i_y[i_points].max() + 1)
+            x_slice = slice(i_x[i_points].min(), i_x[i_points].max() + 1)
+            for block_slice, block in _read_in_time_blocks(
+                nc_var, time_slice, y_slice, x_slice
+            ):
+                values[block_slice, i_points] = block[
+                    :, i_y[i_points] - y_slice.start, i_x[i_points] - x_slice.start
+                ]
+
+    return times, values
+
+
+def extract_polygon_mean(
+    fn,
+    polygon_lats,
+    polygon_lons,
+    t_start=None,
+    t_end=None,
+    variable_name="rainfall_amount",
+):
+    """Extract the time series of the mean over all grid cells in a polygon
+
+    Parameters
+    ----------
+    fn : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    polygon_lats, polygon_lons : array_like
+        WGS84 coordinates of the vertices of the polygon, e.g. of a catchment
+    t_start, t_end : datetime.datetime, optional
+        First and last time stamp to extract. Default is to extract all.
+    variable_name : str, optional
+
+    Returns
+    -------
+
+    times : np.ndarray of datetime.datetime
+    mean_values : np.ndarray
+        Mean of all grid cells in the polygon with valid data, NaN if there
+        are none
+    n_cells : int
+        Number of grid cells in the polygon
+
+    """
+    import netCDF4
+
+    polygon_lats = np.asarray(polygon_lats, dtype="f8")
+    polygon_lons = np.asarray(polygon_lons, dtype="f8")
+
+    with netCDF4.Dataset(fn, "r") as nc_fh:
+        times, time_slice = _get_times(nc_fh, t_start, t_end)
+
+        projected = _project_to_grid(nc_fh, polygon_lats, polygon_lons)
+        if projected is not None:
+            vertices_x, vertices_y, x, y = projected
+            in_box = (
+                (x >= vertices_x.min()) & (x <= vertices_x.max()),
+                (y >= vertices_y.min()) & (y <= vertices_y.max()),
+            )
+            x_slice = _bounding_slice(in_box[0])
+            y_slice = _bounding_slice(in_box[1])
+            cells_x, cells_y = np.meshgrid(x[x_slice], y[y_slice])
+            mask = points_in_polygon(cells_x, cells_y, vertices_x, vertices_y)
+        else:
+            lats = nc_fh["latitudes"][:]
+            lons = nc_fh["longitudes"][:]
+            in_box = (
+                (lons >= polygon_lons.min())
+                & (lons <= polygon_lons.max())
+                & (lats >= polygon_lats.min())
+                & (lats <= polygon_lats.max())
+            )
+            y_slice = _bounding_slice(in_box.any(axis=1))
+            x_slice = _bounding_slice(in_box.any(axis=0))
+            mask = points_in_polygon(
+                lons[y_slice, x_slice],
+                lats[y_slice, x_slice],
+                polygon_lons,
+                polygon_lats,
+            )
+
+        mean_values = np.full(len(times), np.nan)
+        n_cells = int(mask.sum())
+        if n_cells == 0:
+            return times, mean_values, n_cells
+
+        for block_slice, block in _read_in_time_blocks(
+            nc_fh[variable_name], time_slice, y_slice, x_slice
+        ):
+            cell_values = block[:, mask]
+            n_valid = np.sum(~np.isnan(cell_values), axis=1)
+            sums = np.nansum(cell_values, axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_values[block_slice] = np.where(n_valid > 0, sums / n_valid, np.nan)
+
+    return times, mean_values, n_cells
+
+
+def lat_lon_to_grid_index(nc_fh, lats, lons):
+    """Get the indices of the grid cells nearest to WGS84 coordinates
+
+    The coordinates are projected analytically to the RADOLAN grid using
+    the polar stereographic projection defined by the `radolan_grid`
+    variable. For files without these projection parameters, a KD-tree
+    of the `latitudes` and `longitudes` is used, which requires scipy.
+
+    Parameters
+    ----------
+    nc_fh : netCDF4.Dataset
+    lats, lons : np.ndarray
+
+    Returns
+    -------
+
+    i_y, i_x : np.ndarray of int
+
+    """
+    projected = _project_to_grid(nc_fh, lats, lons)
+    if projected is not None:
+        points_x, points_y, x, y = projected
+        i_x = np.round((points_x - x[0]) / (x[1] - x[0])).astype("int")
+        i_y = np.round((points_y - y[0]) / (y[1] - y[0])).astype("int")
+    else:
+        _, i = _get_kdtree(nc_fh).query(_lat_lon_to_xyz(lats, lons))
+        i_y, i_x = np.unravel_index(i, nc_fh["latitudes"].shape)
+
+    outside = (i_y < 0) | (i_y >= len(nc_fh.dimensions["y"]))
+    outside |= (i_x < 0) | (i_x >= len(nc_fh.dimensions["x"]))
+    if outside.any():
+        raise ValueError(
+            "%d of the points are outside of the RADOLAN grid" % outside.sum()
+        )
+    return i_y, i_x
+
+
+def points_in_polygon(points_x, points_y, vertices_x, vertices_y):
+    """Test which points are inside of a polygon using the even-odd rule
+
+    Parameters
+    ----------
+    points_x, points_y : np.ndarray
+    vertices_x, vertices_y : np.ndarray
+        Vertices of the polygon, which does not need to be closed
+
+    Returns
+    -------
+
+    inside : np.ndarray of bool
+        Array with the shape of `points_x`
+
+    """
+    inside = np.zeros(np.shape(points_x), dtype="bool")
+    j = len(vertices_x) - 1
+    for i in range(len(vertices_x)):
+        crosses = (vertices_y[i] > points_y) != (vertices_y[j] > points_y)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x_intersect = (vertices_x[j] - vertices_x[i]) * (
+                points_y - vertices_y[i]
+            ) / (vertices_y[j] - vertices_y[i]) + vertices_x[i]
+        inside ^= crosses & (points_x < x_intersect)
+        j = i
+    return inside
+
+
+def _project_to_grid(nc_fh, lats, lons):
+    """Project WGS84 coordinates to the x/y coordinates of the RADOLAN grid
+
+    Returns None if the file does not define a polar stereographic
+    projection with a regular x/y grid.
+    """
+    if "radolan_grid" not in nc_fh.variables:
+        return None
+    grid = nc_fh["radolan_grid"]
+    if getattr(grid, "grid_mapping_name", None) != "polar_stereographic":
+        return None
+
+    x = nc_fh["x"][:].filled(np.nan)
+    y = nc_fh["y"][:].filled(np.nan)
+    if len(x) < 2 or len(y) < 2:
+        return None
+    if not (
+        np.allclose(np.diff(x), x[1] - x[0]) and np.allclose(np.diff(y), y[1] - y[0])
+    ):
+        return None
+
+    # The projection parameters are given in m, but the grid in km
+    earth_radius = grid.semi_major_axis / 1000
+    lon_0 = np.radians(grid.straight_vertical_longitude_from_pole)
+    rho = (
+        2
+        * earth_radius
+        * grid.scale_factor_at_projection_origin
+        * np.tan(np.pi / 4 - np.radians(lats) / 2)
+    )
+    points_x = rho * np.sin(np.radians(lons) - lon_0)
+    points_y = -rho * np.cos(np.radians(lons) - lon_0)
+    return points_x, points_y, x, y
+
+
+def _lat_lon_to_xyz(lats, lons):
+    lats = np.radians(np.ravel(lats))
+    lons = np.radians(np.ravel(lons))
+    return np.column_stack(
+        [np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)]
+    )
+
+
+def _get_kdtree(nc_fh):
+    """Get a KD-tree of the grid coordinates, cached per file"""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        raise ImportError(
+            "Extracting from grids without RADOLAN projection parameters "
+            "requires scipy, install it via `pip install radolan_to_netcdf[extract]`"
+        )
+
+    fn = os.path.abspath(nc_fh.filepath())
+    key = (fn, os.path.getmtime(fn))
+    if key not in _kdtree_cache:
+        _kdtree_cache[key] = cKDTree(
+            _lat_lon_to_xyz(nc_fh["latitudes"][:], nc_fh["longitudes"][:])
+        )
+    return _kdtree_cache[key]
+
+
+def _get_times(nc_fh, t_start, t_end):
+    """Get the time stamps between `t_start` and `t_end` and their slice"""
+    import netCDF4
+
+    nc_time = nc_fh["time"]
+    time_values = nc_time[:].filled(np.nan)
+    i_start, i_end = 0, len(time_values)
+    if t_start is not None:
+        t = netCDF4.date2num(t_start, units=nc_time.units, calendar=nc_time.calendar)
+        i_start = np.searchsorted(time_values, t, side="left")
+    if t_end is not None:
+        t = netCDF4.date2num(t_end, units=nc_time.units, calendar=nc_time.calendar)
+        i_end = np.searchsorted(time_values, t, side="right")
+    time_slice = slice(i_start, max(i_start, i_end))
+    times = netCDF4.num2date(
+        time_values[time_slice],
+        units=nc_time.units,
+        calendar=nc_time.calendar,
+        only_use_cftime_datetimes=False,
+        only_use_python_datetimes=True,
+    )
+    return np.asarray(times), time_slice
+
+
+def _get_chunk_shape(nc_var):
+    chunking = nc_var.chunking()
+    if chunking == "contiguous":
+        return nc_var.shape
+    return chunking
+
+
+def _bounding_slice(selected):
+    i = np.flatnonzero(selected)
+    if len(i) == 0:
+        return slice(0, 0)
+    return slice(i[0], i[-1] + 1)
+
+
+def _read_in_time_blocks(nc_var, time_slice, y_slice, x_slice, max_memory=100e6):
+    """Read a hyperslab in blocks of time chunks with bounded memory
+
+    Yields
+    ------
+    block_slice : slice
+        Position of the block relative to `time_slice`
+    block : np.ndarray
+        Unpacked data of the block with NaN for missing values
+
+    """
+    chunk_time = _get_chunk_shape(nc_var)[0]
+    n_y = y_slice.stop - y_slice.start
+    n_x = x_slice.stop - x_slice.start
+    n_chunks_time = max(1, int(max_memory // (chunk_time * n_y * n_x * 8)))
+    block_time = n_chunks_time * chunk_time
+
+    # Blocks are aligned to the time chunks, so that each chunk is read once
+    i_time = time_slice.start
+    while i_time < time_slice.stop:
+        i_time_end = min((i_time // block_time + 1) * block_time, time_slice.stop)
+        block = nc_var[i_time:i_time_end, y_slice, x_slice]
+        yield (
+            slice(i_time - time_slice.start, i_time_end - time_slice.start),
+            np.ma.filled(block.astype("f8"), np.nan),
+        )
+        i_time = i_time_end
@@ -0,0 +1,242 @@
+import json
+import time
+import tracemalloc
+import collections
+
+# Stack of the active `Instrumentation` instances. The stages in the hot
+# paths only check if it is empty, so that they cost next to nothing if
+# no instrumentation is active.
+_active = []
+
+# `tracemalloc.reset_peak` was added in Python 3.9
+_has_reset_peak = hasattr(tracemalloc, "reset_peak")
+
+
+class Instrumentation(object):
+    """Record the time, bytes and allocations of the processing stages
+
+    While active, all calls of `read_in_one_bin_file`, `append_to_netcdf`
+    and `RadolanNetCDFWriter` in the current process record their stages:
+
+    - ``read``: reading and gunzipping the file, bytes of the file and of
+      the uncompressed content
+    - ``decode``: decoding the content, including replacing missing values
+      by NaN, bytes of the content and of the data
+    - ``pack``: scaling the data and replacing NaN by the fill value,
+      bytes of the data and of the packed data
+    - ``flags``: expanding the pixel flags and writing them
+    - ``write_data``: writing the packed data to the NetCDF variable,
+      which includes the compression of the chunks which are complete.
+      For `PrecompressedNetCDFWriter` it is only the writing of the
+      compressed chunks, bytes in is their size.
+    - ``compress``: waiting for the chunks compressed by the process pool
+      of `PrecompressedNetCDFWriter`, bytes out is their size
+    - ``write_metadata``: writing time, maxrange and radar locations
+    - ``sync``: writing the remaining chunks to disk, bytes out is the
+      growth of the file
+
+    Note that the stages of worker processes, e.g. the decoding in
+    `convert_files` and `sync_files`, are not recorded.
+
+    Parameters
+    ----------
+    trace_allocations : bool, optional
+        Record the peak memory allocated in each stage via `tracemalloc`.
+        This considerably slows down the processing. Before Python 3.9,
+        which added `tracemalloc.reset_peak`, the memory still allocated
+        at the end of the stage is recorded instead of the peak.
+    callback : callable, optional
+        Called with the dict of each record, e.g. for logging
+    keep_records : bool, optional
+        Keep all records, so that they are included in `as_dict`.
+        Otherwise only the summary per stage is kept.
+
+    Examples
+    --------
+    >>> with Instrumentation() as instrumentation:
+    ...     with RadolanNetCDFWriter(fn_netcdf) as writer:
+    ...         for fn in fn_list:
+    ...             writer.append(*read_in_one_bin_file(fn))
+    >>> print(instrumentation.summary_table())
+
+    """
+
+    def __init__(self, trace_allocations=False, callback=None, keep_records=True):
+        self.trace_allocations = trace_allocations
+        self.callback = callback
+        self.keep_records = keep_records
+        self.records = []
+        self._summary = collections.OrderedDict()
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        _active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active.remove(self)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def record(self, stage, duration, n_time=1, bytes_in=0, bytes_out=0, allocated=0):
+        """Record one call of a stage
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage
+        duration : float
+            Wall time in seconds
+        n_time : int, optional
+            Number of time steps processed in this call
+        bytes_in, bytes_out : int, optional
+            Size of the input and output of the stage
+        allocated : int, optional
+            Peak memory in bytes allocated during the stage
+
+        """
+        record = {
+            "stage": stage,
+            "duration_s": duration,
+            "n_time": n_time,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "allocated_bytes": allocated,
+        }
+        if self.keep_records:
+            self.records.append(record)
+        summary = self._summary.get(stage)
+        if summary is None:
+            summary = self._summary[stage] = {
+                "calls": 0,
+                "n_time": 0,
+                "duration_s": 0.0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "allocated_bytes": 0,
+                "max_allocated_bytes": 0,
+            }
+        summary["calls"] += 1
+        summary["n_time"] += n_time
+        summary["duration_s"] += duration
+        summary["bytes_in"] += bytes_in
+        summary["bytes_out"] += bytes_out
+        summary["allocated_bytes"] += allocated
+        summary["max_allocated_bytes"] = max(summary["max_allocated_bytes"], allocated)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        """Get the totals per stage in the order in which they were recorded
+
+        Returns
+        -------
+
+        summary : dict
+            Number of `calls`, processed time steps `n_time`, total
+            `duration_s`, `bytes_in`, `bytes_out` and `allocated_bytes`
+            and the `max_allocated_bytes` of one call per stage
+
+        """
+        return collections.OrderedDict(
+            (stage, dict(summary)) for stage, summary in self._summary.items()
+        )
+
+    def as_dict(self):
+        """Get the summary and the records as JSON serializable dict"""
+        return {"summary": self.summary(), "records": list(self.records)}
+
+    def to_json(self, fn=None):
+        """Get the summary and the records as JSON, optionally written to `fn`"""
+        content = json.dumps(self.as_dict(), indent=1)
+        if fn is not None:
+            with open(fn, "w") as fh:
+                fh.write(content)
+        return content
+
+    def summary_table(self):
+        """Get the summary per stage as text table"""
+        lines = [
+            "%-15s %7s %7s %10s %9s %10s %10s %10s"
+            % (
+                "stage",
+                "calls",
+                "steps",
+                "total [s]",
+                "ms/step",
+                "MB in",
+                "MB out",
+                "MB alloc",
+            )
+        ]
+        for stage, summary in self._summary.items():
+            lines.append(
+                "%-15s %7d %7d %10.3f %9.3f %10.2f %10.2f %10.2f"
+                % (
+                    stage,
+                    summary["calls"],
+                    summary["n_time"],
+                    summary["duration_s"],
+                    1e3 * summary["duration_s"] / max(summary["n_time"], 1),
+                    summary["bytes_in"] / 1e6,
+                    summary["bytes_out"] / 1e6,
+                    summary["allocated_bytes"] / 1e6,
+                )
+            )
+        return "\n".join(lines)
+
+
+class stage(object):
+    """Context manager recording a stage to all active `Instrumentation`
+
+    The sizes can be set on the returned object within the context, e.g.
+    ``s.bytes_out = data.nbytes``, and are only needed if `s.active`.
+    """
+
+    __slots__ = (
+        "name",
+        "n_time",
+        "bytes_in",
+        "bytes_out",
+        "active",
+        "_t_start",
+        "_memory_start",
+    )
+
+    def __init__(self, name, n_time=1, bytes_in=0):
+        self.name = name
+        self.n_time = n_time
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.active = bool(_active)
+
+    def __enter__(self):
+        if self.active:
+            if tracemalloc.is_tracing():
+                self._memory_start = tracemalloc.get_traced_memory()[0]
+                if _has_reset_peak:
+                    tracemalloc.reset_peak()
+            self._t_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.active or exc_type is not None:
+            return
+        duration = time.perf_counter() - self._t_start
+        allocated = 0
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            allocated = (peak if _has_reset_peak else current) - self._memory_start
+        for instrumentation in _active:
+            instrumentation.record(
+                self.name,
+                duration,
+                n_time=self.n_time,
+                bytes_in=self.bytes_in,
+                bytes_out=self.bytes_out,
+                allocated=allocated,
+            )
@@ -0,0 +1,98 @@
+import os
+import concurrent.futures
+
+from .utils import ordered_bounded_map
+from .radolan_to_netcdf import (
+    create_empty_netcdf,
+    read_in_one_bin_file,
+    RadolanNetCDFWriter,
+)
+
+
+def convert_files(
+    fn_list,
+    fn_netcdf,
+    product_name,
+    workers=None,
+    max_queue_size=None,
+    batch_size=12,
+    precompress=False,
+):
+    """Convert many RADOLAN binary files to NetCDF using a process pool
+
+    The RADOLAN binary files are decoded in parallel by `workers`
+    processes. The decoded data is passed through a bounded queue to the
+    calling process, which is the only writer of the NetCDF file and
+    appends the time steps in the order of `fn_list`.
+
+    Parameters
+    ----------
+    fn_list : list of str
+        Filenames of the RADOLAN binary files. They have to be sorted
+        chronologically, which for the DWD file naming scheme is the case
+        when using `sorted(fn_list)`.
+    fn_netcdf : str
+        Filename of the NetCDF file. It is created via `create_empty_netcdf`
+        if it does not exist yet.
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RW'
+    workers : int, optional
+        Number of decoding processes. Defaults to `os.cpu_count()`.
+    max_queue_size : int, optional
+        Maximum number of decoded files held in memory. Defaults to
+        twice the number of workers plus `batch_size`.
+    batch_size : int, optional
+        Number of time steps appended to the NetCDF in one go
+    precompress : bool, optional
+        Also compress the chunks in the process pool and write them via
+        `PrecompressedNetCDFWriter`, which requires `h5py`
+
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_queue_size is None:
+        max_queue_size = 2 * workers + batch_size
+
+    if not os.path.exists(fn_netcdf):
+        create_empty_netcdf(fn_netcdf, product_name=product_name)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        if precompress:
+            from .direct_write import PrecompressedNetCDFWriter
+
+            writer = PrecompressedNetCDFWriter(
+                fn_netcdf, flush_interval=batch_size, executor=executor
+            )
+        else:
+            writer = RadolanNetCDFWriter(fn_netcdf, flush_interval=batch_size)
+        with writer:
+            append_in_chronological_order(
+                writer,
+                ordered_bounded_map(
+                    executor,
+                    read_in_one_bin_file,
+                    fn_list,
+                    max_in_flight=max_queue_size,
+                ),
+            )
+
+
+def append_in_chronological_order(writer, decoded):
+    """Append decoded time steps and check that they are in chronological order
+
+    Parameters
+    ----------
+    writer : RadolanNetCDFWriter
+    decoded : iterable of tuple
+        Data and metadata as returned by `read_in_one_bin_file`
+
+    """
+    last_datetime = None
+    for data, metadata in decoded:
+        if last_datetime is not None and metadata["datetime"] <= last_datetime:
+            raise ValueError(
+                "RADOLAN files are not in chronological order, `%s` "
+                "follows `%s`" % (metadata["datetime"], last_datetime)
+            )
+        last_datetime = metadata["datetime"]
+        writer.append(data, metadata)
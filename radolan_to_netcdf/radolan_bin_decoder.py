@@ -0,0 +1,222 @@
+import os
+import gzip
+import datetime
+import numpy as np
+
+# RADOLAN products for which the decoder in this module is used
+supported_products = ["RW", "RY", "YW"]
+
+# Header token in the order in which wradlib adds their content to the
+# metadata dict. Only the tokens used by the supported products are listed.
+header_token = ["BY", "VS", "SW", "PR", "INT", "GP", "MS", "MF", "VR", "U"]
+
+
+def read_radolan_bin_file(f):
+    """Read a RADOLAN binary file
+
+    Parameters
+    ----------
+    f : str, os.PathLike or file-like
+        Path to the RADOLAN binary file, which can be gzip compressed,
+        or a file-like object of the uncompressed file
+
+    Returns
+    -------
+
+    data : np.ndarray
+        RADOLAN data with NaN for pixels flagged as `nodatamask`
+    metadata : dict
+        Metadata in the same form as returned by
+        `wradlib.io.read_radolan_composite`
+
+    """
+    return decode_radolan_bin(read_content(f))
+
+
+def is_path(f):
+    """Check if `f` is a path and not a file-like object"""
+    return isinstance(f, (str, os.PathLike))
+
+
+def read_content(f):
+    """Read the uncompressed content of a RADOLAN binary file
+
+    Parameters
+    ----------
+    f : str, os.PathLike or file-like
+        Path to the RADOLAN binary file, which can be gzip compressed,
+        or a file-like object of the uncompressed file
+
+    Returns
+    -------
+
+    content : bytes
+
+    """
+    if is_path(f):
+        fn = os.fspath(f)
+        with open(fn, "rb") as fh:
+            return decompress(fh.read(), fn)
+    return f.read()
+
+
+def decompress(content, fn):
+    """Decompress the content of the file `fn` if it ends with `.gz`"""
+    if fn.endswith(".gz"):
+        return gzip.decompress(content)
+    return content
+
+
+def get_producttype(content):
+    """Get the RADOLAN product name from the content of a binary file"""
+    return content[0:2].decode()
+
+
+def decode_radolan_bin(content):
+    """Decode the uncompressed content of a RADOLAN binary file
+
+    Parameters
+    ----------
+    content : bytes
+        Content of the uncompressed RADOLAN binary file
+
+    Returns
+    -------
+
+    data : np.ndarray
+    metadata : dict
+
+    """
+    i_etx = content.find(b"\x03")
+    if i_etx == -1:
+        raise EOFError("Unexpected EOF detected while reading RADOLAN header.")
+    metadata = parse_header(content[:i_etx].decode())
+    data = decode_data(content[i_etx + 1 :], metadata)
+    return data, metadata
+
+
+def parse_header(header):
+    """Parse the ASCII header of a RADOLAN composite
+
+    Parameters
+    ----------
+    header : str
+        RADOLAN header without the trailing ETX character
+
+    Returns
+    -------
+
+    metadata : dict
+        Metadata with the same keys and values, in the same order, as
+        returned by `wradlib.io.radolan.parse_dwd_composite_header`
+
+    """
+    metadata = {}
+    metadata["producttype"] = header[0:2]
+    if metadata["producttype"] not in supported_products:
+        raise NotImplementedError(
+            "RADOLAN product `%s` is not supported, only %s"
+            % (metadata["producttype"], supported_products)
+        )
+    metadata["datetime"] = datetime.datetime.strptime(
+        header[2:8] + header[13:17], "%d%H%M%m%y"
+    )
+    metadata["radarid"] = header[8:13]
+    # wradlib adds the grid size here, before parsing the other token
+    metadata["nrow"] = None
+    metadata["ncol"] = None
+
+    # Get the start of each token. The radar locations are excluded from the
+    # search since they could contain a token.
+    i_locations = header.find("<")
+    header_token_part = header if i_locations == -1 else header[:i_locations]
+    token_starts = {}
+    for token in header_token:
+        i = header_token_part.rfind(token)
+        if i > -1:
+            token_starts[token] = i
+
+    for token in header_token:
+        if token not in token_starts:
+            continue
+        start = token_starts[token] + len(token)
+        stop = min(
+            [i for i in token_starts.values() if i > token_starts[token]],
+            default=len(header),
+        )
+        value = header[start:stop]
+
+        if token == "BY":
+            metadata["datasize"] = int(value) - len(header) - 1
+        elif token == "VS":
+            metadata["formatversion"] = int(value)
+            metadata["maxrange"] = {
+                0: "100 km and 128 km (mixed)",
+                1: "100 km",
+                2: "128 km",
+                3: "150 km",
+            }.get(int(value), "100 km")
+        elif token == "SW":
+            metadata["radolanversion"] = value.strip()
+        elif token == "PR":
+            metadata["precision"] = float("1" + value.strip())
+        elif token == "INT":
+            metadata["intervalseconds"] = int(value) * 60
+        elif token == "U":
+            metadata["intervalunit"] = int(value)
+            if metadata["intervalunit"] == 1:
+                metadata["intervalseconds"] *= 1440
+        elif token == "GP":
+            nrow, ncol = value.strip().split("x")
+            metadata["nrow"] = int(nrow)
+            metadata["ncol"] = int(ncol)
+        elif token == "MS":
+            locations = header[start:].strip().split("<")[1].split(">")[0]
+            metadata["radarlocations"] = locations.split(",")
+        elif token == "MF":
+            metadata["moduleflag"] = int(value)
+        elif token == "VR":
+            metadata["reanalysisversion"] = value.strip()
+
+    return metadata
+
+
+def decode_data(buf, metadata):
+    """Decode the binary data part of a RADOLAN composite
+
+    The flat indices of the flagged pixels are added to `metadata` as
+    `secondary`, `nodatamask` and `cluttermask`.
+
+    Parameters
+    ----------
+    buf : bytes
+        Binary data following the header
+    metadata : dict
+        Metadata as returned by `parse_header`
+
+    Returns
+    -------
+
+    data : np.ndarray
+        RADOLAN data with NaN for pixels flagged as `nodatamask`
+
+    """
+    n_pixels = metadata["nrow"] * metadata["ncol"]
+    if len(buf) < 2 * n_pixels:
+        raise OSError(
+            "File corruption while reading RADOLAN %s data for %s! "
+            "Could not read enough data!"
+            % (metadata["producttype"], metadata["datetime"])
+        )
+    raw = np.frombuffer(buf, dtype="<u2", count=n_pixels)
+
+    metadata["nodataflag"] = np.nan
+    # `np.flatnonzero` is much faster on bool than on uint16 arrays
+    metadata["secondary"] = np.flatnonzero((raw & 0x1000) != 0)
+    metadata["nodatamask"] = np.flatnonzero((raw & 0x2000) != 0)
+    metadata["cluttermask"] = np.flatnonzero((raw & 0x8000) != 0)
+
+    data = (raw & 0xFFF) * metadata["precision"]
+    data[metadata["nodatamask"]] = np.nan
+
+    return data.reshape(metadata["nrow"], metadata["ncol"])
@@ -1,3 +1,5 @@
+import numpy as np
+
 metadata_per_timestamp = {
     "maxrange": {
         "variable_parameters": {
@@ -65,6 +67,326 @@ metadata_per_timestamp = {
     },
 }
 
+# Codes of the DWD radar sites as used in the `radarlocations` of the
+# RADOLAN header. They are the initial sites of the unlimited `radar`
+# dimension of the "matrix" radar encoding. Other sites, e.g. sites which
+# were replaced in the past, are appended to a file when they first occur.
+radar_sites = [
+    "asb",
+    "boo",
+    "drs",
+    "eis",
+    "emd",
+    "ess",
+    "fbg",
+    "fld",
+    "hnr",
+    "isn",
+    "mem",
+    "neu",
+    "nhb",
+    "oft",
+    "pro",
+    "ros",
+    "tur",
+    "umd",
+]
+
+# Values of the `maxrange` enum of the "matrix" radar encoding, which are the
+# format versions `VS` of the RADOLAN header
+maxrange_enum = {
+    "100 km and 128 km (mixed)": 0,
+    "100 km": 1,
+    "128 km": 2,
+    "150 km": 3,
+    "missing": 255,
+}
+
+# Alternative ways of storing the radars which contributed to a composite.
+# "string" stores the `radarlocations` as one variable length string per
+# time stamp and `maxrange` in km. "matrix" stores the availability of
+# each site as `u1` (time, radar) matrix, which can be compressed and read
+# for long periods efficiently, and `maxrange` as enum.
+radar_encodings = {
+    "string": {
+        "dimensions": {},
+        "variables": {
+            variable_name: metadata_per_timestamp[variable_name]
+            for variable_name in ["maxrange", "radarlocations"]
+        },
+    },
+    "matrix": {
+        "dimensions": {"radar": None},
+        "variables": {
+            "radar_site": {
+                "variable_parameters": {
+                    "datatype": str,
+                    "dimensions": ("radar",),
+                },
+                "attributes": {"long_name": "Code of the DWD radar site"},
+            },
+            "radar_available": {
+                "variable_parameters": {
+                    "datatype": "u1",
+                    "dimensions": ("time", "radar"),
+                    "chunksizes": (4096, len(radar_sites)),
+                    "fill_value": 255,
+                    "zlib": True,
+                    "complevel": 5,
+                },
+                "attributes": {
+                    "long_name": "Radar site contributed to the composite",
+                    "flag_values": np.array([0, 1], dtype="u1"),
+                    "flag_meanings": "unavailable available",
+                },
+            },
+            "maxrange": {
+                "variable_parameters": {
+                    "datatype": "u1",
+                    "enum": maxrange_enum,
+                    "dimensions": ("time",),
+                    "fill_value": maxrange_enum["missing"],
+                },
+                "attributes": {"long_name": "Range of the radar data"},
+            },
+        },
+    },
+}
+
+# Bit masks used for storing all RADOLAN pixel flags in one variable
+flag_masks = {
+    "secondary": 1,
+    "nodatamask": 2,
+    "cluttermask": 4,
+}
+
+# Alternative ways of storing the RADOLAN pixel flags. "dense" stores
+# one `i2` grid per flag, "packed" stores all flags as bits of one `u1` grid
+# and "ragged" stores the flat indices of the flagged pixels as CF
+# contiguous ragged array with the number of indices per time stamp in
+# the variable `<flag_name>_count`. "none" does not store the flags, which
+# is used for derived products like the aggregated sums.
+flag_encodings = {
+    "none": {
+        "dimensions": {},
+        "variables": {},
+    },
+    "dense": {
+        "dimensions": {},
+        "variables": {
+            flag_name: metadata_per_timestamp[flag_name] for flag_name in flag_masks
+        },
+    },
+    "packed": {
+        "dimensions": {},
+        "variables": {
+            "flags": {
+                "variable_parameters": {
+                    "datatype": "u1",
+                    "dimensions": ("time", "y", "x"),
+                    "chunksizes": (1, 900, 900),
+                    "fill_value": 255,
+                    "zlib": True,
+                    "complevel": 5,
+                },
+                "attributes": {
+                    "long_name": "RADOLAN pixel flags",
+                    "flag_masks": np.array(list(flag_masks.values()), dtype="u1"),
+                    "flag_meanings": " ".join(flag_masks.keys()),
+                    "coordinates": "longitudes latitudes",
+                    "grid_mapping": "RADOLAN_grid",
+                },
+            },
+        },
+    },
+    "ragged": {
+        "dimensions": {flag_name + "_sample": None for flag_name in flag_masks},
+        "variables": {},
+    },
+}
+for flag_name in flag_masks:
+    flag_encodings["ragged"]["variables"][flag_name + "_count"] = {
+        "variable_parameters": {
+            "datatype": "i4",
+            "dimensions": ("time",),
+        },
+        "attributes": {
+            "long_name": "Number of pixels with flag `%s`" % flag_name,
+            "sample_dimension": flag_name + "_sample",
+        },
+    }
+    flag_encodings["ragged"]["variables"][flag_name] = {
+        "variable_parameters": {
+            "datatype": "i4",
+            "dimensions": (flag_name + "_sample",),
+            "chunksizes": (65536,),
+            "zlib": True,
+            "complevel": 5,
+        },
+        "attributes": {
+            "long_name": metadata_per_timestamp[flag_name]["attributes"]["long_name"],
+            "comment": "Indices of the flagged pixels in the flattened (y, x) grid",
+        },
+    }
+
+# Chunk shapes of the (time, y, x) variables. `None` uses the full size of
+# the dimension. "map" is best for writing and for reading full grids,
+# "timeseries" for reading the data of single pixels or small regions for
+# long periods and "balanced" is a compromise between both. Since each
+# append writes to all chunks of the time steps, files should be created
+# with "map" and rechunked via `rechunk_netcdf` after ingest is finished.
+chunk_profiles = {
+    "map": {"time": 1, "y": None, "x": None},
+    "timeseries": {"time": 2016, "y": 10, "x": 10},
+    "balanced": {"time": 24, "y": 100, "x": 100},
+}
+
+# Compression of the (time, y, x) variables, which can be selected via
+# `compression_profile` of `create_empty_netcdf` instead of the compression
+# given in the product config. The parameters are passed on to
+# `netCDF4.Dataset.createVariable`. Note that netCDF4 applies the `shuffle`
+# filter only together with zlib, blosc has its own `blosc_shuffle`. zstd and
+# blosc are faster than zlib, but require a netCDF library with these
+# filters for writing and reading, hence the zlib profiles are the most
+# portable. Quantization via `significant_digits` is only applied to float
+# variables, since the RADOLAN data is already packed to integers.
+compression_profiles = {
+    "none": {},
+    "fast_ingest": {"compression": "zlib", "complevel": 1, "shuffle": True},
+    "default": {"compression": "zlib", "complevel": 5, "shuffle": True},
+    "archival": {"compression": "zstd", "complevel": 19},
+    "blosc_lz4": {"compression": "blosc_lz4", "complevel": 5, "blosc_shuffle": 1},
+    "zstd": {"compression": "zstd", "complevel": 3},
+}
+
+# Parameters of `netCDF4.Dataset.createVariable` which are replaced when
+# using a compression profile
+compression_parameters = [
+    "zlib",
+    "compression",
+    "complevel",
+    "shuffle",
+    "blosc_shuffle",
+    "significant_digits",
+    "quantize_mode",
+    "least_significant_digit",
+]
+
+# Attributes of the coordinate variables, which are the same for all products
+coordinate_attributes = {
+    "time": {
+        "long_name": "Time",
+        "standard_name": "time",
+        "units": "hours since 2000-01-01 00:50:00.0",
+        "calendar": "standard",
+    },
+    "x": {
+        "long_name": "RADOLAN Grid x coordinate of projection",
+        "standard_name": "projection_x_coordinate",
+        "units": "km",
+    },
+    "y": {
+        "long_name": "RADOLAN Grid y coordinate of projection",
+        "standard_name": "projection_y_coordinate",
+        "units": "km",
+    },
+    "latitudes": {
+        "long_name": "Latitude",
+        "standard_name": "latitude",
+        "units": "degrees_north",
+    },
+    "longitudes": {
+        "long_name": "Longitude",
+        "standard_name": "longitude",
+        "units": "degrees_east",
+    },
+}
+
+# Attributes of the `radolan_grid` variable defining the projection
+radolan_grid_attributes = {
+    "long_name": "RADOLAN Grid",
+    "grid_mapping_name": "polar_stereographic",
+    "semi_major_axis": 6370040.0,
+    "false_easting": 0.0,
+    "false_northing": 0.0,
+    "scale_factor_at_projection_origin": 0.9330127019,
+    "straight_vertical_longitude_from_pole": 10.0,
+    "latitude_of_projection_origin": 90.0,
+}
+
+# Variables of the files with the sums of a product over hourly, daily or
+# monthly periods, see `RadolanAggregator`. The sums are stored as float,
+# since their range depends on the period. `valid_count` is the number of
+# time steps with valid data per pixel and `n_time_steps` the number of
+# time steps which were aggregated in total. `last_time_step` is used to
+# reject time steps which were already added to an incomplete period.
+aggregated_variables = {
+    "rainfall_amount": {
+        "variable_parameters": {
+            "datatype": "f4",
+            "dimensions": ("time", "y", "x"),
+            "zlib": True,
+            "complevel": 5,
+        },
+        "attributes": {
+            "standard_name": "rainfall_amount",
+            "units": "kg",
+            "cell_methods": "time: sum",
+            "coordinates": "longitudes latitudes",
+            "grid_mapping": "RADOLAN_grid",
+        },
+    },
+    "valid_count": {
+        "variable_parameters": {
+            "datatype": "i2",
+            "dimensions": ("time", "y", "x"),
+            "zlib": True,
+            "complevel": 5,
+        },
+        "attributes": {
+            "long_name": "Number of time steps with valid data",
+            "units": "1",
+            "coordinates": "longitudes latitudes",
+            "grid_mapping": "RADOLAN_grid",
+        },
+    },
+}
+
+aggregated_metadata_per_timestamp = {
+    "n_time_steps": {
+        "variable_parameters": {
+            "datatype": "i2",
+            "dimensions": ("time",),
+        },
+        "attributes": {"long_name": "Number of aggregated time steps"},
+    },
+    "n_expected_time_steps": {
+        "variable_parameters": {
+            "datatype": "i2",
+            "dimensions": ("time",),
+        },
+        "attributes": {"long_name": "Number of time steps in the period"},
+    },
+    "last_time_step": {
+        "variable_parameters": {
+            "datatype": "f8",
+            "dimensions": ("time",),
+        },
+        "attributes": {
+            "long_name": "Time stamp of the last aggregated time step",
+            "units": coordinate_attributes["time"]["units"],
+            "calendar": coordinate_attributes["time"]["calendar"],
+        },
+    },
+}
+
+# Length of the aggregation periods in seconds, None for calendar months
+aggregation_periods = {
+    "hourly": 3600,
+    "daily": 86400,
+    "monthly": None,
+}
+
 radolan_product_netcdf_config = {
     "RW": {
         "variables": {
@@ -92,6 +414,7 @@ radolan_product_netcdf_config = {
         "metadata_fixed": {
             "n_lats": 900,
             "n_lons": 900,
+            "interval_seconds": 3600,
         },
     },
     "YW": {
@@ -119,6 +442,7 @@ radolan_product_netcdf_config = {
         "metadata_fixed": {
             "n_lats": 1100,
             "n_lons": 900,
+            "interval_seconds": 300,
         },
     },
     "RY": {
@@ -146,6 +470,7 @@ radolan_product_netcdf_config = {
         "metadata_fixed": {
             "n_lats": 900,
             "n_lons": 900,
+            "interval_seconds": 300,
         },
     },
 }
@@ -1,12 +1,110 @@
-import wradlib as wrl
-import netCDF4
-from datetime import datetime
+import os
+import io
+from datetime import datetime, timedelta
 import numpy as np
 
-from .radolan_product_netcdf_config import radolan_product_netcdf_config
+from . import radolan_bin_decoder
+from .instrumentation import stage as _stage
+from .utils import save_atomic as _save_atomic
 
+__all__ = [
+    "get_radolan_coordinates",
+    "create_empty_netcdf",
+    "get_chunksizes",
+    "read_in_one_bin_file",
+    "append_to_netcdf",
+    "RadolanNetCDFWriter",
+    "get_consecutive_runs",
+    "pack_data",
+    "get_radar_availability",
+    "read_radar_availability",
+    "get_flag_grids",
+    "read_flag",
+]
 
-def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
+# `wradlib`, `netCDF4` and the product configuration are imported in the
+# functions which need them, to keep `import radolan_to_netcdf` fast. This
+# matters for short-lived scripts and for worker processes, which often
+# only need `read_in_one_bin_file`.
+
+# In-memory cache of the RADOLAN grid coordinates, see `get_radolan_coordinates`
+_radolan_coordinates_cache = {}
+
+
+def get_radolan_coordinates(n_lats, n_lons, cache_dir=None):
+    """Get the RADOLAN grid coordinates, memoized per grid size
+
+    The projection of the grid to WGS84 is only done once per grid size
+    and process. If `cache_dir` is supplied, the coordinates are also
+    stored there as `.npy` file and loaded from it by other processes.
+
+    Parameters
+    ----------
+    n_lats : int
+        Number of rows of the RADOLAN grid
+    n_lons : int
+        Number of columns of the RADOLAN grid
+    cache_dir : str, optional
+        Directory for caching the coordinates on disk
+
+    Returns
+    -------
+
+    radolan_x, radolan_y, radolan_lats, radolan_lons : np.ndarray
+        1D projection coordinates and 2D WGS84 coordinates
+
+    """
+    import wradlib as wrl
+
+    key = (n_lats, n_lons)
+    if key not in _radolan_coordinates_cache:
+        fn_cache = None
+        if cache_dir is not None:
+            fn_cache = os.path.join(
+                cache_dir, "radolan_coordinates_%dx%d.npy" % (n_lats, n_lons)
+            )
+
+        if fn_cache is not None and os.path.exists(fn_cache):
+            coordinates = np.load(fn_cache)
+        else:
+            radolan_xy_grids = wrl.georef.get_radolan_grid(ncols=n_lons, nrows=n_lats)
+            radolan_lat_lon_grids = wrl.georef.get_radolan_grid(
+                ncols=n_lons, nrows=n_lats, wgs84=True
+            )
+            coordinates = np.stack(
+                [
+                    radolan_xy_grids[:, :, 0],
+                    radolan_xy_grids[:, :, 1],
+                    radolan_lat_lon_grids[:, :, 1],
+                    radolan_lat_lon_grids[:, :, 0],
+                ]
+            )
+            if fn_cache is not None:
+                # Other processes can read the file while it is written
+                os.makedirs(cache_dir, exist_ok=True)
+                _save_atomic(fn_cache, lambda fh: np.save(fh, coordinates))
+
+        _radolan_coordinates_cache[key] = (
+            coordinates[0, 0, :],
+            coordinates[1, :, 0],
+            coordinates[2],
+            coordinates[3],
+        )
+    return _radolan_coordinates_cache[key]
+
+
+def create_empty_netcdf(
+    fn,
+    product_name=None,
+    product_config_dict=None,
+    flag_encoding="dense",
+    coordinate_cache_dir=None,
+    compress_lat_lon=False,
+    chunk_profile=None,
+    time_range=None,
+    compression_profile=None,
+    radar_encoding="string",
+):
     """Create an empty NetCDF file for the desired RADOLAN product
 
     Parameters
@@ -24,8 +122,57 @@ def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
         via passing only the `product_name` (which is the preferred way).
         The `product_name` always has to be supplied in addition to
         this variable.
+    flag_encoding : str, optional
+        How the RADOLAN pixel flags `secondary`, `nodatamask` and
+        `cluttermask` are stored. The options are defined in the dictionary
+        `flag_encodings`. "dense" (the default) stores one `i2` variable
+        per flag, "packed" stores all flags as bits of one `u1` variable
+        `flags` and "ragged" stores only the indices of the flagged pixels
+        as CF contiguous ragged arrays. "none" does not store the flags.
+        Use `read_flag` to read a flag independent of the encoding.
+    coordinate_cache_dir : str, optional
+        Directory for caching the RADOLAN grid coordinates on disk, see
+        `get_radolan_coordinates`
+    compress_lat_lon : bool, optional
+        Store `latitudes` and `longitudes` as zlib compressed `f4` instead
+        of uncompressed `f8`, which reduces the file size considerably
+    chunk_profile : str, optional
+        Name of a chunk profile from `chunk_profiles` which is used for all
+        (time, y, x) variables instead of the chunks of the product config
+    time_range : tuple of datetime.datetime, optional
+        First and last time stamp of the period covered by the file. If
+        supplied, the `time` dimension has a fixed size with one time step
+        per interval of the product and the `time` values are pre-filled.
+        Data is then written to the time step of its time stamp, leaving
+        missing time steps empty. Default is an unlimited `time`
+        dimension to which data is appended.
+    compression_profile : str or dict, optional
+        Name of a compression profile from `compression_profiles` which
+        is used for all (time, y, x) variables instead of the compression
+        of the product config, e.g. "fast_ingest" for realtime ingest or
+        "archival" for cold storage. A dict maps variable names to
+        profile names, other variables keep the compression of the config.
+    radar_encoding : str, optional
+        How the radars which contributed to each time step are stored, see
+        `radar_encodings`. "string" (the default) stores the
+        `radarlocations` as string and `maxrange` in km. "matrix" stores
+        the availability of each site in `radar_site` as `u1` matrix
+        `radar_available` with the dimensions (time, radar) and `maxrange`
+        as enum. Sites which are not in `radar_sites` of the config are
+        appended to the unlimited `radar` dimension when they occur. Use
+        `read_radar_availability` to read it independent of the encoding.
 
     """
+    import netCDF4
+    from .radolan_product_netcdf_config import (
+        radolan_product_netcdf_config,
+        flag_masks,
+        flag_encodings,
+        radar_encodings,
+        radar_sites,
+        coordinate_attributes,
+        radolan_grid_attributes,
+    )
 
     if not product_name and not product_config_dict:
         raise ValueError(
@@ -40,35 +187,92 @@ def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
     else:
         pass
 
+    if flag_encoding not in flag_encodings:
+        raise ValueError(
+            "`flag_encoding` has to be one of %s" % list(flag_encodings.keys())
+        )
+    metadata_per_timestamp = {
+        variable_name: variable_config
+        for variable_name, variable_config in product_config_dict[
+            "metadata_per_timestamp"
+        ].items()
+        if variable_name not in flag_masks
+    }
+    metadata_per_timestamp.update(flag_encodings[flag_encoding]["variables"])
+    if radar_encoding not in radar_encodings:
+        raise ValueError(
+            "`radar_encoding` has to be one of %s" % list(radar_encodings.keys())
+        )
+    if radar_encoding != "string":
+        for variable_name in radar_encodings["string"]["variables"]:
+            metadata_per_timestamp.pop(variable_name, None)
+        metadata_per_timestamp.update(radar_encodings[radar_encoding]["variables"])
+
+    n_lons = product_config_dict["metadata_fixed"]["n_lons"]
+    n_lats = product_config_dict["metadata_fixed"]["n_lats"]
+
+    if time_range is not None:
+        if flag_encoding == "ragged":
+            raise ValueError(
+                "A `time_range` cannot be used with `flag_encoding` ragged, "
+                "since it requires writing the time steps in order"
+            )
+        interval = timedelta(
+            seconds=product_config_dict["metadata_fixed"]["interval_seconds"]
+        )
+        n_time = (time_range[1] - time_range[0]) // interval + 1
+        if n_time < 1:
+            raise ValueError("The end of `time_range` is before its start")
+        times = [time_range[0] + i * interval for i in range(n_time)]
+    else:
+        n_time = None
+
+    if chunk_profile is not None:
+        chunksizes = get_chunksizes(
+            chunk_profile, n_lats=n_lats, n_lons=n_lons, n_time=n_time
+        )
+    else:
+        chunksizes = None
+
     with netCDF4.Dataset(fn, "w") as nc_fh:
-        n_lons = product_config_dict["metadata_fixed"]["n_lons"]
-        n_lats = product_config_dict["metadata_fixed"]["n_lats"]
 
         # Get RADOLAN coordinates
-        radolan_xy_grids = wrl.georef.get_radolan_grid(ncols=n_lons, nrows=n_lats)
-        radolan_x = radolan_xy_grids[0, :, 0]
-        radolan_y = radolan_xy_grids[:, 0, 1]
-        radolan_lat_lon_grids = wrl.georef.get_radolan_grid(
-            ncols=n_lons, nrows=n_lats, wgs84=True
+        radolan_x, radolan_y, radolan_lats, radolan_lons = get_radolan_coordinates(
+            n_lats=n_lats, n_lons=n_lons, cache_dir=coordinate_cache_dir
         )
-        radolan_lons = radolan_lat_lon_grids[:, :, 0]
-        radolan_lats = radolan_lat_lon_grids[:, :, 1]
 
         # create dimensions
         nc_fh.createDimension("x", n_lons)
         nc_fh.createDimension("y", n_lats)
-        nc_fh.createDimension("time", None)
+        nc_fh.createDimension("time", n_time)
+        for dimension_name, dimension_size in flag_encodings[flag_encoding][
+            "dimensions"
+        ].items():
+            nc_fh.createDimension(dimension_name, dimension_size)
+        for dimension_name, dimension_size in radar_encodings[radar_encoding][
+            "dimensions"
+        ].items():
+            nc_fh.createDimension(dimension_name, dimension_size)
 
         # create the variables we need in all files
         nc_fh.createVariable("x", "f8", ("x"))
         nc_fh.createVariable("y", "f8", ("y"))
-        nc_fh.createVariable("latitudes", "f8", ("y", "x"))
-        nc_fh.createVariable("longitudes", "f8", ("y", "x"))
+        if compress_lat_lon:
+            lat_lon_parameters = {"datatype": "f4", "zlib": True, "complevel": 5}
+        else:
+            lat_lon_parameters = {"datatype": "f8"}
+        nc_fh.createVariable("latitudes", dimensions=("y", "x"), **lat_lon_parameters)
+        nc_fh.createVariable("longitudes", dimensions=("y", "x"), **lat_lon_parameters)
         nc_fh.createVariable("time", "f8", ("time"))
 
         # create the individual specified variables with their attributes
         for variable_name, variable_config in product_config_dict["variables"].items():
             variable_parameters = variable_config["variable_parameters"].copy()
+            if chunksizes and variable_parameters["dimensions"] == ("time", "y", "x"):
+                variable_parameters["chunksizes"] = chunksizes
+            variable_parameters = _apply_compression_profile(
+                nc_fh, variable_name, variable_parameters, compression_profile
+            )
             nc_var = nc_fh.createVariable(
                 varname=variable_name,
                 datatype=variable_parameters.pop("datatype"),
@@ -77,40 +281,32 @@ def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
             nc_var.setncatts(variable_config["attributes"])
 
         # create variables for the metadata that changes per time stamp
-        for variable_name, variable_config in product_config_dict[
-            "metadata_per_timestamp"
-        ].items():
+        for variable_name, variable_config in metadata_per_timestamp.items():
             variable_parameters = variable_config["variable_parameters"].copy()
+            if chunksizes and variable_parameters["dimensions"] == ("time", "y", "x"):
+                variable_parameters["chunksizes"] = chunksizes
+            variable_parameters = _apply_compression_profile(
+                nc_fh, variable_name, variable_parameters, compression_profile
+            )
+            datatype = variable_parameters.pop("datatype")
+            if "enum" in variable_parameters:
+                datatype = nc_fh.createEnumType(
+                    datatype, variable_name + "_t", variable_parameters.pop("enum")
+                )
             nc_var = nc_fh.createVariable(
-                varname=variable_name,
-                datatype=variable_parameters.pop("datatype"),
-                **variable_parameters
+                varname=variable_name, datatype=datatype, **variable_parameters
             )
             nc_var.setncatts(variable_config["attributes"])
 
         nc_fh.set_auto_maskandscale(True)
 
         # variable attributes
-        nc_fh["time"].long_name = "Time"
-        nc_fh["time"].standard_name = "time"
-        nc_fh["time"].units = "hours since 2000-01-01 00:50:00.0"
-        nc_fh["time"].calendar = "standard"
-
-        nc_fh["x"].long_name = "RADOLAN Grid x coordinate of projection"
-        nc_fh["x"].standard_name = "projection_x_coordinate"
-        nc_fh["x"].units = "km"
-
-        nc_fh["y"].long_name = "RADOLAN Grid y coordinate of projection"
-        nc_fh["y"].standard_name = "projection_y_coordinate"
-        nc_fh["y"].units = "km"
-
-        nc_fh["latitudes"].long_name = "Latitude"
-        nc_fh["latitudes"].standard_name = "latitude"
-        nc_fh["latitudes"].units = "degrees_north"
-
-        nc_fh["longitudes"].long_name = "Longitude"
-        nc_fh["longitudes"].standard_name = "longitude"
-        nc_fh["longitudes"].units = "degrees_east"
+        for variable_name, attributes in coordinate_attributes.items():
+            nc_fh[variable_name].setncatts(attributes)
+        if time_range is not None:
+            nc_fh["time"][:] = netCDF4.date2num(
+                times, units=nc_fh["time"].units, calendar=nc_fh["time"].calendar
+            )
 
         # global attributes
         nc_fh.title = "RADOLAN %s rainfall data" % product_name
@@ -119,6 +315,12 @@ def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
         nc_fh.institution = "Deutscher Wetterdienst (DWD)"
         nc_fh.history = "Created at " + str(datetime.utcnow())
         nc_fh.Conventions = "CF-1.6"
+        nc_fh.flag_encoding = flag_encoding
+        nc_fh.radar_encoding = radar_encoding
+        if radar_encoding == "matrix":
+            nc_fh["radar_site"][0 : len(radar_sites)] = np.array(
+                radar_sites, dtype="object"
+            )
 
         # Add actual coordinate data
         nc_fh["latitudes"][:, :] = radolan_lats
@@ -128,27 +330,164 @@ def create_empty_netcdf(fn, product_name=None, product_config_dict=None):
 
         # Add projection definition
         nc_fh.createVariable("radolan_grid", "f8")
-        nc_fh["radolan_grid"].long_name = "RADOLAN Grid"
-        nc_fh["radolan_grid"].grid_mapping_name = "polar_stereographic"
-        nc_fh["radolan_grid"].semi_major_axis = 6370040.0
-        nc_fh["radolan_grid"].false_easting = 0.0
-        nc_fh["radolan_grid"].false_northing = 0.0
-        nc_fh["radolan_grid"].scale_factor_at_projection_origin = 0.9330127019
-        nc_fh["radolan_grid"].straight_vertical_longitude_from_pole = 10.0
-        nc_fh["radolan_grid"].latitude_of_projection_origin = 90.0
-
-
-def read_in_one_bin_file(f):
-    data, metadata = wrl.io.read_radolan_composite(f, missing=np.nan)
+        nc_fh["radolan_grid"].setncatts(radolan_grid_attributes)
+
+
+def _apply_compression_profile(nc_fh, variable_name, variable_parameters, profile):
+    """Replace the compression parameters of a variable by a profile"""
+    from .radolan_product_netcdf_config import (
+        compression_profiles,
+        compression_parameters,
+    )
+
+    if isinstance(profile, dict):
+        profile = profile.get(variable_name)
+    elif variable_parameters["dimensions"] != ("time", "y", "x"):
+        profile = None
+    if profile is None:
+        return variable_parameters
+    if profile not in compression_profiles:
+        raise ValueError(
+            "`compression_profile` has to be one of %s"
+            % list(compression_profiles.keys())
+        )
+
+    compression = compression_profiles[profile].get("compression")
+    if compression and compression != "zlib":
+        has_filter = getattr(nc_fh, "has_%s_filter" % compression.split("_")[0])
+        if not has_filter():
+            raise ValueError(
+                "Compression `%s` is not supported by the netCDF library" % compression
+            )
+
+    variable_parameters = {
+        name: value
+        for name, value in variable_parameters.items()
+        if name not in compression_parameters
+    }
+    for name, value in compression_profiles[profile].items():
+        if name in ["significant_digits", "quantize_mode", "least_significant_digit"]:
+            if np.dtype(variable_parameters["datatype"]).kind != "f":
+                continue
+        variable_parameters[name] = value
+    return variable_parameters
+
+
+def get_chunksizes(chunk_profile, n_lats, n_lons, n_time=None):
+    """Get the chunk shape of (time, y, x) variables for a chunk profile
+
+    Parameters
+    ----------
+    chunk_profile : str
+        Name of a chunk profile defined in `chunk_profiles`
+    n_lats : int
+        Number of rows of the RADOLAN grid
+    n_lons : int
+        Number of columns of the RADOLAN grid
+    n_time : int, optional
+        Number of time steps if already known. The time chunks are not
+        made longer than that, since compressing the padding of a chunk
+        which is mostly empty is expensive.
+
+    Returns
+    -------
+
+    chunksizes : tuple of int
+
+    """
+    from .radolan_product_netcdf_config import chunk_profiles
+
+    if chunk_profile not in chunk_profiles:
+        raise ValueError(
+            "`chunk_profile` has to be one of %s" % list(chunk_profiles.keys())
+        )
+    profile = chunk_profiles[chunk_profile]
+    chunk_time = profile["time"]
+    if n_time:
+        chunk_time = min(chunk_time, n_time)
+    return (
+        chunk_time,
+        min(profile["y"] or n_lats, n_lats),
+        min(profile["x"] or n_lons, n_lons),
+    )
+
+
+def read_in_one_bin_file(f, cache=None):
+    """Read in one RADOLAN binary file
+
+    The products listed in `radolan_bin_decoder.supported_products` are
+    decoded with the decoder of this package, all others via
+    `wradlib.io.read_radolan_composite`.
+
+    Parameters
+    ----------
+    f : str, os.PathLike or file-like
+        Path to the RADOLAN binary file, which can be gzip compressed,
+        or a file-like object of the uncompressed file
+    cache : DecodedFileCache, optional
+        Cache from which the data of a path is returned if it was already
+        decoded. The returned arrays are read-only whenever a cache is
+        used, also if the file was just decoded, since they are shared
+        with the cache.
+
+    Returns
+    -------
+
+    data : np.ndarray
+        RADOLAN data with NaN for missing values
+    metadata : dict
+        Metadata as returned by `wradlib.io.read_radolan_composite`
+
+    """
+    key = None
+    if cache is not None and radolan_bin_decoder.is_path(f):
+        with _stage("cache") as s:
+            key = cache.get_key(f)
+            cached = cache.get(key)
+            if cached is not None:
+                s.bytes_out = cached[0].nbytes
+                return cached
+
+    with _stage("read") as s:
+        content = radolan_bin_decoder.read_content(f)
+        if s.active and radolan_bin_decoder.is_path(f):
+            s.bytes_in = os.path.getsize(f)
+        else:
+            s.bytes_in = len(content)
+        s.bytes_out = len(content)
+
+    with _stage("decode", bytes_in=len(content)) as s:
+        if radolan_bin_decoder.get_producttype(content) in (
+            radolan_bin_decoder.supported_products
+        ):
+            data, metadata = radolan_bin_decoder.decode_radolan_bin(content)
+        else:
+            import wradlib as wrl
+
+            data, metadata = wrl.io.read_radolan_composite(
+                io.BytesIO(content), missing=np.nan
+            )
+        s.bytes_out = data.nbytes
+
+    if key is not None:
+        cache.put(key, data, metadata)
     return data, metadata
 
 
 def append_to_netcdf(fn, data_list, metadata_list):
     """Append RADOLAN data and metadata to existing NetCDF
 
-    WIP!
+    The NetCDF file is opened and closed for each call. For appending
+    many time steps one after another use `RadolanNetCDFWriter`.
 
-    Does currently only work for RADOLAN RW data
+    Parameters
+    ----------
+    fn : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    data_list : list of np.ndarray or np.ndarray
+        RADOLAN data as returned by `read_in_one_bin_file`
+    metadata_list : list of dict or dict
+        RADOLAN metadata as returned by `read_in_one_bin_file`
 
     """
     if type(data_list) != list:
@@ -159,62 +498,705 @@ def append_to_netcdf(fn, data_list, metadata_list):
         metadata_list = [
             metadata_list,
         ]
-    with netCDF4.Dataset(fn, "a") as nc_fh:
-        current_length = len(nc_fh["time"][:])
-        for i, (data, metadata) in enumerate(zip(data_list, metadata_list)):
-            i_new = i + current_length
-            nc_fh["time"][i_new] = netCDF4.date2num(
-                metadata["datetime"],
-                units=nc_fh["time"].units,
-                calendar=nc_fh["time"].calendar,
+    with RadolanNetCDFWriter(fn, flush_interval=len(data_list)) as writer:
+        for data, metadata in zip(data_list, metadata_list):
+            writer.append(data, metadata)
+
+
+class RadolanNetCDFWriter(object):
+    """Append RADOLAN data to an existing NetCDF while keeping it open
+
+    The NetCDF file is only opened once and the current length of the
+    `time` dimension is tracked in memory, so that the cost of appending
+    one time step does not depend on the length of the file. Appended
+    time steps are buffered and written as one block every
+    `flush_interval` time steps. Time steps can also be written to
+    arbitrary indices of the time axis via `write`, e.g. to insert
+    late-arriving data into a gap.
+
+    For files with a fixed-size time axis, see `time_range` of
+    `create_empty_netcdf`, `append` writes each time step to the index
+    ``(datetime - t_start) / interval`` of its time stamp.
+
+    If the body of a ``with`` block raises, the file is closed without
+    writing the buffered time steps, so that the exception is not masked
+    by an error while writing them.
+
+    Parameters
+    ----------
+    fn : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    flush_interval : int, optional
+        Number of buffered time steps after which they are written to
+        the NetCDF file
+    time_axis : tuple, optional
+        Start (datetime.datetime) and interval (datetime.timedelta) of a
+        regular time axis for files with an unlimited time axis. If
+        supplied, `append` writes to the index of the time stamp as for
+        fixed-size time axes and the time of skipped time steps is set,
+        so that the time axis stays regular.
+
+    Examples
+    --------
+    >>> with RadolanNetCDFWriter(fn_netcdf) as writer:
+    ...     for fn in fn_list:
+    ...         writer.append(*read_in_one_bin_file(fn))
+
+    """
+
+    def __init__(self, fn, flush_interval=12, time_axis=None):
+        self.fn = fn
+        self.flush_interval = flush_interval
+        self.current_length = None
+        self.time_axis = time_axis
+        self.producttype = None
+        self.flag_encoding = None
+        self.radar_encoding = None
+        self._is_fixed_length = False
+        self._nc_fh = None
+        self._index_buffer = []
+        self._data_buffer = []
+        self._metadata_buffer = []
+        self._packing_buffers = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(flush=exc_type is None)
+
+    def open(self):
+        import netCDF4
+
+        self._nc_fh = netCDF4.Dataset(self.fn, "a")
+        time_dimension = self._nc_fh.dimensions["time"]
+        self.current_length = time_dimension.size
+        self.producttype = self._nc_fh.producttype
+        self.flag_encoding = _get_flag_encoding(self._nc_fh)
+        self.radar_encoding = _get_radar_encoding(self._nc_fh)
+        if not time_dimension.isunlimited():
+            self.time_axis = _get_fixed_time_axis(self._nc_fh)
+            self._is_fixed_length = True
+
+    def close(self, flush=True):
+        """Close the NetCDF file
+
+        Parameters
+        ----------
+        flush : bool, optional
+            If False, the buffered time steps are discarded instead of
+            written to the NetCDF file
+
+        """
+        if self._nc_fh is not None:
+            try:
+                if flush:
+                    self.flush()
+            finally:
+                self._discard_buffer()
+                self._nc_fh.close()
+                self._nc_fh = None
+
+    def _discard_buffer(self):
+        self._index_buffer, self._data_buffer, self._metadata_buffer = [], [], []
+
+    def append(self, data, metadata):
+        """Append the data and metadata of one time step
+
+        Parameters
+        ----------
+        data : np.ndarray
+        metadata : dict
+
+        """
+        if self.time_axis is not None:
+            i_time = _get_time_index(self.time_axis, metadata["datetime"])
+        else:
+            i_time = self._get_next_index()
+        self.write(data, metadata, i_time)
+
+    def write(self, data, metadata, i_time):
+        """Write the data and metadata of one time step at index `i_time`
+
+        If `i_time` is beyond the end of an unlimited time axis, the time
+        axis is extended and the skipped time steps are left empty. An
+        existing time step at `i_time` is overwritten.
+
+        Parameters
+        ----------
+        data : np.ndarray
+        metadata : dict
+        i_time : int
+
+        """
+        if metadata["producttype"] != self.producttype:
+            raise ValueError(
+                "RADOLAN product of data is `%s` and "
+                "is `%s` in existing NetCDF"
+                % (metadata["producttype"], self.producttype)
+            )
+        if self._is_fixed_length and not 0 <= i_time < self.current_length:
+            raise ValueError(
+                "Time index %d is outside of the fixed time axis of length %d"
+                % (i_time, self.current_length)
+            )
+        if self.flag_encoding == "ragged" and i_time != self._get_next_index():
+            raise NotImplementedError(
+                "Writing time steps out of order is not supported "
+                "for `flag_encoding` ragged"
+            )
+        # Checked before buffering, so that no block is written partially
+        _check_radar_metadata(self.radar_encoding, metadata)
+        self._index_buffer.append(i_time)
+        self._data_buffer.append(data)
+        self._metadata_buffer.append(metadata)
+        if len(self._data_buffer) >= self.flush_interval:
+            self.flush()
+
+    def _get_next_index(self):
+        return max([self.current_length - 1] + self._index_buffer) + 1
+
+    def flush(self):
+        """Write all buffered time steps to the NetCDF file
+
+        Consecutive time steps are written as one block. If the same index
+        was written several times, the last time step is used.
+        """
+        if not self._data_buffer:
+            return
+        n_time = len(self._data_buffer)
+        previous_length = self.current_length
+        for i_start, run in get_consecutive_runs(self._index_buffer):
+            self._write_run(
+                i_start,
+                [self._data_buffer[i] for i in run],
+                [self._metadata_buffer[i] for i in run],
+            )
+        self.current_length = max(self.current_length, max(self._index_buffer) + 1)
+        if self.time_axis is not None:
+            written = set(self._index_buffer)
+            i_gaps = [
+                i
+                for i in range(previous_length, self.current_length)
+                if i not in written
+            ]
+            if i_gaps:
+                _write_times(
+                    self._nc_fh,
+                    i_gaps,
+                    [self.time_axis[0] + i * self.time_axis[1] for i in i_gaps],
+                )
+        self._discard_buffer()
+        with _stage("sync", n_time=n_time) as s:
+            if s.active:
+                size = os.path.getsize(self.fn)
+            self._nc_fh.sync()
+            if s.active:
+                s.bytes_out = os.path.getsize(self.fn) - size
+
+    def _write_run(self, i_start, data_list, metadata_list):
+        """Write consecutive time steps starting at index `i_start`"""
+        _write_block(
+            self._nc_fh,
+            i_start,
+            data_list,
+            metadata_list,
+            buffers=self._packing_buffers,
+        )
+
+
+def get_consecutive_runs(i_times):
+    """Split time indices into runs of consecutive indices
+
+    Parameters
+    ----------
+    i_times : list of int
+        Time indices in any order. For duplicate indices only the last
+        one is used.
+
+    Returns
+    -------
+
+    runs : list of tuple
+        Start index of each run and the positions in `i_times` of the
+        indices of the run, in ascending order of the indices
+
+    """
+    positions = {i_time: i for i, i_time in enumerate(i_times)}
+    i_times_sorted = sorted(positions)
+    runs = []
+    i_run_start = 0
+    for i in range(1, len(i_times_sorted) + 1):
+        if i < len(i_times_sorted) and i_times_sorted[i] == i_times_sorted[i - 1] + 1:
+            continue
+        runs.append(
+            (
+                i_times_sorted[i_run_start],
+                [positions[i_time] for i_time in i_times_sorted[i_run_start:i]],
+            )
+        )
+        i_run_start = i
+    return runs
+
+
+def _get_fixed_time_axis(nc_fh):
+    """Get the start and interval of a pre-filled fixed-size time axis"""
+    import netCDF4
+    from .radolan_product_netcdf_config import radolan_product_netcdf_config
+
+    nc_time = nc_fh["time"]
+    t_start = netCDF4.num2date(
+        nc_time[0],
+        units=nc_time.units,
+        calendar=nc_time.calendar,
+        only_use_cftime_datetimes=False,
+        only_use_python_datetimes=True,
+    )
+    interval = timedelta(
+        seconds=radolan_product_netcdf_config[nc_fh.producttype]["metadata_fixed"][
+            "interval_seconds"
+        ]
+    )
+    return t_start, interval
+
+
+def _get_time_index(time_axis, t):
+    """Get the index of time stamp `t` on a regular time axis"""
+    t_start, interval = time_axis
+    i_time, remainder = divmod(t - t_start, interval)
+    if remainder or i_time < 0:
+        raise ValueError(
+            "Time stamp `%s` is not on the time axis starting at `%s` with "
+            "an interval of %s" % (t, t_start, interval)
+        )
+    return i_time
+
+
+def _write_times(nc_fh, index, times, name="time"):
+    import netCDF4
+
+    nc_fh[name][index] = netCDF4.date2num(
+        times, units=nc_fh[name].units, calendar=nc_fh[name].calendar
+    )
+
+
+def _write_block(nc_fh, i_start, data_list, metadata_list, buffers=None):
+    """Write consecutive time steps starting at index `i_start`
+
+    `buffers` is a dict in which the arrays used for packing the data are
+    kept, so that they can be reused for the next block.
+    """
+    from .radolan_product_netcdf_config import radolan_product_netcdf_config
+
+    n_time = len(data_list)
+    i_end = i_start + n_time
+
+    product_config_dict = radolan_product_netcdf_config[nc_fh.producttype]
+
+    variable_names = list(product_config_dict["variables"].keys())
+    if len(variable_names) != 1:
+        raise NotImplementedError(
+            "Writting the actual RADOLAN data "
+            "to NetCDF is only supported for "
+            "one `variable`."
+        )
+
+    variable_name = variable_names[0]
+    variable_config = product_config_dict["variables"][variable_name]
+
+    nc_var = nc_fh[variable_name]
+    shape = (n_time,) + data_list[0].shape
+    with _stage("pack", n_time=n_time) as s:
+        packed_data = _get_buffer(buffers, "packed_data", shape, nc_var.dtype)
+        float_buffer = _get_buffer(buffers, "float_buffer", shape[1:], "f8")
+        for i, data in enumerate(data_list):
+            pack_data(
+                data, variable_config, out=packed_data[i], float_buffer=float_buffer
             )
+        if s.active:
+            s.bytes_in = sum(data.nbytes for data in data_list)
+        s.bytes_out = packed_data.nbytes
+
+    # The data is already packed, hence netCDF4 must not scale it again
+    with _stage("write_data", n_time=n_time, bytes_in=packed_data.nbytes):
+        nc_var.set_auto_maskandscale(False)
+        try:
+            nc_var[i_start:i_end, :, :] = packed_data
+        finally:
+            nc_var.set_auto_maskandscale(True)
+
+    # TODO: Remove this hardcoding of writing `secondary` and `nodatamask`
+    with _stage("flags", n_time=n_time):
+        _write_flags(nc_fh, i_start, shape, metadata_list)
 
-            product_name = metadata["producttype"]
-            product_config_dict = radolan_product_netcdf_config[product_name]
+    _write_metadata(nc_fh, i_start, metadata_list)
 
-            if product_name != nc_fh.producttype:
+
+def _write_metadata(nc_fh, i_start, metadata_list):
+    """Write time, maxrange and radar locations starting at index `i_start`"""
+    n_time = len(metadata_list)
+    with _stage("write_metadata", n_time=n_time):
+        _write_times(
+            nc_fh,
+            slice(i_start, i_start + n_time),
+            [metadata["datetime"] for metadata in metadata_list],
+        )
+        _write_radar_metadata(nc_fh, i_start, metadata_list)
+
+
+def pack_data(data, variable_config, out, float_buffer=None):
+    """Pack RADOLAN data into the integer data type of a NetCDF variable
+
+    This does the same as the automatic scaling of netCDF4, i.e. applying
+    `add_offset` and `scale_factor` and rounding, but writes to
+    preallocated arrays. NaNs are replaced by the `fill_value`.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        RADOLAN data with NaN for missing values
+    variable_config : dict
+        Config of the variable as in `radolan_product_netcdf_config`
+    out : np.ndarray
+        Array of the shape of `data` and the data type of the variable
+        to which the packed data is written
+    float_buffer : np.ndarray, optional
+        Float array of the shape of `data` used for the intermediate
+        results. It is allocated if not supplied.
+
+    Returns
+    -------
+
+    out : np.ndarray
+
+    """
+    if float_buffer is None:
+        float_buffer = np.empty(data.shape, dtype="f8")
+
+    attributes = variable_config["attributes"]
+    np.subtract(data, attributes.get("add_offset", 0), out=float_buffer)
+    np.divide(float_buffer, attributes.get("scale_factor", 1), out=float_buffer)
+    if out.dtype.kind in "iu":
+        np.rint(float_buffer, out=float_buffer)
+
+    fill_value = variable_config["variable_parameters"].get("fill_value")
+    if fill_value is None:
+        import netCDF4
+
+        fill_value = netCDF4.default_fillvals[out.dtype.str[1:]]
+    np.copyto(float_buffer, fill_value, where=np.isnan(float_buffer))
+
+    np.copyto(out, float_buffer, casting="unsafe")
+    return out
+
+
+def _get_buffer(buffers, name, shape, dtype):
+    """Get an array from `buffers`, only allocating it if required"""
+    if buffers is None:
+        return np.empty(shape, dtype=dtype)
+    buffer = buffers.get(name)
+    if buffer is None or buffer.shape != shape or buffer.dtype != np.dtype(dtype):
+        buffer = np.empty(shape, dtype=dtype)
+        buffers[name] = buffer
+    return buffer
+
+
+def _get_radar_encoding(nc_fh):
+    # Files created before the `radar_encoding` option existed use "string"
+    if "radar_encoding" in nc_fh.ncattrs():
+        return nc_fh.radar_encoding
+    return "string"
+
+
+def _check_radar_metadata(radar_encoding, metadata):
+    """Check that the radar metadata can be stored in the radar encoding"""
+    from .radolan_product_netcdf_config import maxrange_enum
+
+    if radar_encoding == "matrix" and metadata["maxrange"] not in maxrange_enum:
+        raise ValueError(
+            "`maxrange` %s is not in `maxrange_enum`" % metadata["maxrange"]
+        )
+
+
+def _write_radar_metadata(nc_fh, i_start, metadata_list):
+    """Write `maxrange` and the radar sites in the encoding of the NetCDF"""
+    from .radolan_product_netcdf_config import maxrange_enum
+
+    i_end = i_start + len(metadata_list)
+    radar_encoding = _get_radar_encoding(nc_fh)
+
+    if radar_encoding == "string":
+        nc_fh["maxrange"][i_start:i_end] = [
+            int(metadata["maxrange"].split(" ")[0]) for metadata in metadata_list
+        ]
+        nc_fh["radarlocations"][i_start:i_end] = np.array(
+            [" ".join(metadata["radarlocations"]) for metadata in metadata_list],
+            dtype="object",
+        )
+
+    elif radar_encoding == "matrix":
+        nc_fh["maxrange"][i_start:i_end] = np.array(
+            [maxrange_enum[metadata["maxrange"]] for metadata in metadata_list],
+            dtype="u1",
+        )
+        # Sites which are not yet in the file are appended to the unlimited
+        # `radar` dimension. Earlier time steps read as unavailable for them.
+        radar_sites = list(nc_fh["radar_site"][:])
+        n_radar_sites = len(radar_sites)
+        for metadata in metadata_list:
+            for radar_site in metadata["radarlocations"]:
+                if radar_site not in radar_sites:
+                    radar_sites.append(radar_site)
+        if len(radar_sites) > n_radar_sites:
+            nc_fh["radar_site"][n_radar_sites : len(radar_sites)] = np.array(
+                radar_sites[n_radar_sites:], dtype="object"
+            )
+        nc_fh["radar_available"][i_start:i_end, 0 : len(radar_sites)] = (
+            get_radar_availability(radar_sites, metadata_list)
+        )
+
+    else:
+        raise NotImplementedError(
+            "Writing radar sites with `radar_encoding` %s is not supported"
+            % radar_encoding
+        )
+
+
+def get_radar_availability(radar_sites, metadata_list):
+    """Get the availability of the radar sites for several time steps
+
+    Parameters
+    ----------
+    radar_sites : list of str
+        Codes of the radar sites, e.g. `radar_sites` of the config
+    metadata_list : list of dict
+        RADOLAN metadata as returned by `read_in_one_bin_file`
+
+    Returns
+    -------
+
+    radar_available : np.ndarray
+        `u1` array with shape (time, radar), 1 if the site is listed in
+        the `radarlocations` of the time step and 0 otherwise
+
+    """
+    i_sites = {radar_site: i for i, radar_site in enumerate(radar_sites)}
+    radar_available = np.zeros((len(metadata_list), len(radar_sites)), dtype="u1")
+    for i, metadata in enumerate(metadata_list):
+        for radar_site in metadata["radarlocations"]:
+            if radar_site not in i_sites:
                 raise ValueError(
-                    "RADOLAN product of data is `%s` and "
-                    "is `%s` in existing NetCDF" % (product_name, nc_fh.producttype)
+                    "Radar site `%s` is not in the radar sites of the file. "
+                    "Add it to `radar_sites` and create a new file." % radar_site
                 )
+            radar_available[i, i_sites[radar_site]] = 1
+    return radar_available
+
+
+def read_radar_availability(nc_fh, time_index=slice(None)):
+    """Read the availability of the radar sites from a NetCDF file
+
+    Parameters
+    ----------
+    nc_fh : netCDF4.Dataset or str
+        NetCDF file created via `create_empty_netcdf` or its filename
+    time_index : int or slice, optional
+        The time steps to read. Default is to read all time steps.
+
+    Returns
+    -------
+
+    radar_sites : list of str
+        Codes of the radar sites
+    radar_available : np.ndarray of bool
+        Array with shape (radar,) for an integer `time_index` and
+        (time, radar) for a slice. Time steps without data are False.
+
+    """
+    import netCDF4
+    from .radolan_product_netcdf_config import radar_sites as config_radar_sites
+
+    if isinstance(nc_fh, str):
+        with netCDF4.Dataset(nc_fh, "r") as nc_fh_opened:
+            return read_radar_availability(nc_fh_opened, time_index)
+
+    radar_encoding = _get_radar_encoding(nc_fh)
+
+    if radar_encoding == "matrix":
+        radar_available = nc_fh["radar_available"][time_index, :]
+        return list(nc_fh["radar_site"][:]), np.ma.filled(radar_available, 0) == 1
+
+    elif radar_encoding == "string":
+        radarlocations = np.atleast_1d(nc_fh["radarlocations"][time_index])
+        metadata_list = [
+            {"radarlocations": (locations or "").split()}
+            for locations in radarlocations
+        ]
+        # Sites which are not in the config are appended
+        radar_sites = list(config_radar_sites)
+        for metadata in metadata_list:
+            for radar_site in metadata["radarlocations"]:
+                if radar_site not in radar_sites:
+                    radar_sites.append(radar_site)
+        radar_available = get_radar_availability(radar_sites, metadata_list) == 1
+        if isinstance(time_index, (int, np.integer)):
+            radar_available = radar_available[0]
+        return radar_sites, radar_available
+
+    else:
+        raise NotImplementedError(
+            "Reading radar sites with `radar_encoding` %s is not supported"
+            % radar_encoding
+        )
+
 
-            variable_names = list(product_config_dict["variables"].keys())
-            if len(variable_names) != 1:
-                raise NotImplementedError(
-                    "Writting the actual RADOLAN data "
-                    "to NetCDF is only supported for "
-                    "one `variable`."
+def _get_flag_encoding(nc_fh):
+    # Files created before the `flag_encoding` option existed use "dense"
+    if "flag_encoding" in nc_fh.ncattrs():
+        return nc_fh.flag_encoding
+    return "dense"
+
+
+def _write_flags(nc_fh, i_start, shape, metadata_list):
+    """Write the RADOLAN pixel flags in the encoding of the NetCDF file"""
+    from .radolan_product_netcdf_config import flag_masks
+
+    i_end = i_start + shape[0]
+    flag_encoding = _get_flag_encoding(nc_fh)
+
+    if flag_encoding == "none":
+        return
+
+    elif flag_encoding in ("dense", "packed"):
+        for variable_name, flags in get_flag_grids(
+            flag_encoding, shape, metadata_list
+        ).items():
+            nc_fh[variable_name][i_start:i_end, :, :] = flags
+
+    elif flag_encoding == "ragged":
+        # Contiguous ragged arrays require that the time steps are written
+        # in order, since the offsets are derived from the counts
+        for flag_name in flag_masks:
+            counts = [len(metadata[flag_name]) for metadata in metadata_list]
+            i_sample_start = nc_fh.dimensions[flag_name + "_sample"].size
+            i_sample_end = i_sample_start + sum(counts)
+            nc_fh[flag_name + "_count"][i_start:i_end] = counts
+            if i_sample_end > i_sample_start:
+                nc_fh[flag_name][i_sample_start:i_sample_end] = np.concatenate(
+                    [metadata[flag_name] for metadata in metadata_list]
                 )
 
-            variable_name = variable_names[0]
-            variable_config = product_config_dict["variables"][variable_name]
+    else:
+        raise NotImplementedError(
+            "Writing flags with `flag_encoding` %s is not supported" % flag_encoding
+        )
+
+
+def get_flag_grids(flag_encoding, shape, metadata_list):
+    """Get the grids of the RADOLAN pixel flags of several time steps
+
+    Parameters
+    ----------
+    flag_encoding : str
+        "dense" or "packed", see `create_empty_netcdf`
+    shape : tuple of int
+        Shape (time, y, x) of the grids
+    metadata_list : list of dict
+        RADOLAN metadata as returned by `read_in_one_bin_file`
+
+    Returns
+    -------
+
+    flag_grids : dict
+        Grid of each flag variable, i.e. bool grids of each flag for "dense"
+        and one `u1` grid `flags` for "packed"
+
+    """
+    from .radolan_product_netcdf_config import flag_masks
+
+    n_pixels = shape[1] * shape[2]
+    if flag_encoding == "dense":
+        flag_grids = {}
+        for flag_name in flag_masks:
+            flags = np.zeros((shape[0], n_pixels), dtype="bool")
+            for i, metadata in enumerate(metadata_list):
+                flags[i, metadata[flag_name]] = True
+            flag_grids[flag_name] = flags.reshape(shape)
+        return flag_grids
+
+    elif flag_encoding == "packed":
+        flags = np.zeros((shape[0], n_pixels), dtype="u1")
+        for i, metadata in enumerate(metadata_list):
+            for flag_name, flag_mask in flag_masks.items():
+                flags[i, metadata[flag_name]] |= flag_mask
+        return {"flags": flags.reshape(shape)}
+
+    raise NotImplementedError(
+        "Flag grids are not used for `flag_encoding` %s" % flag_encoding
+    )
+
+
+def read_flag(nc_fh, flag_name, time_index=slice(None)):
+    """Read one RADOLAN pixel flag from a NetCDF file
+
+    Parameters
+    ----------
+    nc_fh : netCDF4.Dataset or str
+        NetCDF file created via `create_empty_netcdf` or its filename
+    flag_name : str
+        One of "secondary", "nodatamask" or "cluttermask"
+    time_index : int or slice, optional
+        The time steps to read. Default is to read all time steps.
+
+    Returns
+    -------
+
+    flag : np.ndarray of bool
+        Array with shape (y, x) for an integer `time_index` and
+        (time, y, x) for a slice
+
+    """
+    import netCDF4
+    from .radolan_product_netcdf_config import flag_masks
+
+    if flag_name not in flag_masks:
+        raise ValueError("`flag_name` has to be one of %s" % list(flag_masks.keys()))
 
-            if "fill_value" in variable_config["variable_parameters"]:
-                fill_value = variable_config["variable_parameters"]["fill_value"]
-                offset = variable_config["attributes"]["add_offset"]
-                scale_factor = variable_config["attributes"]["scale_factor"]
+    if isinstance(nc_fh, str):
+        with netCDF4.Dataset(nc_fh, "r") as nc_fh_opened:
+            return read_flag(nc_fh_opened, flag_name, time_index)
 
-                fill_value_float = fill_value * scale_factor + offset
+    flag_encoding = _get_flag_encoding(nc_fh)
 
-                temp_data = data.copy()
-                temp_data[np.isnan(temp_data)] = fill_value_float
-            else:
-                temp_data = data
-            nc_fh[variable_name][i_new, :, :] = temp_data
+    if flag_encoding == "dense":
+        flag = nc_fh[flag_name][time_index, :, :]
+        return np.ma.filled(flag, 0) != 0
 
-            # TODO: Remove this hardcoding of writing `secondary` and `nodatamask`
-            secondary = np.zeros_like(data, dtype="bool").flatten()
-            secondary[metadata["secondary"]] = True
-            nc_fh["secondary"][i_new, :, :] = secondary.reshape(data.shape)
+    elif flag_encoding == "packed":
+        flags = nc_fh["flags"][time_index, :, :]
+        return (np.ma.filled(flags, 0) & flag_masks[flag_name]) != 0
 
-            nodatamask = np.zeros_like(data, dtype="bool").flatten()
-            nodatamask[metadata["nodatamask"]] = True
-            nc_fh["nodatamask"][i_new, :, :] = nodatamask.reshape(data.shape)
+    elif flag_encoding == "ragged":
+        shape = (len(nc_fh.dimensions["y"]), len(nc_fh.dimensions["x"]))
+        counts = np.ma.filled(nc_fh[flag_name + "_count"][:], 0)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        time_indices = np.arange(len(counts))[time_index]
+        if time_indices.size == 0:
+            return np.zeros((0,) + shape, dtype="bool")
+        # Only read the range of indices belonging to the requested time steps
+        i_sample_start = offsets[time_indices.min()]
+        i_sample_end = offsets[time_indices.max() + 1]
+        indices = nc_fh[flag_name][i_sample_start:i_sample_end]
 
-            cluttermask = np.zeros_like(data, dtype="bool").flatten()
-            cluttermask[metadata["cluttermask"]] = True
-            nc_fh["cluttermask"][i_new, :, :] = cluttermask.reshape(data.shape)
+        flags = np.zeros((time_indices.size, shape[0] * shape[1]), dtype="bool")
+        for i, i_time in enumerate(time_indices.flat):
+            i_first = offsets[i_time] - i_sample_start
+            i_last = offsets[i_time + 1] - i_sample_start
+            flags[i, indices[i_first:i_last]] = True
+        return flags.reshape(time_indices.shape + shape)
 
-            # TODO make this more flexible and also test for it !!!
-            nc_fh["maxrange"][i_new] = int(metadata["maxrange"].split(" ")[0])
-            nc_fh["radarlocations"][i_new] = " ".join(metadata["radarlocations"])
+    else:
+        raise NotImplementedError(
+            "Reading flags with `flag_encoding` %s is not supported" % flag_encoding
+        )
@@ -0,0 +1,315 @@
+from datetime import datetime, timedelta
+import numpy as np
+
+from .radolan_to_netcdf import (
+    get_radolan_coordinates,
+    get_chunksizes,
+    get_consecutive_runs,
+    get_flag_grids,
+    pack_data,
+    _get_time_index,
+)
+
+# `zarr` is an optional dependency and only imported in the functions which
+# need it. The layout of the Zarr stores is defined by the same product
+# configuration as the layout of the NetCDF files.
+
+
+def create_empty_zarr(
+    store,
+    product_name=None,
+    product_config_dict=None,
+    flag_encoding="dense",
+    coordinate_cache_dir=None,
+    chunk_profile=None,
+    time_range=None,
+):
+    """Create an empty Zarr store for the desired RADOLAN product
+
+    The arrays and their attributes are the same as the variables created
+    by `create_empty_netcdf`, so that both can be read the same way, e.g.
+    via `xarray`. The (time, y, x) arrays have one chunk per time step by
+    default, so that each time step is written independently.
+
+    Parameters
+    ----------
+    store : str or zarr store
+        Path of the directory store or any store supported by `zarr`
+    product_name : str , optional
+        The two-character RADOLAN product name, e.g. 'RW'
+    product_config_dict : dict, optional
+        Dictionary holding the parameters of the variables, see
+        `create_empty_netcdf`
+    flag_encoding : str, optional
+        "dense" or "packed", see `create_empty_netcdf`. "ragged" is not
+        supported, since it requires writing the time steps in order.
+    coordinate_cache_dir : str, optional
+        Directory for caching the RADOLAN grid coordinates on disk, see
+        `get_radolan_coordinates`
+    chunk_profile : str, optional
+        Name of a chunk profile from `chunk_profiles`
+    time_range : tuple of datetime.datetime, optional
+        First and last time stamp of the period covered by the store. If
+        supplied, the `time` axis has a fixed size and the time steps are
+        written to the index of their time stamp. This allows several
+        processes to write to the store at the same time, as long as they
+        write disjoint sets of time chunks.
+
+    """
+    import zarr
+    import netCDF4
+    from .radolan_product_netcdf_config import (
+        radolan_product_netcdf_config,
+        flag_masks,
+        flag_encodings,
+        coordinate_attributes,
+        radolan_grid_attributes,
+    )
+
+    if not product_name:
+        raise ValueError("A product_name has to be supplied.")
+    if product_config_dict is None:
+        product_config_dict = radolan_product_netcdf_config[product_name]
+    if flag_encoding not in ("dense", "packed"):
+        raise ValueError(
+            "`flag_encoding` has to be `dense` or `packed` for Zarr stores"
+        )
+
+    n_lons = product_config_dict["metadata_fixed"]["n_lons"]
+    n_lats = product_config_dict["metadata_fixed"]["n_lats"]
+
+    if time_range is not None:
+        interval = timedelta(
+            seconds=product_config_dict["metadata_fixed"]["interval_seconds"]
+        )
+        n_time = (time_range[1] - time_range[0]) // interval + 1
+        if n_time < 1:
+            raise ValueError("The end of `time_range` is before its start")
+    else:
+        n_time = 0
+
+    if chunk_profile is not None:
+        chunksizes = get_chunksizes(
+            chunk_profile, n_lats=n_lats, n_lons=n_lons, n_time=n_time
+        )
+    else:
+        chunksizes = (1, n_lats, n_lons)
+    dimension_sizes = {"time": n_time, "y": n_lats, "x": n_lons}
+
+    variables = dict(product_config_dict["variables"])
+    variables.update(
+        {
+            variable_name: variable_config
+            for variable_name, variable_config in product_config_dict[
+                "metadata_per_timestamp"
+            ].items()
+            if variable_name not in flag_masks
+        }
+    )
+    variables.update(flag_encodings[flag_encoding]["variables"])
+
+    radolan_x, radolan_y, radolan_lats, radolan_lons = get_radolan_coordinates(
+        n_lats=n_lats, n_lons=n_lons, cache_dir=coordinate_cache_dir
+    )
+
+    group = zarr.open_group(store, mode="w")
+
+    for variable_name, variable_config in variables.items():
+        variable_parameters = variable_config["variable_parameters"]
+        dimensions = variable_parameters["dimensions"]
+        # The config uses ("time") for some variables, which is a string
+        if isinstance(dimensions, str):
+            dimensions = (dimensions,)
+
+        if dimensions == ("time", "y", "x"):
+            chunks = chunksizes
+        else:
+            chunks = tuple(
+                chunksizes[0] if dimension == "time" else dimension_sizes[dimension]
+                for dimension in dimensions
+            )
+
+        datatype = variable_parameters["datatype"]
+        fill_value = variable_parameters.get("fill_value")
+        if datatype is str:
+            fill_value = ""
+        elif fill_value is None:
+            fill_value = netCDF4.default_fillvals[np.dtype(datatype).str[1:]]
+
+        attributes = {
+            name: value.tolist() if isinstance(value, np.ndarray) else value
+            for name, value in variable_config["attributes"].items()
+        }
+        if datatype is not str:
+            attributes["_FillValue"] = fill_value
+
+        array_parameters = {}
+        if variable_parameters.get("zlib"):
+            array_parameters["compressors"] = zarr.codecs.GzipCodec(
+                level=variable_parameters.get("complevel", 4)
+            )
+        group.create_array(
+            variable_name,
+            shape=tuple(dimension_sizes[dimension] for dimension in dimensions),
+            chunks=chunks,
+            dtype=datatype,
+            fill_value=fill_value,
+            dimension_names=dimensions,
+            attributes=attributes,
+            **array_parameters
+        )
+
+    group.create_array(
+        "time",
+        shape=(n_time,),
+        chunks=(chunksizes[0],),
+        dtype="f8",
+        fill_value=np.nan,
+        dimension_names=("time",),
+        attributes=coordinate_attributes["time"],
+    )
+    for variable_name, dimensions, values in [
+        ("x", ("x",), radolan_x),
+        ("y", ("y",), radolan_y),
+        ("latitudes", ("y", "x"), radolan_lats),
+        ("longitudes", ("y", "x"), radolan_lons),
+    ]:
+        group.create_array(
+            variable_name,
+            shape=values.shape,
+            dtype="f8",
+            dimension_names=dimensions,
+            attributes=coordinate_attributes[variable_name],
+        )
+        group[variable_name][...] = values
+    group.create_array(
+        "radolan_grid",
+        shape=(),
+        dtype="f8",
+        dimension_names=(),
+        attributes=radolan_grid_attributes,
+    )
+
+    group.attrs.update(
+        {
+            "title": "RADOLAN %s rainfall data" % product_name,
+            "producttype": product_name,
+            "institution": "Deutscher Wetterdienst (DWD)",
+            "history": "Created at " + str(datetime.utcnow()),
+            "Conventions": "CF-1.6",
+            "flag_encoding": flag_encoding,
+        }
+    )
+    if time_range is not None:
+        group.attrs["time_range"] = [t.isoformat() for t in time_range]
+        group["time"][:] = netCDF4.date2num(
+            [time_range[0] + i * interval for i in range(n_time)],
+            units=coordinate_attributes["time"]["units"],
+            calendar=coordinate_attributes["time"]["calendar"],
+        )
+
+
+def append_to_zarr(store, data_list, metadata_list):
+    """Append RADOLAN data and metadata to an existing Zarr store
+
+    For stores with a fixed time axis, see `time_range` of
+    `create_empty_zarr`, each time step is written to the index of its
+    time stamp, otherwise the time axis is extended. Only stores with a
+    fixed time axis can be written by several processes at once.
+
+    Parameters
+    ----------
+    store : str or zarr store
+        Store created via `create_empty_zarr`
+    data_list : list of np.ndarray or np.ndarray
+        RADOLAN data as returned by `read_in_one_bin_file`
+    metadata_list : list of dict or dict
+        RADOLAN metadata as returned by `read_in_one_bin_file`
+
+    """
+    import zarr
+    from .radolan_product_netcdf_config import radolan_product_netcdf_config
+
+    if type(data_list) != list:
+        data_list = [data_list]
+    if type(metadata_list) != list:
+        metadata_list = [metadata_list]
+
+    group = zarr.open_group(store, mode="r+")
+    producttype = group.attrs["producttype"]
+    for metadata in metadata_list:
+        if metadata["producttype"] != producttype:
+            raise ValueError(
+                "RADOLAN product of data is `%s` and is `%s` in existing Zarr store"
+                % (metadata["producttype"], producttype)
+            )
+
+    n_time = group["time"].shape[0]
+    if "time_range" in group.attrs:
+        time_axis = (
+            datetime.fromisoformat(group.attrs["time_range"][0]),
+            timedelta(
+                seconds=radolan_product_netcdf_config[producttype]["metadata_fixed"][
+                    "interval_seconds"
+                ]
+            ),
+        )
+        i_times = [
+            _get_time_index(time_axis, metadata["datetime"])
+            for metadata in metadata_list
+        ]
+        for i_time in i_times:
+            if not 0 <= i_time < n_time:
+                raise ValueError(
+                    "Time index %d is outside of the fixed time axis of length %d"
+                    % (i_time, n_time)
+                )
+    else:
+        i_times = list(range(n_time, n_time + len(data_list)))
+        for _, array in group.arrays():
+            dimension_names = array.metadata.dimension_names
+            if dimension_names and dimension_names[0] == "time":
+                array.resize((n_time + len(data_list),) + array.shape[1:])
+
+    for i_start, run in get_consecutive_runs(i_times):
+        _write_block(
+            group,
+            i_start,
+            [data_list[i] for i in run],
+            [metadata_list[i] for i in run],
+        )
+
+
+def _write_block(group, i_start, data_list, metadata_list):
+    """Write consecutive time steps starting at index `i_start`"""
+    import netCDF4
+    from .radolan_product_netcdf_config import radolan_product_netcdf_config
+
+    i_end = i_start + len(data_list)
+    shape = (len(data_list),) + data_list[0].shape
+
+    group["time"][i_start:i_end] = netCDF4.date2num(
+        [metadata["datetime"] for metadata in metadata_list],
+        units=group["time"].attrs["units"],
+        calendar=group["time"].attrs["calendar"],
+    )
+
+    product_config_dict = radolan_product_netcdf_config[group.attrs["producttype"]]
+    for variable_name, variable_config in product_config_dict["variables"].items():
+        packed_data = np.empty(shape, dtype=group[variable_name].dtype)
+        for i, data in enumerate(data_list):
+            pack_data(data, variable_config, out=packed_data[i])
+        group[variable_name][i_start:i_end] = packed_data
+
+    for variable_name, flags in get_flag_grids(
+        group.attrs["flag_encoding"], shape, metadata_list
+    ).items():
+        group[variable_name][i_start:i_end] = flags.astype(group[variable_name].dtype)
+
+    group["maxrange"][i_start:i_end] = [
+        int(metadata["maxrange"].split(" ")[0]) for metadata in metadata_list
+    ]
+    group["radarlocations"][i_start:i_end] = np.array(
+        [" ".join(metadata["radarlocations"]) for metadata in metadata_list],
+        dtype="object",
+    )
@@ -0,0 +1,378 @@
+import threading
+import numpy as np
+
+from .radolan_to_netcdf import read_flag, _get_flag_encoding
+from .extract import _get_chunk_shape
+
+
+def open_radolan_netcdf(
+    fn, variable_name="rainfall_amount", dtype="f4", mask_flags=None
+):
+    """Open a (time, y, x) variable of a NetCDF created via `create_empty_netcdf`
+
+    No data is read until the returned array is indexed. It can be sliced
+    via `sel` by time stamps and via `isel` by indices into a smaller view
+    without reading data, read in blocks of time steps via `iter_blocks`
+    or wrapped as dask array or xarray DataArray.
+
+    Parameters
+    ----------
+    fn : str
+        Filename of the NetCDF file
+    variable_name : str, optional
+        Name of the (time, y, x) variable
+    dtype : str, optional
+        Data type of the returned data. Floats are unpacked via the
+        `scale_factor` and `add_offset` of the variable and missing values
+        are NaN. "raw" returns the values as stored in the file, e.g. the
+        packed `i2` values with the fill value of the variable for missing
+        values, which needs a fourth of the memory of "f8".
+    mask_flags : list of str, optional
+        Names of RADOLAN pixel flags, e.g. ["nodatamask", "cluttermask"],
+        whose pixels are treated as missing values
+
+    Returns
+    -------
+
+    array : RadolanArray
+        Lazy array, which should be closed via `close` or used as
+        context manager
+
+    Examples
+    --------
+    >>> with open_radolan_netcdf(fn_netcdf) as array:
+    ...     view = array.sel(time=slice(t_start, t_end)).isel(
+    ...         y=slice(400, 500), x=slice(300, 400)
+    ...     )
+    ...     for times, block in view.iter_blocks(n_time=288):
+    ...         daily_max = np.nanmax(block, axis=0)
+
+    """
+    return RadolanArray(_RadolanNetCDFFile(fn), variable_name, dtype, mask_flags)
+
+
+class _RadolanNetCDFFile(object):
+    """Open NetCDF file and time stamps shared by all views of an array
+
+    netCDF4 is not thread-safe, hence all reads of all views have to hold
+    `lock`. It is reentrant, since the reads of `to_dask` hold it already.
+    """
+
+    def __init__(self, fn):
+        import netCDF4
+
+        self.fn = fn
+        self.lock = threading.RLock()
+        self.nc_fh = netCDF4.Dataset(fn, "r")
+        nc_time = self.nc_fh["time"]
+        self.time_values = np.ma.filled(nc_time[:].astype("f8"), np.nan)
+        self.times = np.full(self.time_values.shape, np.datetime64("NaT"), "M8[s]")
+        is_valid = ~np.isnan(self.time_values)
+        if is_valid.any():
+            self.times[is_valid] = netCDF4.num2date(
+                self.time_values[is_valid],
+                units=nc_time.units,
+                calendar=nc_time.calendar,
+                only_use_cftime_datetimes=False,
+                only_use_python_datetimes=True,
+            ).astype("M8[s]")
+
+    def close(self):
+        if self.nc_fh.isopen():
+            self.nc_fh.close()
+
+
+class RadolanArray(object):
+    """Lazy view of a window of a (time, y, x) variable, see `open_radolan_netcdf`
+
+    Indexing via `[]` reads the data of the view, `sel` and `isel` return
+    a smaller view without reading data.
+    """
+
+    def __init__(self, source, variable_name, dtype, mask_flags, index=None):
+        self._source = source
+        self.variable_name = variable_name
+        self.mask_flags = list(mask_flags or [])
+        self._nc_var = source.nc_fh[variable_name]
+        if self._nc_var.dimensions != ("time", "y", "x"):
+            raise ValueError(
+                "`%s` is not a (time, y, x) variable, but %s"
+                % (variable_name, self._nc_var.dimensions)
+            )
+        self._is_raw = dtype == "raw"
+        self.dtype = self._nc_var.dtype if self._is_raw else np.dtype(dtype)
+        if index is None:
+            index = tuple(slice(0, n) for n in self._nc_var.shape)
+        self._index = index
+
+        attributes = {
+            name: self._nc_var.getncattr(name) for name in self._nc_var.ncattrs()
+        }
+        self._scale_factor = attributes.get("scale_factor", 1)
+        self._add_offset = attributes.get("add_offset", 0)
+        self._fill_value = attributes.get("_FillValue")
+        if self._fill_value is None and self._nc_var.dtype.kind in "iuf":
+            import netCDF4
+
+            self._fill_value = netCDF4.default_fillvals[self._nc_var.dtype.str[1:]]
+        self.attributes = {
+            name: value
+            for name, value in attributes.items()
+            if name not in ("scale_factor", "add_offset", "_FillValue")
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the NetCDF file, which closes all views of it"""
+        self._source.close()
+
+    def __repr__(self):
+        return "<RadolanArray %s %s %s of %s>" % (
+            self.variable_name,
+            self.shape,
+            self.dtype,
+            self._source.fn,
+        )
+
+    @property
+    def shape(self):
+        return tuple(s.stop - s.start for s in self._index)
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def times(self):
+        """Time stamps of the view as `datetime64`, NaT for empty time steps"""
+        return self._source.times[self._index[0]]
+
+    @property
+    def y(self):
+        with self._source.lock:
+            return self._source.nc_fh["y"][self._index[1]].data
+
+    @property
+    def x(self):
+        with self._source.lock:
+            return self._source.nc_fh["x"][self._index[2]].data
+
+    def isel(self, time=None, y=None, x=None):
+        """Get a view of the index ranges of this view
+
+        Parameters
+        ----------
+        time, y, x : slice, optional
+            Slices with step 1 relative to this view
+
+        """
+        index = tuple(
+            _compose_slices(s, key, n)
+            for s, key, n in zip(self._index, (time, y, x), self.shape)
+        )
+        return RadolanArray(
+            self._source, self.variable_name, self._get_dtype(), self.mask_flags, index
+        )
+
+    def sel(self, time=None, y=None, x=None):
+        """Get a view of the time stamps of this view
+
+        Parameters
+        ----------
+        time : slice of datetime.datetime, optional
+            First and last time stamp, which are both included
+        y, x : slice, optional
+            Slices of indices relative to this view, as for `isel`
+
+        """
+        if time is not None:
+            times = self.times
+            is_selected = ~np.isnat(times)
+            if time.start is not None:
+                is_selected &= times >= np.datetime64(time.start, "s")
+            if time.stop is not None:
+                is_selected &= times <= np.datetime64(time.stop, "s")
+            i_selected = np.flatnonzero(is_selected)
+            if i_selected.size > 0:
+                time = slice(i_selected[0], i_selected[-1] + 1)
+            else:
+                time = slice(0, 0)
+        return self.isel(time=time, y=y, x=x)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (4 - len(key)) + key[i + 1 :]
+        key = key + (slice(None),) * (3 - len(key))
+        squeeze_axes = tuple(i for i, k in enumerate(key) if _is_integer(k))
+        key = tuple(slice(k, k + 1 or None) if _is_integer(k) else k for k in key)
+        view = self.isel(*key)
+        data = view._read()
+        if squeeze_axes:
+            data = data.squeeze(axis=squeeze_axes)
+        return data
+
+    def __array__(self, dtype=None, copy=None):
+        data = self._read()
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+    def read(self):
+        """Read the data of the view"""
+        return self._read()
+
+    def iter_blocks(self, n_time=None, max_memory=100e6):
+        """Read the view in blocks of time steps
+
+        The blocks are aligned to the time chunks of the file, so that
+        each chunk is only read once.
+
+        Parameters
+        ----------
+        n_time : int, optional
+            Number of time steps per block, which is rounded to complete
+            time chunks. Defaults to as many time chunks as fit into
+            `max_memory`.
+        max_memory : float, optional
+            Approximate maximum size in bytes of one block
+
+        Yields
+        ------
+        times : np.ndarray of datetime64
+        block : np.ndarray
+
+        """
+        chunk_time = _get_chunk_shape(self._nc_var)[0]
+        if n_time is None:
+            bytes_per_time_step = self.shape[1] * self.shape[2] * self.dtype.itemsize
+            n_time = max(1, int(max_memory // max(bytes_per_time_step, 1)))
+        n_time = max(1, n_time // chunk_time) * chunk_time
+
+        time_slice = self._index[0]
+        i_time = time_slice.start
+        while i_time < time_slice.stop:
+            i_time_end = min((i_time // n_time + 1) * n_time, time_slice.stop)
+            view = self.isel(
+                time=slice(i_time - time_slice.start, i_time_end - time_slice.start)
+            )
+            yield view.times, view._read()
+            i_time = i_time_end
+
+    def to_dask(self, chunks=None):
+        """Get the view as dask array
+
+        Parameters
+        ----------
+        chunks : tuple, optional
+            Chunks of the dask array. Defaults to the chunks of the file.
+
+        """
+        import dask.array
+
+        if chunks is None:
+            chunks = tuple(
+                min(chunk, max(n, 1))
+                for chunk, n in zip(_get_chunk_shape(self._nc_var), self.shape)
+            )
+        # netCDF4 is not thread-safe, hence all views of the file share
+        # one lock
+        return dask.array.from_array(
+            self,
+            chunks=chunks,
+            lock=self._source.lock,
+            asarray=True,
+            meta=np.empty((0, 0, 0), dtype=self.dtype),
+        )
+
+    def to_xarray(self, chunks=None):
+        """Get the view as xarray DataArray with its coordinates
+
+        Parameters
+        ----------
+        chunks : tuple or str, optional
+            If supplied, the data is a dask array with these chunks, see
+            `to_dask`, "auto" uses the chunks of the file. Otherwise the
+            data is read.
+
+        """
+        import xarray as xr
+
+        if chunks is None:
+            data = self._read()
+        else:
+            data = self.to_dask(chunks=None if chunks == "auto" else chunks)
+        return xr.DataArray(
+            data,
+            dims=("time", "y", "x"),
+            coords={"time": self.times, "y": self.y, "x": self.x},
+            name=self.variable_name,
+            attrs=self.attributes,
+        )
+
+    def _get_dtype(self):
+        return "raw" if self._is_raw else self.dtype
+
+    def _read(self):
+        # The variable is shared by all views, hence also switching off
+        # the automatic scaling requires the lock
+        with self._source.lock:
+            nc_var = self._nc_var
+            nc_var.set_auto_maskandscale(False)
+            try:
+                raw = nc_var[self._index]
+            finally:
+                nc_var.set_auto_maskandscale(True)
+            raw = np.asarray(raw)
+
+            is_missing = None
+            if self._fill_value is not None:
+                is_missing = raw == self._fill_value
+            for flag_name in self.mask_flags:
+                is_flagged = self._read_flag(flag_name)
+                is_missing = (
+                    is_flagged if is_missing is None else is_missing | is_flagged
+                )
+
+        if self._is_raw:
+            if is_missing is not None and self.mask_flags:
+                raw[is_missing] = self._fill_value
+            return raw
+
+        data = raw.astype(self.dtype)
+        if self._scale_factor != 1:
+            data *= self.dtype.type(self._scale_factor)
+        if self._add_offset != 0:
+            data += self.dtype.type(self._add_offset)
+        if is_missing is not None:
+            data[is_missing] = np.nan
+        return data
+
+    def _read_flag(self, flag_name):
+        nc_fh = self._source.nc_fh
+        time_slice, y_slice, x_slice = self._index
+        if _get_flag_encoding(nc_fh) == "dense":
+            flags = nc_fh[flag_name][time_slice, y_slice, x_slice]
+            return np.ma.filled(flags, 0) != 0
+        return read_flag(nc_fh, flag_name, time_index=time_slice)[:, y_slice, x_slice]
+
+
+def _is_integer(key):
+    return isinstance(key, (int, np.integer))
+
+
+def _compose_slices(s, key, n):
+    """Get the absolute slice of `key` relative to the slice `s` of length `n`"""
+    if key is None:
+        return s
+    start, stop, step = key.indices(n)
+    if step != 1:
+        raise ValueError("Only slices with step 1 are supported")
+    return slice(s.start + start, s.start + max(start, stop))
@@ -0,0 +1,171 @@
+import numpy as np
+
+from .radolan_to_netcdf import get_chunksizes
+
+# Filters of netCDF4 which are passed on as `compression` when creating a
+# variable, in the order in which they are checked. blosc is handled
+# separately, since its compressor is part of the filter parameters.
+compression_filters = ["zlib", "zstd", "bzip2", "szip"]
+
+
+def rechunk_netcdf(fn_src, fn_dst, chunk_profile, max_memory=500e6):
+    """Copy a NetCDF file to a new file with a different chunk profile
+
+    All dimensions, variables and attributes are copied. The (time, y, x)
+    variables get the chunks of `chunk_profile`, all other variables keep
+    their chunks. The time chunks are not longer than the time dimension
+    of `fn_src`. The data is copied without unpacking, in blocks which
+    cover complete chunks of the new file. Half of `max_memory` bounds
+    the size of the blocks, the other half the chunk cache of `fn_src`,
+    which keeps the decompressed source chunks of a row of blocks. If
+    they do not fit into it, the source chunks are decompressed again for
+    each block of the row.
+
+    Parameters
+    ----------
+    fn_src : str
+        Filename of a NetCDF created via `create_empty_netcdf`
+    fn_dst : str
+        Filename of the new NetCDF
+    chunk_profile : str
+        Name of a chunk profile defined in `chunk_profiles`, e.g.
+        "timeseries" for fast extraction of the data of single pixels
+    max_memory : float, optional
+        Approximate maximum memory in bytes used for copying a variable,
+        not counting the chunk cache of `fn_dst`
+
+    """
+    import netCDF4
+
+    with netCDF4.Dataset(fn_src, "r") as nc_src, netCDF4.Dataset(fn_dst, "w") as nc_dst:
+        nc_src.set_auto_maskandscale(False)
+
+        nc_dst.setncatts({name: nc_src.getncattr(name) for name in nc_src.ncattrs()})
+        for dimension_name, dimension in nc_src.dimensions.items():
+            nc_dst.createDimension(
+                dimension_name, None if dimension.isunlimited() else len(dimension)
+            )
+
+        chunksizes = get_chunksizes(
+            chunk_profile,
+            n_lats=len(nc_src.dimensions["y"]),
+            n_lons=len(nc_src.dimensions["x"]),
+            n_time=len(nc_src.dimensions["time"]),
+        )
+        for variable_name, nc_var_src in nc_src.variables.items():
+            if nc_var_src.dimensions == ("time", "y", "x"):
+                variable_chunksizes = chunksizes
+            else:
+                variable_chunksizes = None
+            _create_variable_like(nc_dst, nc_var_src, chunksizes=variable_chunksizes)
+        nc_dst.set_auto_maskandscale(False)
+
+        for variable_name, nc_var_src in nc_src.variables.items():
+            nc_var_dst = nc_dst[variable_name]
+            if nc_var_src.dimensions == ("time", "y", "x"):
+                _copy_in_blocks(nc_var_src, nc_var_dst, max_memory=max_memory)
+            elif nc_var_src.ndim == 0:
+                nc_var_dst.assignValue(nc_var_src.getValue())
+            elif nc_var_src.size > 0:
+                nc_var_dst[:] = nc_var_src[:]
+
+
+def _create_variable_like(nc_fh, nc_var, chunksizes=None):
+    """Create a variable with the data type, filters and attributes of `nc_var`
+
+    If `chunksizes` is not supplied, the chunks of `nc_var` are used.
+    """
+    import netCDF4
+
+    filters = nc_var.filters() or {}
+    variable_parameters = {
+        "shuffle": filters.get("shuffle", False),
+        "fletcher32": filters.get("fletcher32", False),
+    }
+    for compression in compression_filters:
+        if filters.get(compression):
+            variable_parameters["compression"] = compression
+            variable_parameters["complevel"] = filters.get("complevel", 4)
+            break
+    if filters.get("blosc"):
+        variable_parameters["compression"] = filters["blosc"]["compressor"]
+        variable_parameters["complevel"] = filters.get("complevel", 4)
+        variable_parameters["blosc_shuffle"] = filters["blosc"]["shuffle"]
+
+    if chunksizes is not None:
+        variable_parameters["chunksizes"] = chunksizes
+    elif nc_var.ndim > 0:
+        chunking = nc_var.chunking()
+        if chunking == "contiguous":
+            variable_parameters["contiguous"] = True
+        else:
+            variable_parameters["chunksizes"] = chunking
+
+    attributes = {name: nc_var.getncattr(name) for name in nc_var.ncattrs()}
+    if "_FillValue" in attributes:
+        variable_parameters["fill_value"] = attributes.pop("_FillValue")
+
+    # Variable length strings have `str` as data type in netCDF4
+    datatype = nc_var.datatype if nc_var.dtype == str else nc_var.dtype
+    if isinstance(nc_var.datatype, netCDF4.EnumType):
+        datatype = nc_fh.createEnumType(
+            nc_var.datatype.dtype, nc_var.datatype.name, nc_var.datatype.enum_dict
+        )
+    nc_var_new = nc_fh.createVariable(
+        nc_var.name, datatype, nc_var.dimensions, **variable_parameters
+    )
+    nc_var_new.setncatts(attributes)
+    return nc_var_new
+
+
+def _copy_in_blocks(nc_var_src, nc_var_dst, max_memory):
+    """Copy a (time, y, x) variable in blocks of complete destination chunks
+
+    `max_memory` is split evenly between the block and the chunk cache of
+    `nc_var_src`.
+    """
+    n_time, n_y, n_x = nc_var_src.shape
+    if n_time == 0:
+        return
+    chunk_time, chunk_y, _ = nc_var_dst.chunking()
+    bytes_per_pixel = nc_var_src.dtype.itemsize
+    block_memory = max_memory / 2
+    cache_memory = max_memory - block_memory
+
+    # Use as many rows of chunks as fit into memory for one row of time chunks
+    n_chunks_y = max(
+        1, int(block_memory // (chunk_time * chunk_y * n_x * bytes_per_pixel))
+    )
+    block_y = min(n_chunks_y * chunk_y, n_y)
+    # If complete grids fit into memory, copy several rows of time chunks
+    block_time = chunk_time
+    if block_y == n_y:
+        n_chunks_time = max(
+            1, int(block_memory // (chunk_time * n_y * n_x * bytes_per_pixel))
+        )
+        block_time = n_chunks_time * chunk_time
+
+    # Keep the source chunks of one block row in the cache, since they are
+    # read once for each band of rows of the destination
+    src_chunking = nc_var_src.chunking()
+    if src_chunking != "contiguous":
+        n_src_chunks = np.prod(
+            [
+                -(-block // chunk)
+                for block, chunk in zip((block_time, n_y, n_x), src_chunking)
+            ]
+        )
+        src_chunk_bytes = np.prod(src_chunking) * bytes_per_pixel
+        nc_var_src.set_var_chunk_cache(
+            size=int(min(n_src_chunks * src_chunk_bytes, cache_memory)),
+            nelems=max(int(n_src_chunks), 521),
+        )
+
+    for i_time in range(0, n_time, block_time):
+        for i_y in range(0, n_y, block_y):
+            block = (
+                slice(i_time, min(i_time + block_time, n_time)),
+                slice(i_y, min(i_y + block_y, n_y)),
+                slice(None),
+            )
+            nc_var_dst[block] = nc_var_src[block]
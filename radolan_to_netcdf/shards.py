@@ -0,0 +1,219 @@
+import os
+import json
+import xml.etree.ElementTree as ET
+import numpy as np
+
+from .radolan_to_netcdf import create_empty_netcdf, RadolanNetCDFWriter
+from .utils import file_lock, save_atomic
+
+
+class ShardedRadolanNetCDFWriter(object):
+    """Append RADOLAN data to time-partitioned NetCDF files
+
+    Each time step is written to the file whose name is given by
+    formatting `fn_pattern` with the time stamp via `strftime`, e.g.
+    "RY_%Y-%m.nc" for monthly or "RY_%Y-%m-%d.nc" for daily files. The
+    files are created via `create_empty_netcdf` when they do not exist.
+    Whenever the writer rolls over to a new file and when it is closed,
+    the JSON manifest `fn_manifest` is updated, which lists all files
+    with their time range, so that readers can treat them as one dataset.
+    Time steps which are already in their file are rejected.
+
+    Since each file is independent, several writers can write different
+    files in parallel, also in different processes. The manifest is
+    updated under a lock, so that no entries of other writers are lost.
+
+    Parameters
+    ----------
+    fn_pattern : str
+        Pattern of the filenames with `strftime` format codes
+    fn_manifest : str
+        Filename of the JSON manifest
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RW'
+    flush_interval : int, optional
+        Number of buffered time steps after which they are written, see
+        `RadolanNetCDFWriter`
+    create_kwargs : dict, optional
+        Additional keyword arguments for `create_empty_netcdf`, e.g.
+        `chunk_profile` or `flag_encoding`
+
+    Examples
+    --------
+    >>> with ShardedRadolanNetCDFWriter(
+    ...     "RY_%Y-%m.nc", "RY.json", product_name="RY"
+    ... ) as writer:
+    ...     for fn in fn_list:
+    ...         writer.append(*read_in_one_bin_file(fn))
+
+    """
+
+    def __init__(
+        self,
+        fn_pattern,
+        fn_manifest,
+        product_name,
+        flush_interval=12,
+        create_kwargs=None,
+    ):
+        self.fn_pattern = fn_pattern
+        self.fn_manifest = fn_manifest
+        self.product_name = product_name
+        self.flush_interval = flush_interval
+        self.create_kwargs = create_kwargs or {}
+        self.fn_current = None
+        self._writer = None
+        self._datetimes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            update_manifest(self.fn_manifest, [self.fn_current])
+            self._writer = None
+            self.fn_current = None
+            self._datetimes = None
+
+    def append(self, data, metadata):
+        """Append the data and metadata of one time step to its file
+
+        Parameters
+        ----------
+        data : np.ndarray
+        metadata : dict
+
+        """
+        from .sync import _read_times
+
+        t = metadata["datetime"]
+        fn = t.strftime(self.fn_pattern)
+        if fn != self.fn_current:
+            self.close()
+            if not os.path.exists(fn):
+                create_empty_netcdf(
+                    fn, product_name=self.product_name, **self.create_kwargs
+                )
+            self._datetimes = set(_read_times(fn)[1])
+            self._writer = RadolanNetCDFWriter(fn, flush_interval=self.flush_interval)
+            self._writer.open()
+            self.fn_current = fn
+        if t in self._datetimes:
+            raise ValueError("Time stamp `%s` is already in `%s`" % (t, fn))
+        self._writer.append(data, metadata)
+        self._datetimes.add(t)
+
+
+def update_manifest(fn_manifest, fn_list):
+    """Add or update NetCDF files in a JSON manifest
+
+    The time range of each file is read from the file. The files are
+    stored with their path relative to the manifest, sorted by time.
+    The manifest is read and written while holding a lock on the file
+    `fn_manifest + ".lock"`, so that several processes can update it.
+
+    Parameters
+    ----------
+    fn_manifest : str
+        Filename of the JSON manifest, which is created if it does not
+        exist
+    fn_list : list of str
+        Filenames of NetCDF files created via `create_empty_netcdf`
+
+    """
+    dir_manifest = os.path.dirname(os.path.abspath(fn_manifest))
+    new_files = {}
+    for fn in fn_list:
+        file_info = _get_file_info(fn)
+        file_info["fn"] = os.path.relpath(os.path.abspath(fn), dir_manifest)
+        new_files[file_info["fn"]] = file_info
+
+    with file_lock(fn_manifest + ".lock"):
+        if os.path.exists(fn_manifest):
+            with open(fn_manifest, "r") as fh:
+                manifest = json.load(fh)
+        else:
+            manifest = {"dimension": "time", "files": []}
+
+        files = {file_info["fn"]: file_info for file_info in manifest["files"]}
+        files.update(new_files)
+        manifest["files"] = sorted(
+            files.values(),
+            key=lambda file_info: (file_info["t_start"] or "", file_info["fn"]),
+        )
+        content = json.dumps(manifest, indent=1).encode("utf-8")
+        save_atomic(fn_manifest, lambda fh: fh.write(content))
+
+
+def read_manifest(fn_manifest):
+    """Read the list of files of a JSON manifest
+
+    Returns
+    -------
+
+    files : list of dict
+        Absolute filename `fn`, `producttype`, number of time steps
+        `n_time` and first and last time stamp `t_start` and `t_end` in
+        ISO format of each file, sorted by time
+
+    """
+    dir_manifest = os.path.dirname(os.path.abspath(fn_manifest))
+    with open(fn_manifest, "r") as fh:
+        manifest = json.load(fh)
+    for file_info in manifest["files"]:
+        file_info["fn"] = os.path.join(dir_manifest, file_info["fn"])
+    return manifest["files"]
+
+
+def write_ncml(fn_manifest, fn_ncml):
+    """Write an NcML aggregation of the files of a JSON manifest
+
+    The NcML file joins all files along the `time` dimension and can be
+    opened as one dataset by NcML-aware tools, e.g. THREDDS or
+    netCDF-Java. Filenames are stored relative to `fn_ncml`.
+    """
+    dir_ncml = os.path.dirname(os.path.abspath(fn_ncml))
+    ET.register_namespace("", "http://www.unidata.ucar.edu/namespaces/netcdf/ncml-2.2")
+    ns = "{http://www.unidata.ucar.edu/namespaces/netcdf/ncml-2.2}"
+    root = ET.Element(ns + "netcdf")
+    aggregation = ET.SubElement(
+        root, ns + "aggregation", dimName="time", type="joinExisting"
+    )
+    for file_info in read_manifest(fn_manifest):
+        ET.SubElement(
+            aggregation,
+            ns + "netcdf",
+            location=os.path.relpath(file_info["fn"], dir_ncml),
+            ncoords=str(file_info["n_time"]),
+        )
+    ET.ElementTree(root).write(fn_ncml, encoding="UTF-8", xml_declaration=True)
+
+
+def _get_file_info(fn):
+    import netCDF4
+
+    with netCDF4.Dataset(fn, "r") as nc_fh:
+        nc_time = nc_fh["time"]
+        time_values = nc_time[:]
+        time_values = time_values[~np.ma.getmaskarray(time_values)]
+        if len(time_values) > 0:
+            t_start, t_end = netCDF4.num2date(
+                [time_values.min(), time_values.max()],
+                units=nc_time.units,
+                calendar=nc_time.calendar,
+                only_use_cftime_datetimes=False,
+                only_use_python_datetimes=True,
+            )
+            t_start, t_end = t_start.isoformat(), t_end.isoformat()
+        else:
+            t_start, t_end = None, None
+        return {
+            "producttype": nc_fh.producttype,
+            "n_time": len(nc_time),
+            "t_start": t_start,
+            "t_end": t_end,
+        }
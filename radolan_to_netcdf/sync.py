@@ -0,0 +1,376 @@
+import os
+import io
+import json
+import hashlib
+import datetime
+import concurrent.futures
+import numpy as np
+
+from . import radolan_bin_decoder
+from .utils import ordered_bounded_map, save_atomic
+from .radolan_to_netcdf import (
+    create_empty_netcdf,
+    read_in_one_bin_file,
+    RadolanNetCDFWriter,
+)
+
+
+def sync_files(
+    fn_list,
+    fn_netcdf,
+    product_name,
+    fn_index=None,
+    t_start=None,
+    workers=None,
+    max_queue_size=None,
+    batch_size=12,
+):
+    """Ingest all RADOLAN binary files which are not yet in a NetCDF
+
+    The ingested files are recorded in a JSON sidecar index with their
+    size, modification time, SHA-1 checksum and time stamp. Files whose
+    size and modification time did not change since the last run are
+    skipped without reading them. Files with a changed modification time
+    are only decoded if their checksum changed, too. Hence, repeated runs
+    over the same directories are cheap and do not duplicate time steps.
+
+    The time axis of the NetCDF is kept regular with the interval of the
+    product. Each time step is written to the index corresponding to its
+    time stamp, so that files can be ingested in any order and files
+    arriving late fill the gaps left for them. Time steps of files with a
+    time stamp which was already ingested from another file are skipped.
+
+    The index is only updated after all data was written. If a run is
+    interrupted by an exception, the index is not updated and the next run
+    repeats it completely, writing the time steps to the same indices.
+
+    Parameters
+    ----------
+    fn_list : list of str
+        Filenames of the RADOLAN binary files. The files are identified in
+        the index by their absolute path, so that files with the same name
+        in different directories are ingested separately.
+    fn_netcdf : str
+        Filename of the NetCDF file. It is created via `create_empty_netcdf`
+        if it does not exist yet.
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RW'
+    fn_index : str, optional
+        Filename of the JSON index. Defaults to `fn_netcdf` with the
+        suffix `.index.json`.
+    t_start : datetime.datetime, optional
+        Start of the time axis if the NetCDF is empty. Defaults to the
+        time stamp of the first ingested file. Files with an earlier
+        time stamp cannot be ingested later on.
+    workers : int, optional
+        Number of decoding processes. Defaults to `os.cpu_count()`.
+    max_queue_size : int, optional
+        Maximum number of decoded files held in memory. Defaults to
+        twice the number of workers plus `batch_size`.
+    batch_size : int, optional
+        Number of time steps written to the NetCDF in one go
+
+    Returns
+    -------
+
+    summary : dict
+        Number of files which were `written`, which were `skipped` since
+        they are already in the index and which were `duplicates` of
+        already ingested time stamps
+
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_queue_size is None:
+        max_queue_size = 2 * workers + batch_size
+
+    summary = {"written": 0, "skipped": 0, "duplicates": 0}
+    with IndexedRadolanNetCDFWriter(
+        fn_netcdf,
+        product_name,
+        fn_index=fn_index,
+        t_start=t_start,
+        flush_interval=batch_size,
+    ) as writer:
+        fn_list_to_decode = []
+        for fn in fn_list:
+            if writer.is_ingested(fn):
+                summary["skipped"] += 1
+            else:
+                fn_list_to_decode.append(fn)
+
+        if fn_list_to_decode:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers
+            ) as executor:
+                for fn, (data, metadata, file_info) in zip(
+                    fn_list_to_decode,
+                    ordered_bounded_map(
+                        executor,
+                        read_in_one_bin_file_with_info,
+                        fn_list_to_decode,
+                        max_in_flight=max_queue_size,
+                    ),
+                ):
+                    if writer.write(fn, data, metadata, file_info):
+                        summary["written"] += 1
+                    else:
+                        summary["duplicates"] += 1
+    return summary
+
+
+class IndexedRadolanNetCDFWriter(object):
+    """Write RADOLAN files to a NetCDF and record them in a JSON index
+
+    Each time step is written to the index of its time stamp on the
+    regular time axis of the product, see `sync_files`. The index is
+    written when calling `flush` and when closing the writer, after all
+    buffered time steps were written to the NetCDF. If the body of a
+    ``with`` block raises, neither the buffered time steps nor the index
+    are written, so that the files since the last `flush` are ingested
+    again by the next run.
+
+    Parameters
+    ----------
+    fn_netcdf : str
+        Filename of the NetCDF file. It is created via `create_empty_netcdf`
+        if it does not exist yet.
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RW'
+    fn_index : str, optional
+        Filename of the JSON index. Defaults to `fn_netcdf` with the
+        suffix `.index.json`.
+    t_start : datetime.datetime, optional
+        Start of the time axis if the NetCDF is empty. Defaults to the
+        time stamp of the first written file.
+    flush_interval : int, optional
+        Number of buffered time steps after which they are written to
+        the NetCDF file, see `RadolanNetCDFWriter`
+
+    """
+
+    def __init__(
+        self, fn_netcdf, product_name, fn_index=None, t_start=None, flush_interval=12
+    ):
+        self.fn_netcdf = fn_netcdf
+        self.product_name = product_name
+        self.fn_index = fn_index or fn_netcdf + ".index.json"
+        self.t_start = t_start
+        self.flush_interval = flush_interval
+        self.index = None
+        self.interval = None
+        self._writer = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(flush=exc_type is None)
+
+    def open(self):
+        from .radolan_product_netcdf_config import radolan_product_netcdf_config
+
+        if not os.path.exists(self.fn_netcdf):
+            create_empty_netcdf(self.fn_netcdf, product_name=self.product_name)
+        self.index = read_index(self.fn_index, self.fn_netcdf)
+        self.interval = datetime.timedelta(
+            seconds=radolan_product_netcdf_config[self.product_name]["metadata_fixed"][
+                "interval_seconds"
+            ]
+        )
+        t_axis_start = get_time_axis_start(self.fn_netcdf, self.interval)
+        if t_axis_start is None:
+            t_axis_start = self.t_start
+        self._writer = RadolanNetCDFWriter(
+            self.fn_netcdf, flush_interval=self.flush_interval
+        )
+        self._writer.open()
+        if self._writer.time_axis is None and t_axis_start is not None:
+            self._writer.time_axis = (t_axis_start, self.interval)
+
+    def close(self, flush=True):
+        """Close the NetCDF file and write the index
+
+        Parameters
+        ----------
+        flush : bool, optional
+            If False, the buffered time steps are discarded and the index
+            is not written
+
+        """
+        if self._writer is not None:
+            try:
+                self._writer.close(flush=flush)
+            finally:
+                self._writer = None
+            if flush:
+                write_index(self.fn_index, self.index)
+
+    def flush(self):
+        """Write all buffered time steps to the NetCDF and update the index"""
+        self._writer.flush()
+        write_index(self.fn_index, self.index)
+
+    def is_ingested(self, fn):
+        """Check if a file is in the index and did not change since
+
+        Only the size and the modification time are compared. If the
+        modification time changed, the checksum of the file is compared.
+        """
+        stat = os.stat(fn)
+        entry = self.index["files"].get(_get_index_key(fn))
+        if entry is None:
+            return False
+        if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        if entry["sha1"] == _get_checksum(_read_file(fn)):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def write(self, fn, data, metadata, file_info):
+        """Write the data of a file unless its time stamp was already ingested
+
+        Parameters
+        ----------
+        fn : str
+            Filename of the RADOLAN binary file
+        data : np.ndarray
+        metadata : dict
+        file_info : dict
+            Info about the file stored in the index, as returned by
+            `read_in_one_bin_file_with_info`
+
+        Returns
+        -------
+
+        written : bool
+            False if the time stamp was already ingested from another file
+
+        """
+        if self._writer.time_axis is None:
+            self._writer.time_axis = (metadata["datetime"], self.interval)
+
+        key = _get_index_key(fn)
+        previous_entry = self.index["files"].get(key)
+        written = file_info["datetime"] not in self.index["datetimes"] or (
+            previous_entry is not None
+            and previous_entry["datetime"] == file_info["datetime"]
+        )
+        if written:
+            self._writer.append(data, metadata)
+        self.index["files"][key] = file_info
+        self.index["datetimes"].add(file_info["datetime"])
+        return written
+
+
+def read_index(fn_index, fn_netcdf=None):
+    """Read the JSON index of the files ingested via `sync_files`
+
+    If the index does not exist, an empty index is returned. The time
+    stamps already contained in `fn_netcdf` are added to it, so that they
+    are not ingested again.
+
+    Returns
+    -------
+
+    index : dict
+        `files` maps the absolute paths of the files to their size, mtime,
+        checksum and time stamp and `datetimes` is the set of ingested
+        time stamps in ISO format
+
+    """
+    if os.path.exists(fn_index):
+        with open(fn_index, "r") as fh:
+            index = json.load(fh)
+        index["datetimes"] = set(index["datetimes"])
+        return index
+
+    index = {"files": {}, "datetimes": set()}
+    if fn_netcdf is not None and os.path.exists(fn_netcdf):
+        index["datetimes"] = {t.isoformat() for t in _read_times(fn_netcdf)[1]}
+    return index
+
+
+def write_index(fn_index, index):
+    """Write the JSON index of `sync_files` atomically"""
+    content = json.dumps(dict(index, datetimes=sorted(index["datetimes"])))
+    save_atomic(fn_index, lambda fh: fh.write(content.encode("utf-8")))
+
+
+def get_time_axis_start(fn_netcdf, interval):
+    """Get the start of the regular time axis of a NetCDF
+
+    Returns None if no time step was written yet and raises a ValueError
+    if the time axis is not regular with `interval`.
+    """
+    i_times, times = _read_times(fn_netcdf)
+    if len(times) == 0:
+        return None
+    t_axis_start = times[0] - i_times[0] * interval
+    for i_time, t in zip(i_times, times):
+        if t != t_axis_start + i_time * interval:
+            raise ValueError(
+                "The time axis of `%s` is not regular with an interval of %s"
+                % (fn_netcdf, interval)
+            )
+    return t_axis_start
+
+
+def _read_times(fn_netcdf):
+    """Read the indices and datetimes of all time steps which are not empty"""
+    import netCDF4
+
+    with netCDF4.Dataset(fn_netcdf, "r") as nc_fh:
+        nc_time = nc_fh["time"]
+        time_values = nc_time[:]
+        i_times = np.flatnonzero(~np.ma.getmaskarray(time_values))
+        times = netCDF4.num2date(
+            np.ma.getdata(time_values)[i_times],
+            units=nc_time.units,
+            calendar=nc_time.calendar,
+            only_use_cftime_datetimes=False,
+            only_use_python_datetimes=True,
+        )
+    return i_times, list(times)
+
+
+def _get_index_key(fn):
+    return os.path.abspath(fn)
+
+
+def _read_file(fn):
+    with open(fn, "rb") as fh:
+        return fh.read()
+
+
+def _get_checksum(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def read_in_one_bin_file_with_info(fn):
+    """Read a RADOLAN binary file and get the info stored in the index
+
+    Returns
+    -------
+
+    data : np.ndarray
+    metadata : dict
+    file_info : dict
+        Size, modification time, SHA-1 checksum and time stamp of the file
+
+    """
+    stat = os.stat(fn)
+    content = _read_file(fn)
+    file_info = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": _get_checksum(content),
+    }
+    # The file is read only once, for the checksum and for decoding
+    data, metadata = read_in_one_bin_file(
+        io.BytesIO(radolan_bin_decoder.decompress(content, fn))
+    )
+    file_info["datetime"] = metadata["datetime"].isoformat()
+    return data, metadata, file_info
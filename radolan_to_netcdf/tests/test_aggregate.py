@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+import netCDF4
+import numpy as np
+from numpy.testing import assert_allclose, assert_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import aggregate
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+def test_get_period_bounds():
+    t = datetime(2020, 12, 31, 23, 55)
+    assert aggregate.get_period_bounds(t, "hourly") == (
+        datetime(2020, 12, 31, 23),
+        datetime(2021, 1, 1, 0),
+    )
+    assert aggregate.get_period_bounds(t, "daily") == (
+        datetime(2020, 12, 31),
+        datetime(2021, 1, 1),
+    )
+    assert aggregate.get_period_bounds(t, "monthly") == (
+        datetime(2020, 12, 1),
+        datetime(2021, 1, 1),
+    )
+    assert aggregate.get_period_bounds(
+        datetime(2020, 1, 2, 5, 0), "daily", offset=timedelta(hours=5, minutes=50)
+    ) == (datetime(2020, 1, 1, 5, 50), datetime(2020, 1, 2, 5, 50))
+
+
+def test_aggregate_files_hourly(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("YW"))
+    fn_netcdf = str(tmp_path / "test_hourly.nc")
+    aggregate.aggregate_files(fn_radolan_files, fn_netcdf, "YW", period="hourly")
+
+    decoded = [radolan_to_netcdf.read_in_one_bin_file(fn) for fn in fn_radolan_files]
+    # The time steps from 00:55 to 01:00 and from 01:05 to 01:50
+    data_per_period = [
+        np.stack([data for data, _ in decoded[:2]]),
+        np.stack([data for data, _ in decoded[2:]]),
+    ]
+
+    with netCDF4.Dataset(fn_netcdf) as ds:
+        assert ds.producttype == "YW_hourly"
+        assert ds.flag_encoding == "none"
+        assert ds["rainfall_amount"].cell_methods == "time: sum"
+        times = netCDF4.num2date(
+            ds["time"][:],
+            ds["time"].units,
+            ds["time"].calendar,
+            only_use_cftime_datetimes=False,
+            only_use_python_datetimes=True,
+        )
+        assert list(times) == [datetime(2017, 8, 16, 1), datetime(2017, 8, 16, 2)]
+        assert_equal(ds["n_time_steps"][:], [2, 10])
+        assert_equal(ds["n_expected_time_steps"][:], [12, 12])
+        for i, data in enumerate(data_per_period):
+            valid_count = (~np.isnan(data)).sum(axis=0)
+            expected = np.where(valid_count > 0, np.nansum(data, axis=0), np.nan)
+            assert_equal(ds["valid_count"][i], valid_count)
+            assert_allclose(
+                ds["rainfall_amount"][i].filled(np.nan), expected, rtol=1e-5
+            )
+
+    # Appending to the file continues after the last period
+    with pytest.raises(ValueError, match="already written"):
+        aggregate.aggregate_files(fn_radolan_files[:1], fn_netcdf, "YW")
+
+
+def test_aggregate_files_continues_incomplete_period(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("YW"))
+    fn_expected = str(tmp_path / "test_expected.nc")
+    aggregate.aggregate_files(fn_radolan_files, fn_expected, "YW")
+
+    # The last period is incomplete after the first call
+    fn_netcdf = str(tmp_path / "test_incremental.nc")
+    aggregate.aggregate_files(fn_radolan_files[:6], fn_netcdf, "YW")
+    with netCDF4.Dataset(fn_netcdf) as ds:
+        assert_equal(ds["n_time_steps"][:], [2, 4])
+        last_time_steps = ds["last_time_step"][:]
+
+    # Time steps which were already aggregated are rejected
+    for fn_list in [fn_radolan_files[2:6], fn_radolan_files[5:6]]:
+        with pytest.raises(ValueError, match="already aggregated"):
+            aggregate.aggregate_files(fn_list, fn_netcdf, "YW")
+    with netCDF4.Dataset(fn_netcdf) as ds:
+        assert_equal(ds["n_time_steps"][:], [2, 4])
+        assert_equal(ds["last_time_step"][:], last_time_steps)
+
+    aggregate.aggregate_files(fn_radolan_files[6:], fn_netcdf, "YW")
+
+    with netCDF4.Dataset(fn_expected) as ds_expected, netCDF4.Dataset(fn_netcdf) as ds:
+        for variable_name in ["time", "n_time_steps", "last_time_step", "valid_count"]:
+            assert_equal(ds[variable_name][:], ds_expected[variable_name][:])
+        assert_allclose(
+            ds["rainfall_amount"][:].filled(np.nan),
+            ds_expected["rainfall_amount"][:].filled(np.nan),
+            rtol=1e-5,
+        )
+
+
+def test_aggregate_netcdf_equals_aggregate_files(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("RY"))
+    fn_data = str(tmp_path / "test_data.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_data, product_name="RY")
+    data_list, metadata_list = [], []
+    for fn in fn_radolan_files:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    radolan_to_netcdf.append_to_netcdf(fn_data, data_list, metadata_list)
+
+    fn_from_files = str(tmp_path / "test_from_files.nc")
+    fn_from_netcdf = str(tmp_path / "test_from_netcdf.nc")
+    aggregate.aggregate_files(fn_radolan_files, fn_from_files, "RY", period="daily")
+    # Small blocks, to test reading in several blocks
+    aggregate.aggregate_netcdf(
+        fn_data, fn_from_netcdf, period="daily", max_memory=3 * 900 * 900 * 8
+    )
+
+    with netCDF4.Dataset(fn_from_files) as ds_files, netCDF4.Dataset(
+        fn_from_netcdf
+    ) as ds_netcdf:
+        assert ds_netcdf["time"].shape == (1,)
+        assert ds_netcdf["n_time_steps"][0] == 13
+        assert ds_netcdf["n_expected_time_steps"][0] == 288
+        for variable_name in ["time", "rainfall_amount", "valid_count"]:
+            assert_allclose(
+                ds_netcdf[variable_name][:].filled(np.nan),
+                ds_files[variable_name][:].filled(np.nan),
+                rtol=1e-5,
+            )
+
+    # Selecting a period via t_start and t_end
+    fn_selected = str(tmp_path / "test_selected.nc")
+    aggregate.aggregate_netcdf(
+        fn_data,
+        fn_selected,
+        period="hourly",
+        t_start=datetime(2020, 1, 1, 15, 5),
+        t_end=datetime(2020, 1, 1, 15, 30),
+    )
+    with netCDF4.Dataset(fn_selected) as ds:
+        assert_equal(ds["n_time_steps"][:], [6])
+
+
+def test_aggregator_errors(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("YW"))
+    decoded = [radolan_to_netcdf.read_in_one_bin_file(fn) for fn in fn_radolan_files]
+    with pytest.raises(ValueError, match="`period` has to be one of"):
+        aggregate.RadolanAggregator(str(tmp_path / "test.nc"), "YW", period="weekly")
+
+    with aggregate.RadolanAggregator(str(tmp_path / "test.nc"), "YW") as aggregator:
+        aggregator.add(*decoded[5])
+        with pytest.raises(ValueError, match="already added"):
+            aggregator.add(*decoded[5])
+        with pytest.raises(ValueError, match="before the current period"):
+            aggregator.add(*decoded[0])
+        with pytest.raises(ValueError, match="RADOLAN product of data"):
+            aggregator.add(decoded[6][0], dict(decoded[6][1], producttype="RY"))
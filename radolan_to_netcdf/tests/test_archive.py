@@ -0,0 +1,104 @@
+import io
+import os
+import gzip
+import tarfile
+import netCDF4
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import archive
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+def _add_file(tar_fh, name, content):
+    tar_info = tarfile.TarInfo(name)
+    tar_info.size = len(content)
+    tar_fh.addfile(tar_info, io.BytesIO(content))
+
+
+@pytest.fixture
+def fn_radolan_files():
+    return sorted(get_test_data_for_product("RY"))
+
+
+@pytest.fixture
+def fn_tar_nested(fn_radolan_files, tmp_path):
+    """Archive with the first files and an archive with the other files"""
+    inner = io.BytesIO()
+    with tarfile.open(fileobj=inner, mode="w:gz") as tar_fh:
+        for fn in fn_radolan_files[5:]:
+            # Members which are not gzip compressed
+            with gzip.open(fn, "rb") as fh:
+                _add_file(tar_fh, os.path.basename(fn)[:-3], fh.read())
+
+    fn_tar = str(tmp_path / "RY-202001.tar")
+    with tarfile.open(fn_tar, mode="w") as tar_fh:
+        tar_fh.add(str(tmp_path), arcname="directory", recursive=False)
+        _add_file(tar_fh, "README.txt", b"Not a RADOLAN file")
+        for fn in fn_radolan_files[:5]:
+            tar_fh.add(fn, arcname="ry/" + os.path.basename(fn))
+        _add_file(tar_fh, "ry/RY-20200101-2.tar.gz", inner.getvalue())
+    return fn_tar
+
+
+def test_iter_tar_members(fn_tar_nested, fn_radolan_files):
+    names = [name for name, _ in archive.iter_tar_members(fn_tar_nested, "raa01*")]
+    assert len(names) == len(fn_radolan_files)
+    assert names[0] == "ry/" + os.path.basename(fn_radolan_files[0])
+    assert (
+        names[-1]
+        == "ry/RY-20200101-2.tar.gz/" + os.path.basename(fn_radolan_files[-1])[:-3]
+    )
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_read_tar_archive(fn_tar_nested, fn_radolan_files, workers):
+    with open(fn_tar_nested, "rb") as fh:
+        decoded = list(
+            archive.read_tar_archive(fh, pattern="raa01-ry*", workers=workers)
+        )
+    assert len(decoded) == len(fn_radolan_files)
+    for (data, metadata), fn in zip(decoded, fn_radolan_files):
+        expected_data, expected_metadata = radolan_to_netcdf.read_in_one_bin_file(fn)
+        assert metadata["datetime"] == expected_metadata["datetime"]
+        np.testing.assert_equal(data, expected_data)
+
+
+def test_convert_tar_archive_matches_serial_append(
+    fn_tar_nested, fn_radolan_files, tmp_path
+):
+    fn_serial = str(tmp_path / "test_serial.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_serial, product_name="RY")
+    for fn in fn_radolan_files:
+        radolan_to_netcdf.append_to_netcdf(
+            fn_serial, *radolan_to_netcdf.read_in_one_bin_file(fn)
+        )
+
+    fn_tar = str(tmp_path / "test.nc")
+    archive.convert_tar_archive(
+        fn_tar_nested,
+        fn_tar,
+        product_name="RY",
+        pattern="raa01-ry*",
+        workers=2,
+        batch_size=5,
+    )
+
+    with netCDF4.Dataset(fn_serial) as ds_serial, netCDF4.Dataset(fn_tar) as ds_tar:
+        for variable_name in ["time", "rainfall_amount", "nodatamask", "maxrange"]:
+            assert_almost_equal(
+                ds_tar[variable_name][:].filled(np.nan),
+                ds_serial[variable_name][:].filled(np.nan),
+            )
+
+    # Converting the same archive again violates the chronological order
+    with pytest.raises(ValueError, match="not in chronological order"):
+        archive.convert_tar_archive(
+            [fn_tar_nested, fn_tar_nested],
+            str(tmp_path / "test_twice.nc"),
+            product_name="RY",
+            pattern="raa01-ry*",
+            workers=1,
+        )
@@ -0,0 +1,134 @@
+import os
+import shutil
+import pathlib
+import concurrent.futures
+import numpy as np
+from numpy.testing import assert_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf.cache import DecodedFileCache
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.fixture
+def fn_radolan_files(tmp_path):
+    fn_list = []
+    for fn in sorted(get_test_data_for_product("YW"))[:3]:
+        fn_list.append(shutil.copy(fn, str(tmp_path)))
+    return fn_list
+
+
+def assert_same_decoded(decoded, expected):
+    data, metadata = decoded
+    expected_data, expected_metadata = expected
+    assert_equal(data, expected_data)
+    assert list(metadata) == list(expected_metadata)
+    for name, value in expected_metadata.items():
+        assert_equal(metadata[name], value)
+
+
+def test_memory_cache(fn_radolan_files):
+    nbytes = 1100 * 900 * 8
+    cache = DecodedFileCache(max_bytes=2.5 * nbytes)
+    expected = [radolan_to_netcdf.read_in_one_bin_file(fn) for fn in fn_radolan_files]
+
+    for fn, decoded in zip(fn_radolan_files, expected):
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn, cache=cache)
+        assert_same_decoded((data, metadata), decoded)
+        # Also the just decoded arrays are shared with the cache
+        assert not data.flags.writeable
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 0, "misses": 3}
+    assert cache.current_bytes <= cache.max_bytes
+
+    # The first file was evicted, the last one is returned from memory
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        fn_radolan_files[2], cache=cache
+    )
+    assert cache.stats["memory_hits"] == 1
+    assert_same_decoded((data, metadata), expected[2])
+    assert not data.flags.writeable
+    metadata["new_key"] = 1
+    assert "new_key" not in cache.get(cache.get_key(fn_radolan_files[2]))[1]
+
+    radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0], cache=cache)
+    assert cache.stats["misses"] == 4
+
+    # A changed file is decoded again
+    os.utime(fn_radolan_files[2], ns=(0, 0))
+    radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[2], cache=cache)
+    assert cache.stats["misses"] == 5
+
+    # Paths are cached independent of their type
+    radolan_to_netcdf.read_in_one_bin_file(
+        pathlib.Path(fn_radolan_files[2]), cache=cache
+    )
+    assert cache.stats["misses"] == 5
+
+
+def test_disk_cache(fn_radolan_files, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    expected = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0])
+
+    cache = DecodedFileCache(cache_dir=cache_dir)
+    radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0], cache=cache)
+    assert len([fn for fn in os.listdir(cache_dir) if fn.endswith(".json")]) == 1
+
+    # A new cache, e.g. in another process, memory-maps the arrays
+    cache = DecodedFileCache(cache_dir=cache_dir)
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        fn_radolan_files[0], cache=cache
+    )
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+    assert isinstance(data, np.memmap)
+    assert_same_decoded((data, metadata), expected)
+    assert np.isnan(metadata["nodataflag"])
+
+    cache.clear()
+    assert os.listdir(cache_dir) == []
+    assert cache.get(cache.get_key(fn_radolan_files[0])) is None
+
+
+def test_disk_cache_skips_metadata_which_cannot_be_stored(tmp_path):
+    cache = DecodedFileCache(cache_dir=str(tmp_path))
+    data = np.zeros((2, 2))
+    cache.put(("fn", 0, 0), data, {"unsupported": object()})
+    assert os.listdir(str(tmp_path)) == []
+    assert cache.get(("fn", 0, 0))[0] is data
+
+
+def _read_with_disk_cache(args):
+    fn, cache_dir = args
+    cache = DecodedFileCache(max_bytes=0, cache_dir=cache_dir)
+    data, _ = radolan_to_netcdf.read_in_one_bin_file(fn, cache=cache)
+    return np.nansum(data)
+
+
+def test_disk_cache_shared_by_processes(fn_radolan_files, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    expected = np.nansum(radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0])[0])
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        sums = list(
+            executor.map(_read_with_disk_cache, [(fn_radolan_files[0], cache_dir)] * 40)
+        )
+    assert_equal(sums, [expected] * 40)
+    assert not [fn for fn in os.listdir(cache_dir) if fn.endswith(".tmp")]
+
+
+def test_disk_cache_with_removed_arrays(fn_radolan_files, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache = DecodedFileCache(max_bytes=0, cache_dir=cache_dir)
+    radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0], cache=cache)
+
+    # E.g. removed by `clear` of another process after the JSON was written
+    for fn in os.listdir(cache_dir):
+        if fn.endswith(".npy"):
+            os.remove(os.path.join(cache_dir, fn))
+    assert cache.get(cache.get_key(fn_radolan_files[0])) is None
+    assert cache.stats["misses"] == 2
+
+    with open(os.path.join(cache_dir, "leftover.json.tmp"), "w"):
+        pass
+    cache.clear()
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,141 @@
+from datetime import timedelta
+import netCDF4
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import direct_write
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+h5py = pytest.importorskip("h5py")
+
+
+@pytest.fixture(scope="module")
+def decoded():
+    return [
+        radolan_to_netcdf.read_in_one_bin_file(fn)
+        for fn in sorted(get_test_data_for_product("RW"))[:6]
+    ]
+
+
+def _write(writer, decoded):
+    with writer:
+        for data, metadata in decoded:
+            writer.append(data, metadata)
+
+
+def _assert_same_netcdf(fn_expected, fn_actual):
+    with netCDF4.Dataset(fn_expected) as nc_expected, netCDF4.Dataset(
+        fn_actual
+    ) as nc_actual:
+        assert list(nc_actual.dimensions) == list(nc_expected.dimensions)
+        for name, dimension in nc_expected.dimensions.items():
+            assert nc_actual.dimensions[name].size == dimension.size
+        assert list(nc_actual.variables) == list(nc_expected.variables)
+        for name, nc_var in nc_expected.variables.items():
+            expected = nc_var[:]
+            actual = nc_actual[name][:]
+            assert_array_equal(np.ma.getmaskarray(actual), np.ma.getmaskarray(expected))
+            assert_array_equal(np.ma.filled(actual, 0), np.ma.filled(expected, 0))
+            assert nc_actual[name].filters() == nc_var.filters()
+
+
+@pytest.mark.parametrize(
+    "flag_encoding, workers",
+    [("dense", 0), ("dense", 2), ("packed", 0), ("ragged", 0), ("none", 0)],
+)
+def test_same_netcdf_as_radolan_netcdf_writer(
+    decoded, tmp_path, flag_encoding, workers
+):
+    fn_expected = str(tmp_path / "expected.nc")
+    fn_actual = str(tmp_path / "actual.nc")
+    for fn in [fn_expected, fn_actual]:
+        radolan_to_netcdf.create_empty_netcdf(
+            fn, product_name="RW", flag_encoding=flag_encoding
+        )
+
+    _write(
+        radolan_to_netcdf.RadolanNetCDFWriter(fn_expected, flush_interval=4), decoded
+    )
+    _write(
+        direct_write.PrecompressedNetCDFWriter(
+            fn_actual, flush_interval=4, workers=workers
+        ),
+        decoded,
+    )
+    _assert_same_netcdf(fn_expected, fn_actual)
+
+    # The file can still be appended to via netCDF4
+    radolan_to_netcdf.append_to_netcdf(fn_actual, *decoded[0])
+    with netCDF4.Dataset(fn_actual) as nc_fh:
+        assert nc_fh.dimensions["time"].size == len(decoded) + 1
+
+
+def test_fixed_time_axis_with_gaps(decoded, tmp_path):
+    t_start = decoded[0][1]["datetime"] - timedelta(hours=2)
+    t_end = decoded[-1][1]["datetime"] + timedelta(hours=2)
+    fn_expected = str(tmp_path / "expected.nc")
+    fn_actual = str(tmp_path / "actual.nc")
+    for fn in [fn_expected, fn_actual]:
+        radolan_to_netcdf.create_empty_netcdf(
+            fn, product_name="RW", time_range=(t_start, t_end)
+        )
+
+    # Written out of order with one time step missing
+    decoded = decoded[3:] + decoded[:2]
+    _write(radolan_to_netcdf.RadolanNetCDFWriter(fn_expected), decoded)
+    _write(direct_write.PrecompressedNetCDFWriter(fn_actual, workers=0), decoded)
+    _assert_same_netcdf(fn_expected, fn_actual)
+
+
+@pytest.mark.parametrize(
+    "create_kwargs",
+    [{"chunk_profile": "balanced"}, {"compression_profile": "zstd"}],
+)
+def test_unsupported_layouts(tmp_path, create_kwargs):
+    fn = str(tmp_path / "test.nc")
+    try:
+        radolan_to_netcdf.create_empty_netcdf(fn, product_name="RW", **create_kwargs)
+    except ValueError:
+        pytest.skip("The netCDF library does not support the compression")
+    with pytest.raises(NotImplementedError):
+        direct_write.PrecompressedNetCDFWriter(fn, workers=0).open()
+
+
+@pytest.mark.parametrize(
+    "dtype, filters",
+    [
+        ("i2", [("shuffle", (2,)), ("deflate", (5,))]),
+        ("u1", [("shuffle", (1,)), ("deflate", (1,))]),
+        ("f4", [("deflate", (9,))]),
+        ("i4", []),
+    ],
+)
+def test_compress_grid(tmp_path, dtype, filters):
+    grid = np.arange(7 * 10).reshape(7, 10).astype(dtype)
+    chunks = direct_write.compress_grid(grid, (4, 4), 0, filters)
+    assert [offset for offset, _ in chunks] == [
+        (0, 0),
+        (0, 4),
+        (0, 8),
+        (4, 0),
+        (4, 4),
+        (4, 8),
+    ]
+
+    # HDF5 decompresses the chunks with the same filters
+    with h5py.File(str(tmp_path / "test.h5"), "w") as h5_fh:
+        dataset = h5_fh.create_dataset(
+            "grid",
+            shape=(1,) + grid.shape,
+            chunks=(1, 4, 4),
+            dtype=dtype,
+            shuffle=("shuffle", (grid.dtype.itemsize,)) in filters,
+            compression="gzip" if filters and filters[-1][0] == "deflate" else None,
+            compression_opts=filters[-1][1][0] if filters else None,
+        )
+        assert direct_write.get_chunk_layout(dataset)["filters"] == filters
+        for offset, chunk in chunks:
+            dataset.id.write_direct_chunk((0,) + offset, chunk)
+        assert_array_equal(dataset[0], grid)
@@ -0,0 +1,96 @@
+import datetime
+import netCDF4
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import extract
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.fixture(scope="module")
+def fn_netcdf_yw(tmp_path_factory):
+    fn = str(tmp_path_factory.mktemp("extract") / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW")
+    data_list, metadata_list = [], []
+    for fn_radolan_file in sorted(get_test_data_for_product("YW")):
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+    return fn
+
+
+def test_lat_lon_to_grid_index(fn_netcdf_yw):
+    rng = np.random.default_rng(1)
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        lats = ds["latitudes"][:]
+        lons = ds["longitudes"][:]
+        i_y_ref = rng.integers(1, 1099, 50)
+        i_x_ref = rng.integers(1, 899, 50)
+        # Points slightly shifted from the grid points
+        points_lats = lats[i_y_ref, i_x_ref] + 0.001
+        points_lons = lons[i_y_ref, i_x_ref] - 0.001
+
+        i_y, i_x = extract.lat_lon_to_grid_index(ds, points_lats, points_lons)
+        np.testing.assert_equal(i_y, i_y_ref)
+        np.testing.assert_equal(i_x, i_x_ref)
+
+        # The KD-tree fallback gives the same result
+        i = extract._get_kdtree(ds).query(
+            extract._lat_lon_to_xyz(points_lats, points_lons)
+        )[1]
+        np.testing.assert_equal(np.unravel_index(i, lats.shape), (i_y_ref, i_x_ref))
+
+        with pytest.raises(ValueError, match="outside of the RADOLAN grid"):
+            extract.lat_lon_to_grid_index(ds, np.array([20.0]), np.array([10.0]))
+
+
+def test_extract_points(fn_netcdf_yw):
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        lats = ds["latitudes"][:]
+        lons = ds["longitudes"][:]
+        reference = ds["rainfall_amount"][:].filled(np.nan)
+
+    i_y = np.array([10, 550, 551, 1000, 550])
+    i_x = np.array([20, 450, 449, 800, 450])
+    times, values = extract.extract_points(
+        fn_netcdf_yw,
+        lats[i_y, i_x],
+        lons[i_y, i_x],
+        t_start=datetime.datetime(2017, 8, 16, 1, 0),
+        t_end=datetime.datetime(2017, 8, 16, 1, 30),
+    )
+    assert times[0] == datetime.datetime(2017, 8, 16, 1, 0)
+    assert times[-1] == datetime.datetime(2017, 8, 16, 1, 30)
+    np.testing.assert_equal(values, reference[1:8, i_y, i_x])
+
+    times, values = extract.extract_points(fn_netcdf_yw, lats[0, 0], lons[0, 0])
+    assert len(times) == 12
+    np.testing.assert_equal(values[:, 0], reference[:, 0, 0])
+
+
+def test_extract_polygon_mean(fn_netcdf_yw):
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        lats = ds["latitudes"][:]
+        lons = ds["longitudes"][:]
+        reference = ds["rainfall_amount"][:].filled(np.nan)
+
+    polygon_lats = np.array([51.0, 51.5, 51.8, 51.2])
+    polygon_lons = np.array([9.0, 8.5, 10.0, 10.5])
+    times, mean_values, n_cells = extract.extract_polygon_mean(
+        fn_netcdf_yw, polygon_lats, polygon_lons
+    )
+
+    # Reference by testing all grid cells in lat/lon space
+    mask = Path(np.column_stack([polygon_lons, polygon_lats])).contains_points(
+        np.column_stack([lons.flatten(), lats.flatten()])
+    )
+    # Cells close to the edges can differ, since the polygon is straight
+    # in projected coordinates and not in lat/lon
+    assert abs(n_cells - mask.sum()) < 0.01 * mask.sum()
+    np.testing.assert_allclose(
+        mean_values, np.nanmean(reference.reshape(12, -1)[:, mask], axis=1), rtol=0.01
+    )
+    assert len(times) == 12
@@ -0,0 +1,21 @@
+import sys
+import subprocess
+
+
+def test_no_heavy_imports():
+    # wradlib and netCDF4 are only imported when they are needed
+    code = (
+        "import sys, radolan_to_netcdf; "
+        "print(sorted({'wradlib', 'netCDF4'} & set(sys.modules)))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+    assert output.decode().strip() == "[]"
+
+
+def test_package_namespace():
+    import radolan_to_netcdf
+
+    assert isinstance(radolan_to_netcdf.radolan_product_netcdf_config, dict)
+    assert "RW" in radolan_to_netcdf.radolan_product_netcdf_config
+    for name in ["os", "io", "np", "datetime", "timedelta"]:
+        assert not hasattr(radolan_to_netcdf, name)
@@ -0,0 +1,75 @@
+import json
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import instrumentation as instrumentation_module
+from radolan_to_netcdf.instrumentation import Instrumentation
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+def test_instrumentation_records_stages(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("YW"))[:4]
+    fn_netcdf = str(tmp_path / "test.nc")
+    fn_json = str(tmp_path / "instrumentation.json")
+    radolan_to_netcdf.create_empty_netcdf(fn_netcdf, product_name="YW")
+
+    records = []
+    with Instrumentation(callback=records.append) as instrumentation:
+        with radolan_to_netcdf.RadolanNetCDFWriter(
+            fn_netcdf, flush_interval=2
+        ) as writer:
+            for fn in fn_radolan_files:
+                writer.append(*radolan_to_netcdf.read_in_one_bin_file(fn))
+
+    summary = instrumentation.summary()
+    assert list(summary) == [
+        "read",
+        "decode",
+        "pack",
+        "write_data",
+        "flags",
+        "write_metadata",
+        "sync",
+    ]
+    assert summary["read"]["calls"] == 4
+    assert summary["decode"]["n_time"] == 4
+    assert summary["pack"]["calls"] == 2
+    assert summary["pack"]["n_time"] == 4
+    assert summary["sync"]["calls"] == 2
+    for stage_summary in summary.values():
+        assert stage_summary["duration_s"] > 0
+    # YW is uncompressed 1100 x 900 x 2 bytes plus the header
+    assert summary["decode"]["bytes_in"] > 4 * 1100 * 900 * 2
+    assert summary["decode"]["bytes_out"] == 4 * 1100 * 900 * 8
+    assert summary["pack"]["bytes_in"] == summary["decode"]["bytes_out"]
+    assert summary["sync"]["bytes_out"] > 0
+    assert len(records) == len(instrumentation.records) == 4 + 4 + 5 * 2
+
+    assert "write_data" in instrumentation.summary_table()
+    instrumentation.to_json(fn_json)
+    with open(fn_json) as fh:
+        content = json.load(fh)
+    assert content["summary"]["read"]["calls"] == 4
+    assert len(content["records"]) == len(records)
+
+    # Nothing is recorded after leaving the context
+    radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[0])
+    assert instrumentation.summary()["read"]["calls"] == 4
+
+
+@pytest.mark.parametrize("has_reset_peak", [True, False])
+def test_instrumentation_trace_allocations(tmp_path, monkeypatch, has_reset_peak):
+    # Without `tracemalloc.reset_peak`, as before Python 3.9
+    monkeypatch.setattr(
+        instrumentation_module,
+        "_has_reset_peak",
+        has_reset_peak and instrumentation_module._has_reset_peak,
+    )
+    fn = sorted(get_test_data_for_product("YW"))[0]
+    with Instrumentation(trace_allocations=True, keep_records=False) as instrumentation:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn)
+    summary = instrumentation.summary()
+    assert instrumentation.records == []
+    # At least the decoded float data is allocated
+    assert summary["decode"]["allocated_bytes"] >= data.nbytes
+    assert summary["decode"]["max_allocated_bytes"] >= data.nbytes
@@ -0,0 +1,54 @@
+import os
+import netCDF4
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import parallel
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.mark.parametrize("precompress", [False, True])
+def test_convert_files_matches_serial_append(precompress):
+    if precompress:
+        pytest.importorskip("h5py")
+    fn_radolan_files = sorted(get_test_data_for_product("RY"))
+
+    fn_serial = "test_serial.nc"
+    radolan_to_netcdf.create_empty_netcdf(fn_serial, product_name="RY")
+    for fn_radolan_file in fn_radolan_files:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        radolan_to_netcdf.append_to_netcdf(fn_serial, data, metadata)
+
+    fn_parallel = "test_parallel.nc"
+    parallel.convert_files(
+        fn_radolan_files,
+        fn_parallel,
+        product_name="RY",
+        workers=2,
+        batch_size=5,
+        precompress=precompress,
+    )
+
+    with netCDF4.Dataset(fn_serial) as ds_serial, netCDF4.Dataset(
+        fn_parallel
+    ) as ds_parallel:
+        for variable_name in ["time", "rainfall_amount", "nodatamask", "maxrange"]:
+            assert_almost_equal(
+                ds_parallel[variable_name][:].filled(np.nan),
+                ds_serial[variable_name][:].filled(np.nan),
+            )
+
+    os.remove(fn_serial)
+    os.remove(fn_parallel)
+
+
+def test_convert_files_unordered_error():
+    fn_radolan_files = sorted(get_test_data_for_product("RW"))[:3][::-1]
+
+    fn = "test.nc"
+    with pytest.raises(ValueError, match="not in chronological order"):
+        parallel.convert_files(fn_radolan_files, fn, product_name="RW", workers=2)
+
+    os.remove(fn)
@@ -0,0 +1,67 @@
+import io
+import gzip
+import pathlib
+import unittest
+import wradlib as wrl
+import numpy as np
+
+from radolan_to_netcdf import radolan_bin_decoder
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+def assert_same_metadata(metadata_actual, metadata_reference):
+    assert list(metadata_actual.keys()) == list(metadata_reference.keys())
+    for key in metadata_reference.keys():
+        try:
+            np.testing.assert_equal(metadata_actual[key], metadata_reference[key])
+        except TypeError:
+            assert metadata_actual[key] == metadata_reference[key]
+
+
+class TestReadRadolanBinFile(unittest.TestCase):
+    def _compare_with_wradlib(self, product_name):
+        for fn_radolan_file in get_test_data_for_product(product_name):
+            data, metadata = radolan_bin_decoder.read_radolan_bin_file(fn_radolan_file)
+            data_reference, metadata_reference = wrl.io.read_radolan_composite(
+                fn_radolan_file, missing=np.nan
+            )
+
+            assert data.dtype == data_reference.dtype
+            np.testing.assert_equal(data, data_reference)
+            assert_same_metadata(metadata, metadata_reference)
+
+    def test_RW(self):
+        self._compare_with_wradlib("RW")
+
+    def test_RY(self):
+        self._compare_with_wradlib("RY")
+
+    def test_YW(self):
+        self._compare_with_wradlib("YW")
+
+    def test_file_like(self):
+        fn_radolan_file = get_test_data_for_product("RW")[0]
+        with gzip.open(fn_radolan_file, "rb") as f:
+            content = f.read()
+        data, metadata = radolan_bin_decoder.read_radolan_bin_file(io.BytesIO(content))
+        data_reference, _ = radolan_bin_decoder.read_radolan_bin_file(fn_radolan_file)
+        np.testing.assert_equal(data, data_reference)
+
+    def test_path_like(self):
+        fn_radolan_file = get_test_data_for_product("RW")[0]
+        data, metadata = radolan_bin_decoder.read_radolan_bin_file(
+            pathlib.Path(fn_radolan_file)
+        )
+        data_reference, _ = radolan_bin_decoder.read_radolan_bin_file(fn_radolan_file)
+        np.testing.assert_equal(data, data_reference)
+
+    def test_truncated_error(self):
+        fn_radolan_file = get_test_data_for_product("RW")[0]
+        with gzip.open(fn_radolan_file, "rb") as f:
+            content = f.read()
+        with self.assertRaises(OSError):
+            radolan_bin_decoder.decode_radolan_bin(content[:-10])
+
+    def test_not_supported_error(self):
+        with self.assertRaises(NotImplementedError):
+            radolan_bin_decoder.parse_header("RX" + " " * 80)
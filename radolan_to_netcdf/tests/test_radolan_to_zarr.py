@@ -0,0 +1,91 @@
+import datetime
+import concurrent.futures
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+zarr = pytest.importorskip("zarr")
+xr = pytest.importorskip("xarray")
+
+from radolan_to_netcdf import radolan_to_zarr  # noqa: E402
+
+
+def read_test_data(product_name):
+    data_list, metadata_list = [], []
+    for fn_radolan_file in sorted(get_test_data_for_product(product_name)):
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    return data_list, metadata_list
+
+
+@pytest.mark.parametrize("flag_encoding", ["dense", "packed"])
+def test_zarr_same_as_netcdf(tmp_path, flag_encoding):
+    data_list, metadata_list = read_test_data("RY")
+
+    fn_netcdf = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn_netcdf, product_name="RY", flag_encoding=flag_encoding
+    )
+    radolan_to_netcdf.append_to_netcdf(fn_netcdf, data_list, metadata_list)
+
+    store = str(tmp_path / "test.zarr")
+    radolan_to_zarr.create_empty_zarr(
+        store, product_name="RY", flag_encoding=flag_encoding
+    )
+    radolan_to_zarr.append_to_zarr(store, data_list[:5], metadata_list[:5])
+    radolan_to_zarr.append_to_zarr(store, data_list[5:], metadata_list[5:])
+
+    with xr.open_dataset(fn_netcdf) as ds_netcdf, xr.open_zarr(
+        store, consolidated=False
+    ) as ds_zarr:
+        assert ds_zarr.attrs["producttype"] == "RY"
+        assert ds_zarr.rainfall_amount.chunks[0][0] == 1
+        # `radolan_grid` only holds attributes and has no data
+        for variable_name in set(ds_netcdf.variables) - {"radolan_grid"}:
+            np.testing.assert_array_equal(
+                ds_zarr[variable_name].values, ds_netcdf[variable_name].values
+            )
+            assert set(ds_zarr[variable_name].attrs) == set(
+                ds_netcdf[variable_name].attrs
+            )
+
+
+def _append_to_zarr(args):
+    store, data_list, metadata_list = args
+    radolan_to_zarr.append_to_zarr(store, data_list, metadata_list)
+
+
+def test_zarr_fixed_time_axis_concurrent_writers(tmp_path):
+    data_list, metadata_list = read_test_data("YW")
+    t_start = metadata_list[0]["datetime"] - datetime.timedelta(minutes=5)
+    t_end = metadata_list[-1]["datetime"]
+
+    store = str(tmp_path / "test.zarr")
+    radolan_to_zarr.create_empty_zarr(
+        store, product_name="YW", time_range=(t_start, t_end)
+    )
+    with concurrent.futures.ProcessPoolExecutor(max_workers=3) as executor:
+        list(
+            executor.map(
+                _append_to_zarr,
+                [(store, data_list[i::3], metadata_list[i::3]) for i in range(3)],
+            )
+        )
+
+    with xr.open_zarr(store, consolidated=False) as ds:
+        assert len(ds.time) == 13
+        assert ds.time.values[0] == np.datetime64(t_start)
+        assert np.isnan(ds.rainfall_amount[0].values).all()
+        assert_almost_equal(
+            ds.rainfall_amount[1:].values, np.stack(data_list), decimal=5
+        )
+
+    with pytest.raises(ValueError, match="outside of the fixed time axis"):
+        metadata = dict(
+            metadata_list[0], datetime=t_end + datetime.timedelta(minutes=5)
+        )
+        radolan_to_zarr.append_to_zarr(store, data_list[0], metadata)
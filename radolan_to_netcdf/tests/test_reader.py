@@ -0,0 +1,135 @@
+from datetime import datetime
+import netCDF4
+import numpy as np
+from numpy.testing import assert_allclose, assert_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf.reader import open_radolan_netcdf
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.fixture(params=["dense", "packed"])
+def fn_netcdf_yw(tmp_path, request):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="YW", flag_encoding=request.param
+    )
+    data_list, metadata_list = [], []
+    for fn_radolan_file in sorted(get_test_data_for_product("YW")):
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+    return fn
+
+
+def test_open_radolan_netcdf_matches_netcdf4(fn_netcdf_yw):
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        expected = ds["rainfall_amount"][:].filled(np.nan)
+        expected_raw_var = ds["rainfall_amount"]
+        expected_raw_var.set_auto_maskandscale(False)
+        expected_raw = expected_raw_var[:]
+        nodatamask = radolan_to_netcdf.read_flag(ds, "nodatamask")
+
+    with open_radolan_netcdf(fn_netcdf_yw) as array:
+        assert array.shape == (12, 1100, 900)
+        assert array.dtype == np.dtype("f4")
+        assert array.times[0] == np.datetime64("2017-08-16T00:55:00")
+        data = array.read()
+        assert data.dtype == np.dtype("f4")
+        assert_allclose(data, expected, rtol=1e-6, atol=1e-6)
+
+        # Indexing like numpy
+        assert_allclose(array[3], expected[3], rtol=1e-6, atol=1e-6)
+        assert_allclose(
+            array[2:5, 100:200, -50:], expected[2:5, 100:200, -50:], rtol=1e-6
+        )
+        assert_allclose(array[..., 10], expected[..., 10], rtol=1e-6)
+        assert_allclose(np.asarray(array[-1:]), expected[-1:], rtol=1e-6)
+
+    with open_radolan_netcdf(fn_netcdf_yw, dtype="raw") as array:
+        assert array.dtype == np.dtype("i2")
+        assert_equal(array[:], expected_raw)
+
+    with open_radolan_netcdf(fn_netcdf_yw, mask_flags=["nodatamask"]) as array:
+        data = array.read()
+        assert np.isnan(data[nodatamask]).all()
+        assert_allclose(data[~nodatamask], expected[~nodatamask], rtol=1e-6)
+
+
+def test_sel_isel_and_iter_blocks(fn_netcdf_yw):
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        expected = ds["rainfall_amount"][:].filled(np.nan)
+
+    with open_radolan_netcdf(fn_netcdf_yw, dtype="f8") as array:
+        view = array.sel(
+            time=slice(datetime(2017, 8, 16, 1, 0), datetime(2017, 8, 16, 1, 20))
+        ).isel(y=slice(500, 700), x=slice(100, 400))
+        assert view.shape == (5, 200, 300)
+        assert_equal(view.y, array.y[500:700])
+        assert_allclose(view.read(), expected[1:6, 500:700, 100:400])
+
+        # Views of views are relative to the view
+        sub_view = view.isel(time=slice(1, 3), y=slice(-10, None))
+        assert sub_view.shape == (2, 10, 300)
+        assert_allclose(sub_view.read(), expected[2:4, 690:700, 100:400])
+
+        assert array.sel(time=slice(datetime(2020, 1, 1), None)).shape[0] == 0
+
+        blocks = list(view.iter_blocks(n_time=2))
+        assert [len(times) for times, _ in blocks] == [1, 2, 2]
+        assert_equal(np.concatenate([times for times, _ in blocks]), view.times)
+        assert_allclose(np.concatenate([block for _, block in blocks]), view.read())
+
+
+def test_to_dask_and_to_xarray(fn_netcdf_yw):
+    pytest.importorskip("dask")
+    pytest.importorskip("xarray")
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        expected = ds["rainfall_amount"][:].filled(np.nan)
+
+    with open_radolan_netcdf(fn_netcdf_yw) as array:
+        view = array.isel(y=slice(0, 600))
+        dask_array = view.to_dask(chunks=(4, 300, 900))
+        assert dask_array.chunks[0] == (4, 4, 4)
+        assert_allclose(
+            np.nansum(dask_array, axis=0).compute(),
+            np.nansum(expected[:, :600], axis=0),
+            rtol=1e-4,
+        )
+
+        data_array = view.to_xarray(chunks="auto")
+        assert data_array.dims == ("time", "y", "x")
+        assert data_array.attrs["units"] == "kg"
+        assert "scale_factor" not in data_array.attrs
+        assert_allclose(data_array.isel(time=2).values, expected[2, :600], rtol=1e-6)
+        assert data_array.time.values[0] == np.datetime64("2017-08-16T00:55:00")
+
+
+def test_to_dask_of_several_views(fn_netcdf_yw):
+    da = pytest.importorskip("dask.array")
+    with netCDF4.Dataset(fn_netcdf_yw) as ds:
+        expected = ds["rainfall_amount"][:].filled(np.nan)
+
+    # The views share the file, hence they have to share the lock
+    with open_radolan_netcdf(fn_netcdf_yw, mask_flags=["nodatamask"]) as array:
+        dask_array = da.concatenate(
+            [
+                array.isel(y=slice(0, 550)).to_dask(chunks=(1, 50, 900)),
+                array.isel(y=slice(550, 1100)).to_dask(chunks=(1, 50, 900)),
+            ],
+            axis=1,
+        )
+        actual = dask_array.compute(scheduler="threads", num_workers=8)
+        assert_allclose(
+            np.nansum(actual, axis=0), np.nansum(expected, axis=0), rtol=1e-4
+        )
+
+
+def test_open_radolan_netcdf_errors(fn_netcdf_yw):
+    with pytest.raises(ValueError, match="is not a \\(time, y, x\\) variable"):
+        open_radolan_netcdf(fn_netcdf_yw, variable_name="maxrange")
+    with open_radolan_netcdf(fn_netcdf_yw) as array:
+        with pytest.raises(ValueError, match="step 1"):
+            array[::2]
@@ -0,0 +1,106 @@
+import netCDF4
+import numpy as np
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import rechunk
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.fixture
+def fn_netcdf_ry(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RY", flag_encoding="ragged")
+    data_list, metadata_list = [], []
+    for fn_radolan_file in sorted(get_test_data_for_product("RY")):
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+    return fn
+
+
+def test_create_empty_netcdf_with_chunk_profile(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="YW", flag_encoding="packed", chunk_profile="balanced"
+    )
+    with netCDF4.Dataset(fn) as ds:
+        assert ds["rainfall_amount"].chunking() == [24, 100, 100]
+        assert ds["flags"].chunking() == [24, 100, 100]
+
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW", chunk_profile="map")
+    with netCDF4.Dataset(fn) as ds:
+        assert ds["rainfall_amount"].chunking() == [1, 1100, 900]
+
+    with pytest.raises(ValueError, match="`chunk_profile` has to be one of"):
+        radolan_to_netcdf.create_empty_netcdf(
+            fn, product_name="YW", chunk_profile="foo"
+        )
+
+
+@pytest.mark.parametrize(
+    "chunk_profile, max_memory",
+    [("timeseries", 500e6), ("balanced", 500e6), ("map", 500e6), ("balanced", 1e6)],
+)
+def test_rechunk_netcdf(fn_netcdf_ry, tmp_path, chunk_profile, max_memory):
+    fn_rechunked = str(tmp_path / "test_rechunked.nc")
+    rechunk.rechunk_netcdf(
+        fn_netcdf_ry, fn_rechunked, chunk_profile=chunk_profile, max_memory=max_memory
+    )
+
+    with netCDF4.Dataset(fn_netcdf_ry) as ds, netCDF4.Dataset(fn_rechunked) as ds_new:
+        assert ds_new["rainfall_amount"].chunking() == list(
+            radolan_to_netcdf.get_chunksizes(
+                chunk_profile, n_lats=900, n_lons=900, n_time=13
+            )
+        )
+        assert ds_new["rainfall_amount"].filters()["zlib"]
+        assert ds_new.dimensions["time"].isunlimited()
+        assert ds_new.ncattrs() == ds.ncattrs()
+        assert list(ds_new.variables) == list(ds.variables)
+        for variable_name, nc_var in ds.variables.items():
+            assert ds_new[variable_name].ncattrs() == nc_var.ncattrs()
+            if nc_var.ndim > 0:
+                np.testing.assert_equal(ds_new[variable_name][:], nc_var[:])
+
+    for flag_name in ["secondary", "nodatamask", "cluttermask"]:
+        np.testing.assert_equal(
+            radolan_to_netcdf.read_flag(fn_rechunked, flag_name),
+            radolan_to_netcdf.read_flag(fn_netcdf_ry, flag_name),
+        )
+
+
+def test_rechunk_netcdf_keeps_blosc_compression(tmp_path):
+    fn_src = str(tmp_path / "test_blosc.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn_src, product_name="RY", compression_profile="blosc_lz4"
+    )
+    fn_dst = str(tmp_path / "test_rechunked.nc")
+    rechunk.rechunk_netcdf(fn_src, fn_dst, chunk_profile="balanced")
+    with netCDF4.Dataset(fn_dst) as ds:
+        assert ds["rainfall_amount"].filters()["blosc"] == {
+            "compressor": "blosc_lz4",
+            "shuffle": 1,
+        }
+
+
+def test_rechunk_netcdf_keeps_radar_matrix(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RY", radar_encoding="matrix"
+    )
+    for fn_radolan_file in sorted(get_test_data_for_product("RY"))[:2]:
+        radolan_to_netcdf.append_to_netcdf(
+            fn, *radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        )
+    fn_rechunked = str(tmp_path / "test_rechunked.nc")
+    rechunk.rechunk_netcdf(fn, fn_rechunked, chunk_profile="timeseries")
+
+    with netCDF4.Dataset(fn) as ds, netCDF4.Dataset(fn_rechunked) as ds_new:
+        assert (
+            ds_new["maxrange"].datatype.enum_dict == ds["maxrange"].datatype.enum_dict
+        )
+        np.testing.assert_equal(ds_new["maxrange"][:], ds["maxrange"][:])
+        np.testing.assert_equal(ds_new["radar_available"][:], ds["radar_available"][:])
+        assert list(ds_new["radar_site"][:]) == list(ds["radar_site"][:])
@@ -0,0 +1,102 @@
+import os
+from datetime import timedelta
+import xml.etree.ElementTree as ET
+import concurrent.futures
+import netCDF4
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import shards
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+def test_sharded_writer(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("RY"))
+    data_list, metadata_list = [], []
+    for fn_radolan_file in fn_radolan_files:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+
+    # Hourly files, since the test data covers 15:00 to 16:00
+    fn_pattern = str(tmp_path / "shards" / "RY_%Y-%m-%dT%H.nc")
+    os.mkdir(str(tmp_path / "shards"))
+    fn_manifest = str(tmp_path / "RY.json")
+    with shards.ShardedRadolanNetCDFWriter(
+        fn_pattern,
+        fn_manifest,
+        product_name="RY",
+        flush_interval=5,
+        create_kwargs={"flag_encoding": "packed"},
+    ) as writer:
+        for data, metadata in zip(data_list, metadata_list):
+            writer.append(data, metadata)
+
+    files = shards.read_manifest(fn_manifest)
+    assert [os.path.basename(file_info["fn"]) for file_info in files] == [
+        "RY_2020-01-01T15.nc",
+        "RY_2020-01-01T16.nc",
+    ]
+    assert [file_info["n_time"] for file_info in files] == [12, 1]
+    assert files[0]["t_start"] == "2020-01-01T15:00:00"
+    assert files[0]["t_end"] == "2020-01-01T15:55:00"
+
+    rainfall_amount = []
+    for file_info in files:
+        with netCDF4.Dataset(file_info["fn"]) as ds:
+            assert ds.flag_encoding == "packed"
+            rainfall_amount.append(ds["rainfall_amount"][:].filled(np.nan))
+    assert_almost_equal(np.concatenate(rainfall_amount), np.stack(data_list))
+
+    # Time steps which are already in the file are rejected
+    with shards.ShardedRadolanNetCDFWriter(
+        fn_pattern, fn_manifest, product_name="RY"
+    ) as writer:
+        with pytest.raises(ValueError, match="already in"):
+            writer.append(data_list[-1], metadata_list[-1])
+
+    # Appending again to an existing file updates its manifest entry
+    metadata = dict(
+        metadata_list[-1], datetime=metadata_list[-1]["datetime"] + timedelta(minutes=5)
+    )
+    with shards.ShardedRadolanNetCDFWriter(
+        fn_pattern, fn_manifest, product_name="RY"
+    ) as writer:
+        writer.append(data_list[-1], metadata)
+        with pytest.raises(ValueError, match="already in"):
+            writer.append(data_list[-1], metadata)
+    files = shards.read_manifest(fn_manifest)
+    assert [file_info["n_time"] for file_info in files] == [12, 2]
+    assert files[1]["t_end"] == "2020-01-01T16:05:00"
+
+    fn_ncml = str(tmp_path / "RY.ncml")
+    shards.write_ncml(fn_manifest, fn_ncml)
+    ns = "{http://www.unidata.ucar.edu/namespaces/netcdf/ncml-2.2}"
+    aggregation = ET.parse(fn_ncml).getroot().find(ns + "aggregation")
+    assert aggregation.get("dimName") == "time"
+    assert [
+        (element.get("location"), element.get("ncoords"))
+        for element in aggregation.findall(ns + "netcdf")
+    ] == [("shards/RY_2020-01-01T15.nc", "12"), ("shards/RY_2020-01-01T16.nc", "2")]
+
+
+def test_update_manifest_from_several_processes(tmp_path):
+    fn_manifest = str(tmp_path / "RY.json")
+    fn_list = [str(tmp_path / ("RY_%02d.nc" % i)) for i in range(8)]
+    for fn in fn_list:
+        radolan_to_netcdf.create_empty_netcdf(fn, product_name="RY")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                shards.update_manifest,
+                [fn_manifest] * len(fn_list),
+                [[fn] for fn in fn_list],
+            )
+        )
+
+    files = shards.read_manifest(fn_manifest)
+    assert sorted(file_info["fn"] for file_info in files) == fn_list
+    assert not [fn for fn in os.listdir(str(tmp_path)) if fn.endswith(".tmp")]
@@ -0,0 +1,118 @@
+import os
+import shutil
+import netCDF4
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import sync
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+@pytest.fixture
+def fn_radolan_files(tmp_path):
+    fn_list = []
+    for fn in sorted(get_test_data_for_product("YW")):
+        fn_list.append(shutil.copy(fn, str(tmp_path)))
+    return fn_list
+
+
+def test_sync_files_inserts_late_files_and_skips_known_files(
+    fn_radolan_files, tmp_path
+):
+    fn_serial = str(tmp_path / "test_serial.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_serial, product_name="YW")
+    data_list, metadata_list = [], []
+    for fn in fn_radolan_files:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    radolan_to_netcdf.append_to_netcdf(fn_serial, data_list, metadata_list)
+
+    # First run with some files missing and in random order
+    fn_sync = str(tmp_path / "test_sync.nc")
+    fn_list_first = [fn_radolan_files[i] for i in [0, 7, 2, 3, 11, 9]]
+    summary = sync.sync_files(
+        fn_list_first, fn_sync, product_name="YW", workers=2, batch_size=4
+    )
+    assert summary == {"written": 6, "skipped": 0, "duplicates": 0}
+    with netCDF4.Dataset(fn_sync) as ds:
+        assert len(ds["time"]) == 12
+        assert_almost_equal(ds["time"][:], netCDF4.Dataset(fn_serial)["time"][:])
+        assert ds["rainfall_amount"][1].mask.all()
+
+    # Second run with all files inserts the missing time steps
+    summary = sync.sync_files(fn_radolan_files, fn_sync, product_name="YW", workers=2)
+    assert summary == {"written": 6, "skipped": 6, "duplicates": 0}
+
+    with netCDF4.Dataset(fn_serial) as ds_serial, netCDF4.Dataset(fn_sync) as ds_sync:
+        for variable_name in ["time", "rainfall_amount", "nodatamask", "maxrange"]:
+            assert_almost_equal(
+                ds_sync[variable_name][:].filled(np.nan),
+                ds_serial[variable_name][:].filled(np.nan),
+            )
+
+    # A file with a changed modification time but the same content is
+    # skipped, a copy of a file with another name is a duplicate
+    os.utime(fn_radolan_files[0], ns=(0, 0))
+    fn_copy = fn_radolan_files[1].replace("---bin", "-copy---bin")
+    shutil.copy(fn_radolan_files[1], fn_copy)
+    summary = sync.sync_files(
+        fn_radolan_files + [fn_copy], fn_sync, product_name="YW", workers=2
+    )
+    assert summary == {"written": 0, "skipped": 12, "duplicates": 1}
+    with netCDF4.Dataset(fn_sync) as ds:
+        assert len(ds["time"]) == 12
+
+    index = sync.read_index(fn_sync + ".index.json")
+    assert len(index["files"]) == 13
+    assert len(index["datetimes"]) == 12
+
+    # A file with the same name in another directory is not skipped
+    os.mkdir(str(tmp_path / "other"))
+    fn_other = shutil.copy(fn_radolan_files[2], str(tmp_path / "other"))
+    summary = sync.sync_files([fn_other], fn_sync, product_name="YW", workers=1)
+    assert summary == {"written": 0, "skipped": 0, "duplicates": 1}
+    index = sync.read_index(fn_sync + ".index.json")
+    assert os.path.abspath(fn_other) in index["files"]
+    assert os.path.abspath(fn_radolan_files[2]) in index["files"]
+
+
+def test_sync_files_time_axis_errors(fn_radolan_files, tmp_path):
+    fn = str(tmp_path / "test.nc")
+    sync.sync_files(fn_radolan_files[5:7], fn, product_name="YW", workers=1)
+    with pytest.raises(ValueError, match="is not on the time axis"):
+        sync.sync_files(fn_radolan_files[:2], fn, product_name="YW", workers=1)
+
+    fn_irregular = str(tmp_path / "test_irregular.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_irregular, product_name="YW")
+    for i in [0, 2]:
+        radolan_to_netcdf.append_to_netcdf(
+            fn_irregular,
+            *[[x] for x in radolan_to_netcdf.read_in_one_bin_file(fn_radolan_files[i])]
+        )
+    with pytest.raises(ValueError, match="is not regular"):
+        sync.sync_files(fn_radolan_files[1:2], fn_irregular, product_name="YW")
+
+
+def test_index_is_not_written_if_interrupted(fn_radolan_files, tmp_path):
+    fn = str(tmp_path / "test.nc")
+    fn_index = fn + ".index.json"
+    sync.sync_files(fn_radolan_files[:2], fn, product_name="YW", workers=1)
+    index = sync.read_index(fn_index)
+
+    with pytest.raises(KeyboardInterrupt):
+        with sync.IndexedRadolanNetCDFWriter(fn, "YW") as writer:
+            writer.write(
+                fn_radolan_files[2],
+                *sync.read_in_one_bin_file_with_info(fn_radolan_files[2])
+            )
+            raise KeyboardInterrupt
+    assert sync.read_index(fn_index) == index
+    with netCDF4.Dataset(fn) as ds:
+        assert len(ds["time"]) == 2
+
+    # The next run ingests the file again
+    summary = sync.sync_files(fn_radolan_files[:3], fn, product_name="YW", workers=1)
+    assert summary == {"written": 1, "skipped": 2, "duplicates": 0}
@@ -0,0 +1,172 @@
+import os
+import json
+import shutil
+import asyncio
+import netCDF4
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from radolan_to_netcdf import radolan_to_netcdf
+from radolan_to_netcdf import watch
+from radolan_to_netcdf import cli
+from radolan_to_netcdf.tests.tools import get_test_data_for_product
+
+
+async def _wait_for(condition, timeout=60):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise TimeoutError("Condition not met within %d seconds" % timeout)
+
+
+def test_watch_directory_ingests_arriving_files(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product("YW"))[:4]
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    fn_netcdf = str(tmp_path / "test_watch.nc")
+    fn_metrics = str(tmp_path / "metrics.json")
+
+    # Files which are already there when starting
+    for fn in fn_radolan_files[:2]:
+        shutil.copy(fn, str(spool_dir))
+
+    async def run():
+        stop_event = asyncio.Event()
+        metrics = watch.IngestMetrics()
+        task = asyncio.ensure_future(
+            watch.watch_directory(
+                str(spool_dir),
+                fn_netcdf,
+                "YW",
+                poll_interval=0.05,
+                fn_metrics=fn_metrics,
+                metrics=metrics,
+                stop_event=stop_event,
+            )
+        )
+        await _wait_for(lambda: metrics.n_written == 2)
+
+        # Files arriving later, one of them late, and a broken file
+        shutil.copy(fn_radolan_files[3], str(spool_dir))
+        shutil.copy(fn_radolan_files[2], str(spool_dir))
+        with open(str(spool_dir / "broken"), "wb") as fh:
+            fh.write(b"not a RADOLAN file")
+        # Partially written files are ignored
+        with open(str(spool_dir / ".incoming"), "wb") as fh:
+            fh.write(b"not a RADOLAN file")
+        await _wait_for(lambda: metrics.n_written == 4 and metrics.n_errors == 1)
+
+        stop_event.set()
+        return await task
+
+    metrics = asyncio.run(run())
+
+    metrics_dict = metrics.as_dict()
+    assert metrics_dict["n_written"] == 4
+    assert metrics_dict["n_duplicates"] == 0
+    assert metrics_dict["n_errors"] == 1
+    assert metrics_dict["max_ingest_lag_s"] >= metrics_dict["mean_ingest_lag_s"] > 0
+    with open(fn_metrics) as fh:
+        assert json.load(fh)["n_written"] == 4
+
+    fn_serial = str(tmp_path / "test_serial.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_serial, product_name="YW")
+    for fn in fn_radolan_files:
+        radolan_to_netcdf.append_to_netcdf(
+            fn_serial, *radolan_to_netcdf.read_in_one_bin_file(fn)
+        )
+    with netCDF4.Dataset(fn_serial) as ds_serial, netCDF4.Dataset(fn_netcdf) as ds:
+        for variable_name in ["time", "rainfall_amount", "nodatamask", "maxrange"]:
+            assert_almost_equal(
+                ds[variable_name][:].filled(np.nan),
+                ds_serial[variable_name][:].filled(np.nan),
+            )
+        t_last = netCDF4.num2date(ds["time"][-1], ds["time"].units, ds["time"].calendar)
+        assert metrics_dict["last_datetime"] == t_last.isoformat()
+
+    # A restart does not ingest the files again
+    async def restart():
+        stop_event = asyncio.Event()
+        metrics = watch.IngestMetrics()
+        task = asyncio.ensure_future(
+            watch.watch_directory(
+                str(spool_dir),
+                fn_netcdf,
+                "YW",
+                poll_interval=0.05,
+                metrics=metrics,
+                stop_event=stop_event,
+            )
+        )
+        await asyncio.sleep(0.5)
+        stop_event.set()
+        return await task
+
+    metrics = asyncio.run(restart())
+    assert metrics.n_written == 0
+    with netCDF4.Dataset(fn_netcdf) as ds:
+        assert ds["time"].shape == (4,)
+
+
+class _WriterWithoutIngestedFiles(object):
+    def is_ingested(self, fn):
+        return False
+
+
+def test_poll_directory_forgets_removed_files(tmp_path):
+    writer = _WriterWithoutIngestedFiles()
+    handled, pending = {}, {}
+    fn_a, fn_b = tmp_path / "a", tmp_path / "b"
+    fn_a.write_bytes(b"a")
+    fn_b.write_bytes(b"b")
+
+    assert watch._poll_directory(str(tmp_path), "*", writer, handled, pending) == {}
+    assert set(pending) == {str(fn_a), str(fn_b)}
+    fn_b.unlink()
+    ready = watch._poll_directory(str(tmp_path), "*", writer, handled, pending)
+    assert set(ready) == {str(fn_a)}
+    assert pending == {}
+    handled.update(ready)
+
+    # E.g. rotated out of the spool directory
+    fn_a.unlink()
+    assert watch._poll_directory(str(tmp_path), "*", writer, handled, pending) == {}
+    assert handled == {}
+    assert pending == {}
+
+
+class _WriterRemovingFiles(object):
+    def is_ingested(self, fn):
+        # As if the file was moved away between `scandir` and `stat`
+        os.remove(fn)
+        return os.stat(fn)
+
+
+def test_poll_directory_skips_files_removed_while_polling(tmp_path):
+    handled, pending = {}, {}
+    (tmp_path / "a").write_bytes(b"a")
+    assert (
+        watch._poll_directory(
+            str(tmp_path), "*", _WriterRemovingFiles(), handled, pending
+        )
+        == {}
+    )
+    assert handled == {}
+    assert pending == {}
+
+
+def test_cli_watch_arguments():
+    args = cli.get_parser().parse_args(
+        ["watch", "spool", "target.nc", "--product", "RY", "--poll-interval", "5"]
+    )
+    assert args.command == "watch"
+    assert args.directory == "spool"
+    assert args.target == "target.nc"
+    assert args.product == "RY"
+    assert args.poll_interval == 5.0
+    assert args.workers == 1
+
+    with pytest.raises(SystemExit):
+        cli.get_parser().parse_args(["watch", "spool", "target.nc"])
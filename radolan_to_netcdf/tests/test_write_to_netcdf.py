@@ -1,9 +1,12 @@
 import unittest
 import os
+import datetime
 import pkg_resources
 import glob
 import netCDF4
+import wradlib as wrl
 import numpy as np
+import pytest
 from numpy.testing import assert_almost_equal
 
 from radolan_to_netcdf import radolan_to_netcdf
@@ -77,3 +80,481 @@ def test_flagged_pixels():
             np.testing.assert_almost_equal(actual, reference)
 
     os.remove(fn)
+
+
+def test_streaming_writer():
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RW"))
+    fn = "test.nc"
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RW")
+
+    data_list, metadata_list = [], []
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn, flush_interval=5) as writer:
+        assert writer.current_length == 0
+        for i, fn_radolan_file in enumerate(fn_radolan_files):
+            data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+            data_list.append(data)
+            metadata_list.append(metadata)
+            writer.append(data, metadata)
+            # Data is only written to file after `flush_interval` appends
+            assert writer.current_length == (i + 1) // 5 * 5
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert len(ds["time"]) == len(fn_radolan_files)
+        assert_almost_equal(
+            ds["rainfall_amount"][:].filled(np.nan), np.stack(data_list)
+        )
+        assert list(netCDF4.num2date(ds["time"][:], ds["time"].units)) == [
+            metadata["datetime"] for metadata in metadata_list
+        ]
+        assert ds["radarlocations"][-1] == " ".join(metadata["radarlocations"])
+
+    # Appending to an existing file continues after the last time step
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn) as writer:
+        assert writer.current_length == len(fn_radolan_files)
+        writer.append(data_list[0], metadata_list[0])
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert len(ds["time"]) == len(fn_radolan_files) + 1
+
+    os.remove(fn)
+
+
+def test_streaming_writer_write_at_index(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RW"))[:6]
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RW")
+
+    data_list = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn, flush_interval=4) as writer:
+        for i in [5, 0, 1, 3]:
+            writer.write(*data_list[i], i_time=i)
+        assert writer.current_length == 6
+        writer.write(*data_list[2], i_time=2)
+        writer.append(*data_list[4])
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert len(ds["time"]) == 7
+        for i in [0, 1, 2, 3, 5]:
+            assert_almost_equal(
+                ds["rainfall_amount"][i].filled(np.nan), data_list[i][0]
+            )
+        # The skipped time step is empty and `append` continues at the end
+        assert ds["rainfall_amount"][4].mask.all()
+        assert_almost_equal(ds["rainfall_amount"][6].filled(np.nan), data_list[4][0])
+
+    fn_ragged = str(tmp_path / "test_ragged.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn_ragged, product_name="RW", flag_encoding="ragged"
+    )
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn_ragged) as writer:
+        with pytest.raises(NotImplementedError, match="out of order"):
+            writer.write(*data_list[1], i_time=1)
+
+
+def test_fixed_time_axis(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RW"))[:5]
+    data_list = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    t_start = data_list[0][1]["datetime"] - datetime.timedelta(hours=1)
+    t_end = data_list[-1][1]["datetime"] + datetime.timedelta(hours=2)
+
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RW", time_range=(t_start, t_end), chunk_profile="timeseries"
+    )
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert not ds.dimensions["time"].isunlimited()
+        assert len(ds["time"]) == 8
+        assert ds["rainfall_amount"].chunking()[0] == 8
+        times = netCDF4.num2date(ds["time"][:], ds["time"].units)
+        assert times[0] == t_start
+        assert times[-1] == t_end
+
+    # The time steps are written to the index of their time stamp
+    for i in [3, 0, 4]:
+        radolan_to_netcdf.append_to_netcdf(fn, *data_list[i])
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn) as writer:
+        writer.append(*data_list[1])
+        with pytest.raises(ValueError, match="outside of the fixed time axis"):
+            writer.write(*data_list[2], i_time=8)
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert len(ds["time"]) == 8
+        for i in [0, 1, 3, 4]:
+            assert_almost_equal(
+                ds["rainfall_amount"][i + 1].filled(np.nan), data_list[i][0]
+            )
+        for i in [0, 3, 6, 7]:
+            assert ds["rainfall_amount"][i].mask.all()
+        assert list(netCDF4.num2date(ds["time"][:], ds["time"].units)) == list(times)
+
+    metadata = dict(data_list[0][1], datetime=t_start + datetime.timedelta(minutes=5))
+    with pytest.raises(ValueError, match="is not on the time axis"):
+        radolan_to_netcdf.append_to_netcdf(fn, data_list[0][0], metadata)
+    with pytest.raises(ValueError, match="ragged"):
+        radolan_to_netcdf.create_empty_netcdf(
+            fn, product_name="RW", time_range=(t_start, t_end), flag_encoding="ragged"
+        )
+
+
+def test_streaming_writer_product_error():
+    fn = "test.nc"
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RY")
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        get_test_data_for_product(product_name="RW")[0]
+    )
+    with pytest.raises(ValueError, match="RADOLAN product of data is `RW`"):
+        with radolan_to_netcdf.RadolanNetCDFWriter(fn) as writer:
+            writer.append(data, metadata)
+
+    os.remove(fn)
+
+
+@pytest.mark.parametrize("flag_encoding", ["dense", "packed", "ragged"])
+def test_read_flag(flag_encoding):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="YW"))[:3]
+    decoded = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    data_list = [data for data, _ in decoded]
+    metadata_list = [metadata for _, metadata in decoded]
+    fn = "test.nc"
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="YW", flag_encoding=flag_encoding
+    )
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert ds.flag_encoding == flag_encoding
+        for flag_name in ["secondary", "nodatamask", "cluttermask"]:
+            flags = radolan_to_netcdf.read_flag(ds, flag_name)
+            assert flags.shape == (3, 1100, 900)
+            for i, metadata in enumerate(metadata_list):
+                actual = np.nonzero(flags[i].flatten())[0]
+                np.testing.assert_equal(actual, metadata[flag_name])
+
+    flag = radolan_to_netcdf.read_flag(fn, "cluttermask", time_index=1)
+    np.testing.assert_equal(
+        np.nonzero(flag.flatten())[0], metadata_list[1]["cluttermask"]
+    )
+
+    os.remove(fn)
+
+
+def test_ragged_flag_storage(tmp_path):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="YW"))[:3]
+    decoded = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    data_list = [data for data, _ in decoded]
+    metadata_list = [metadata for _, metadata in decoded]
+    # A time step without flagged pixels
+    metadata_list[1] = dict(metadata_list[1], cluttermask=np.array([], dtype=np.int64))
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW", flag_encoding="ragged")
+    # The samples of the second call are appended after those of the first
+    radolan_to_netcdf.append_to_netcdf(fn, data_list[:2], metadata_list[:2])
+    radolan_to_netcdf.append_to_netcdf(fn, data_list[2:], metadata_list[2:])
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        for flag_name in ["secondary", "nodatamask", "cluttermask"]:
+            counts = [len(metadata[flag_name]) for metadata in metadata_list]
+            samples = np.concatenate(
+                [metadata[flag_name] for metadata in metadata_list]
+            )
+            assert ds.dimensions[flag_name + "_sample"].size == sum(counts)
+            assert ds[flag_name].dimensions == (flag_name + "_sample",)
+            np.testing.assert_equal(ds[flag_name + "_count"][:], counts)
+            np.testing.assert_equal(ds[flag_name][:], samples)
+        assert ds["cluttermask_count"][1] == 0
+
+        flags = radolan_to_netcdf.read_flag(ds, "cluttermask", time_index=1)
+        assert not flags.any()
+
+
+def test_flag_encoding_error():
+    with pytest.raises(ValueError, match="`flag_encoding` has to be one of"):
+        radolan_to_netcdf.create_empty_netcdf(
+            "test.nc", product_name="RW", flag_encoding="foo"
+        )
+
+
+@pytest.mark.parametrize("radar_encoding", ["string", "matrix"])
+def test_read_radar_availability(tmp_path, radar_encoding):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RW"))
+    data_list, metadata_list = [], []
+    for fn_radolan_file in fn_radolan_files:
+        data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        data_list.append(data)
+        metadata_list.append(metadata)
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RW", radar_encoding=radar_encoding
+    )
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+
+    radar_sites, radar_available = radolan_to_netcdf.read_radar_availability(fn)
+    assert radar_available.shape == (24, len(radar_sites))
+    for i, metadata in enumerate(metadata_list):
+        assert [
+            radar_site
+            for radar_site, available in zip(radar_sites, radar_available[i])
+            if available
+        ] == sorted(metadata["radarlocations"], key=radar_sites.index)
+    # Boostedt is missing in three time steps of the test data
+    assert (~radar_available[:, radar_sites.index("boo")]).sum() == 3
+
+    radar_sites, radar_available = radolan_to_netcdf.read_radar_availability(
+        fn, time_index=3
+    )
+    assert radar_available.shape == (len(radar_sites),)
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert ds.radar_encoding == radar_encoding
+        if radar_encoding == "matrix":
+            assert "radarlocations" not in ds.variables
+            assert ds["radar_available"].filters()["zlib"]
+            enum_dict = ds["maxrange"].datatype.enum_dict
+            assert_almost_equal(ds["maxrange"][:], enum_dict["150 km"])
+        else:
+            assert_almost_equal(ds["maxrange"][:], 150)
+
+
+def test_radar_encoding_errors(tmp_path):
+    with pytest.raises(ValueError, match="`radar_encoding` has to be one of"):
+        radolan_to_netcdf.create_empty_netcdf(
+            "test.nc", product_name="RW", radar_encoding="foo"
+        )
+
+    with pytest.raises(ValueError, match="Radar site `xyz` is not in"):
+        radolan_to_netcdf.get_radar_availability(["boo"], [{"radarlocations": ["xyz"]}])
+
+    # An unknown `maxrange` is rejected before anything is written
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RW", radar_encoding="matrix"
+    )
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        get_test_data_for_product(product_name="RW")[0]
+    )
+    with radolan_to_netcdf.RadolanNetCDFWriter(fn) as writer:
+        writer.append(data, metadata)
+        with pytest.raises(ValueError, match="is not in `maxrange_enum`"):
+            writer.append(data, dict(metadata, maxrange="42 km"))
+    with netCDF4.Dataset(fn) as ds:
+        assert len(ds["time"]) == 1
+
+
+@pytest.mark.parametrize("radar_encoding", ["string", "matrix"])
+def test_radar_site_not_in_config(tmp_path, radar_encoding):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RW", radar_encoding=radar_encoding
+    )
+    decoded = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in sorted(get_test_data_for_product(product_name="RW"))[:3]
+    ]
+    # E.g. a site which has since been replaced
+    decoded[1][1]["radarlocations"] = decoded[1][1]["radarlocations"] + ["xyz"]
+    for data, metadata in decoded:
+        radolan_to_netcdf.append_to_netcdf(fn, data, metadata)
+
+    radar_sites, radar_available = radolan_to_netcdf.read_radar_availability(fn)
+    assert radar_sites[-1] == "xyz"
+    assert radar_available.shape == (3, len(radar_sites))
+    assert list(radar_available[:, -1]) == [False, True, False]
+    assert radar_available[:, radar_sites.index("boo")].all()
+
+
+def test_coordinate_cache(tmp_path):
+    radolan_to_netcdf._radolan_coordinates_cache.clear()
+    x, y, lats, lons = radolan_to_netcdf.get_radolan_coordinates(
+        n_lats=1100, n_lons=900, cache_dir=str(tmp_path)
+    )
+    assert (tmp_path / "radolan_coordinates_1100x900.npy").exists()
+
+    reference = wrl.georef.get_radolan_grid(ncols=900, nrows=1100, wgs84=True)
+    assert_almost_equal(lons, reference[:, :, 0])
+    assert_almost_equal(lats, reference[:, :, 1])
+
+    # Coordinates loaded from the disk cache are the same
+    radolan_to_netcdf._radolan_coordinates_cache.clear()
+    x_cached, y_cached, lats_cached, lons_cached = (
+        radolan_to_netcdf.get_radolan_coordinates(
+            n_lats=1100, n_lons=900, cache_dir=str(tmp_path)
+        )
+    )
+    assert_almost_equal(x_cached, x)
+    assert_almost_equal(y_cached, y)
+    assert_almost_equal(lats_cached, lats)
+    assert_almost_equal(lons_cached, lons)
+
+
+def test_compress_lat_lon(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    fn_compressed = str(tmp_path / "test_compressed.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RW")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn_compressed, product_name="RW", compress_lat_lon=True
+    )
+
+    with netCDF4.Dataset(fn) as ds, netCDF4.Dataset(fn_compressed) as ds_compressed:
+        assert ds_compressed["latitudes"].dtype == np.float32
+        assert_almost_equal(
+            ds_compressed["latitudes"][:], ds["latitudes"][:], decimal=4
+        )
+        assert_almost_equal(
+            ds_compressed["longitudes"][:], ds["longitudes"][:], decimal=4
+        )
+    assert os.path.getsize(fn_compressed) < os.path.getsize(fn) / 2
+
+
+def test_pack_data_same_as_netcdf4_scaling(tmp_path):
+    from radolan_to_netcdf.radolan_product_netcdf_config import (
+        radolan_product_netcdf_config,
+    )
+
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RY"))[:3]
+    decoded = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    data_list = [data for data, _ in decoded]
+    metadata_list = [metadata for _, metadata in decoded]
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="RY")
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+
+    # Reference written via the automatic scaling of netCDF4
+    fn_reference = str(tmp_path / "test_reference.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn_reference, product_name="RY")
+    with netCDF4.Dataset(fn_reference, "a") as ds:
+        for i, data in enumerate(data_list):
+            ds["rainfall_amount"][i, :, :] = np.where(np.isnan(data), -99.99, data)
+
+    with netCDF4.Dataset(fn) as ds, netCDF4.Dataset(fn_reference) as ds_reference:
+        ds["rainfall_amount"].set_auto_maskandscale(False)
+        ds_reference["rainfall_amount"].set_auto_maskandscale(False)
+        actual = ds["rainfall_amount"][:]
+        np.testing.assert_equal(actual, ds_reference["rainfall_amount"][:])
+        assert (actual == -9999).sum() == sum(
+            len(metadata["nodatamask"]) for metadata in metadata_list
+        )
+
+    variable_config = radolan_product_netcdf_config["RY"]["variables"][
+        "rainfall_amount"
+    ]
+    out = np.empty(data_list[0].shape, dtype="i2")
+    radolan_to_netcdf.pack_data(data_list[0], variable_config, out=out)
+    np.testing.assert_equal(out, actual[0])
+
+
+@pytest.mark.parametrize("compression_profile", ["none", "fast_ingest", "blosc_lz4"])
+def test_compression_profile(tmp_path, compression_profile):
+    fn_radolan_files = sorted(get_test_data_for_product(product_name="RW"))[:2]
+    decoded = [
+        radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+        for fn_radolan_file in fn_radolan_files
+    ]
+    data_list = [data for data, _ in decoded]
+    metadata_list = [metadata for _, metadata in decoded]
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn, product_name="RW", compression_profile=compression_profile
+    )
+    radolan_to_netcdf.append_to_netcdf(fn, data_list, metadata_list)
+
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        for variable_name in ["rainfall_amount", "secondary"]:
+            filters = ds[variable_name].filters()
+            if compression_profile == "none":
+                assert not filters["zlib"] and not filters["blosc"]
+            elif compression_profile == "fast_ingest":
+                assert filters["zlib"] and filters["shuffle"]
+                assert filters["complevel"] == 1
+            else:
+                assert filters["blosc"] == {"compressor": "blosc_lz4", "shuffle": 1}
+        # Variables without a time dimension are not changed
+        assert not ds["latitudes"].filters()["zlib"]
+        assert_almost_equal(
+            ds["rainfall_amount"][:].filled(np.nan), np.stack(data_list)
+        )
+
+
+def test_compression_profile_per_variable(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(
+        fn,
+        product_name="RW",
+        compression_profile={"rainfall_amount": "archival", "maxrange": "zstd"},
+    )
+    with netCDF4.Dataset(fn, mode="r") as ds:
+        assert ds["rainfall_amount"].filters()["zstd"]
+        assert ds["rainfall_amount"].filters()["complevel"] == 19
+        assert ds["maxrange"].filters()["zstd"]
+        # Variables which are not in the dict keep the compression of the config
+        assert ds["secondary"].filters()["zlib"]
+
+    with pytest.raises(ValueError, match="compression_profile"):
+        radolan_to_netcdf.create_empty_netcdf(
+            fn, product_name="RW", compression_profile="fastest"
+        )
+
+
+def test_failed_write_keeps_automatic_scaling(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW")
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        get_test_data_for_product(product_name="YW")[0]
+    )
+    with netCDF4.Dataset(fn, "a") as nc_fh:
+        # The grid does not fit to the variable
+        with pytest.raises(ValueError):
+            radolan_to_netcdf._write_block(nc_fh, 0, [data[:900]], [metadata])
+        assert nc_fh["rainfall_amount"].scale
+        assert nc_fh["rainfall_amount"].mask
+
+
+def test_writer_is_closed_if_flush_fails(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW")
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        get_test_data_for_product(product_name="YW")[0]
+    )
+    writer = radolan_to_netcdf.RadolanNetCDFWriter(fn)
+    writer.open()
+    writer.append(data[:900], metadata)
+    with pytest.raises(ValueError):
+        writer.close()
+    assert writer._nc_fh is None
+    writer.close()
+
+    radolan_to_netcdf.append_to_netcdf(fn, data, metadata)
+    with netCDF4.Dataset(fn) as ds:
+        assert len(ds["time"]) == 1
+
+
+def test_writer_keeps_exception_of_with_block(tmp_path):
+    fn = str(tmp_path / "test.nc")
+    radolan_to_netcdf.create_empty_netcdf(fn, product_name="YW")
+    data, metadata = radolan_to_netcdf.read_in_one_bin_file(
+        get_test_data_for_product(product_name="YW")[0]
+    )
+    with pytest.raises(KeyboardInterrupt):
+        with radolan_to_netcdf.RadolanNetCDFWriter(fn) as writer:
+            # Writing this time step would fail with a ValueError
+            writer.append(data[:900], metadata)
+            raise KeyboardInterrupt
+    assert writer._nc_fh is None
+
+    # The buffered time step was discarded
+    with netCDF4.Dataset(fn) as ds:
+        assert len(ds["time"]) == 0
@@ -1,4 +1,6 @@
 import unittest
+import os
+import tempfile
 import wradlib as wrl
 import numpy as np
 
@@ -62,15 +64,17 @@ class TestWradlibToRadolanBinaryRoundtrip(unittest.TestCase):
                 fn_radolan_file
             )
 
-            wradlib_to_radolan_bin.write_to_radolan_bin_file(
-                fn="test_radolan.bin",
-                data=data_reference,
-                metadata=metadata_reference,
-            )
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                fn = os.path.join(tmp_dir, "test_radolan.bin")
+                wradlib_to_radolan_bin.write_to_radolan_bin_file(
+                    fn=fn,
+                    data=data_reference,
+                    metadata=metadata_reference,
+                )
 
-            data_actual, metadata_actual = radolan_to_netcdf.read_in_one_bin_file(
-                "test_radolan.bin"
-            )
+                data_actual, metadata_actual = radolan_to_netcdf.read_in_one_bin_file(
+                    fn
+                )
 
             np.testing.assert_almost_equal(data_actual, data_reference)
 
@@ -83,3 +87,49 @@ class TestWradlibToRadolanBinaryRoundtrip(unittest.TestCase):
                     )
                 except TypeError:
                     assert metadata_actual[key] == metadata_reference[key]
+
+
+class TestWriteToRadolanBinFiles(unittest.TestCase):
+    def test_RW(self):
+        fn_radolan_files = sorted(get_test_data_for_product("RW"))
+        data_list, metadata_list = [], []
+        for fn_radolan_file in fn_radolan_files:
+            data, metadata = radolan_to_netcdf.read_in_one_bin_file(fn_radolan_file)
+            data_list.append(data)
+            metadata_list.append(metadata)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fn_list = [
+                os.path.join(tmp_dir, "batch_%02d.bin" % i)
+                for i in range(len(data_list))
+            ]
+            wradlib_to_radolan_bin.write_to_radolan_bin_files(
+                fn_list=fn_list,
+                data=np.stack(data_list),
+                metadata_list=metadata_list,
+                max_workers=2,
+            )
+
+            for fn, fn_radolan_file, data, metadata in zip(
+                fn_list, fn_radolan_files, data_list, metadata_list
+            ):
+                fn_single = os.path.join(tmp_dir, "single.bin")
+                wradlib_to_radolan_bin.write_to_radolan_bin_file(
+                    fn_single, data, metadata
+                )
+                with open(fn, "rb") as f_batch, open(fn_single, "rb") as f_single:
+                    assert f_batch.read() == f_single.read()
+
+                data_actual, metadata_actual = radolan_to_netcdf.read_in_one_bin_file(
+                    fn
+                )
+                np.testing.assert_almost_equal(data_actual, data)
+                assert metadata_actual["datetime"] == metadata["datetime"]
+
+    def test_length_mismatch_error(self):
+        with self.assertRaises(ValueError):
+            wradlib_to_radolan_bin.write_to_radolan_bin_files(
+                fn_list=["a.bin", "b.bin"],
+                data=np.zeros((1, 900, 900)),
+                metadata_list=[{}],
+            )
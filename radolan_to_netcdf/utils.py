@@ -0,0 +1,83 @@
+import os
+import tempfile
+import contextlib
+import collections
+
+
+def ordered_bounded_map(executor, func, iterable, max_in_flight):
+    """Map `func` over `iterable` in `executor` with a bounded number of tasks
+
+    In contrast to `executor.map`, which submits all tasks at once, only
+    `max_in_flight` tasks are pending at any time. Results are yielded in
+    the order of `iterable`, independent of the order in which the
+    tasks finish.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+    func : callable
+    iterable : iterable
+    max_in_flight : int
+        Maximum number of submitted tasks whose results have not yet
+        been consumed. This bounds the memory used for decoded data.
+
+    Yields
+    ------
+    The results of `func` in the order of `iterable`
+
+    """
+    pending = collections.deque()
+    for item in iterable:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def save_atomic(fn, write):
+    """Write to a unique temporary file which then replaces `fn`
+
+    Several processes can write the same file, each to its own temporary
+    file, and readers never see a partially written file.
+    """
+    fd, fn_tmp = tempfile.mkstemp(
+        dir=os.path.dirname(fn), prefix=os.path.basename(fn) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(fn_tmp, fn)
+    except BaseException:
+        if os.path.exists(fn_tmp):
+            os.remove(fn_tmp)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(fn_lock):
+    """Hold an exclusive lock on the file `fn_lock` while in the context
+
+    The lock file is created if it does not exist. The lock is released
+    by the operating system if the process dies, so that no stale lock
+    remains.
+    """
+    with open(fn_lock, "a+b") as fh:
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import fnmatch
+import asyncio
+import logging
+import datetime
+import collections
+import concurrent.futures
+
+from .sync import IndexedRadolanNetCDFWriter, read_in_one_bin_file_with_info
+from .utils import save_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class IngestMetrics(object):
+    """Counters and ingest lag of `watch_directory`
+
+    The ingest lag of a file is the time from its last modification, i.e.
+    its arrival in the watched directory, until its data is written and
+    synced to the NetCDF file.
+
+    Parameters
+    ----------
+    n_lags : int, optional
+        Number of most recent ingest lags used for the statistics
+
+    """
+
+    def __init__(self, n_lags=1000):
+        self.n_written = 0
+        self.n_duplicates = 0
+        self.n_errors = 0
+        self.lags = collections.deque(maxlen=n_lags)
+        self.last_datetime = None
+        self.last_ingest_time = None
+
+    def record(self, lag, data_datetime):
+        """Record the ingest of one time step with its lag in seconds"""
+        self.n_written += 1
+        self.lags.append(lag)
+        if self.last_datetime is None or data_datetime > self.last_datetime:
+            self.last_datetime = data_datetime
+        self.last_ingest_time = time.time()
+
+    def as_dict(self):
+        """Get all metrics as JSON serializable dict"""
+        lags = list(self.lags)
+        return {
+            "n_written": self.n_written,
+            "n_duplicates": self.n_duplicates,
+            "n_errors": self.n_errors,
+            "last_ingest_lag_s": lags[-1] if lags else None,
+            "mean_ingest_lag_s": sum(lags) / len(lags) if lags else None,
+            "max_ingest_lag_s": max(lags) if lags else None,
+            "last_datetime": (
+                self.last_datetime.isoformat() if self.last_datetime else None
+            ),
+            "last_ingest_time": (
+                datetime.datetime.fromtimestamp(
+                    self.last_ingest_time, datetime.timezone.utc
+                ).isoformat()
+                if self.last_ingest_time
+                else None
+            ),
+        }
+
+
+async def watch_directory(
+    directory,
+    fn_netcdf,
+    product_name,
+    pattern="*",
+    poll_interval=1.0,
+    workers=1,
+    fn_index=None,
+    fn_metrics=None,
+    metrics=None,
+    stop_event=None,
+):
+    """Ingest RADOLAN files arriving in a directory until stopped
+
+    The directory is polled every `poll_interval` seconds. A file is
+    ingested once its size and modification time did not change between
+    two polls, so that files which are still being written are not read.
+    The files are decoded by a process pool and written via an
+    `IndexedRadolanNetCDFWriter`, which stays open and is flushed after
+    each batch of files. Hence, the time from the arrival of a file until
+    its data can be read from the NetCDF is about two poll intervals plus
+    the time for decoding and writing. Files which were already ingested,
+    also by `sync_files` or a previous run, are skipped.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to which the RADOLAN binary files are delivered
+    fn_netcdf : str
+        Filename of the NetCDF file, which is created if it does not exist
+    product_name : str
+        The two-character RADOLAN product name, e.g. 'RY'
+    pattern : str, optional
+        Only files whose name matches this `fnmatch` pattern are ingested
+    poll_interval : float, optional
+        Time in seconds between two polls of `directory`
+    workers : int, optional
+        Number of decoding processes
+    fn_index : str, optional
+        Filename of the JSON index, see `sync_files`
+    fn_metrics : str, optional
+        Filename of a JSON file to which `IngestMetrics.as_dict` is written
+        after each batch of files
+    metrics : IngestMetrics, optional
+        Metrics which are updated while running. A new instance is used
+        if not supplied.
+    stop_event : asyncio.Event, optional
+        Event which stops watching when set. The last batch of files is
+        completely ingested before returning.
+
+    Returns
+    -------
+
+    metrics : IngestMetrics
+
+    """
+    loop = asyncio.get_running_loop()
+    if metrics is None:
+        metrics = IngestMetrics()
+    if stop_event is None:
+        stop_event = asyncio.Event()
+
+    # State (size, mtime) of the files which were handled and of the files
+    # which were seen at the last poll, but were not handled yet. Both only
+    # keep the files which are still in the directory.
+    handled = {}
+    pending = {}
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers
+    ) as executor, IndexedRadolanNetCDFWriter(
+        fn_netcdf, product_name, fn_index=fn_index
+    ) as writer:
+        logger.info("Watching `%s` for new RADOLAN %s files", directory, product_name)
+        while not stop_event.is_set():
+            fn_states = _poll_directory(directory, pattern, writer, handled, pending)
+            if fn_states:
+                await _ingest_files(loop, executor, writer, fn_states, metrics)
+                handled.update(fn_states)
+                if fn_metrics is not None:
+                    _write_metrics(fn_metrics, metrics)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    return metrics
+
+
+def _poll_directory(directory, pattern, writer, handled, pending):
+    """Get the files which are ready for ingest with their state
+
+    `handled` and `pending` are updated in place. Files which were removed
+    from the directory are dropped from both, so that they do not grow
+    while watching for a long time. Files which are removed while polling
+    are skipped.
+    """
+    ready = {}
+    present = set()
+    previous_pending = dict(pending)
+    pending.clear()
+    for entry in os.scandir(directory):
+        if (
+            entry.name.startswith(".")
+            or not fnmatch.fnmatch(entry.name, pattern)
+            or not entry.is_file()
+        ):
+            continue
+        try:
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime_ns)
+            is_ingested = handled.get(entry.path) == state or writer.is_ingested(
+                entry.path
+            )
+        except FileNotFoundError:
+            # Moved or removed since `scandir`
+            continue
+        present.add(entry.path)
+        if is_ingested:
+            handled[entry.path] = state
+        elif previous_pending.get(entry.path) == state:
+            ready[entry.path] = state
+        else:
+            pending[entry.path] = state
+    for fn in [fn for fn in handled if fn not in present]:
+        del handled[fn]
+    return ready
+
+
+async def _ingest_files(loop, executor, writer, fn_states, metrics):
+    """Decode files in the executor and write them to the NetCDF"""
+    fn_list = sorted(fn_states)
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(executor, read_in_one_bin_file_with_info, fn)
+            for fn in fn_list
+        ],
+        return_exceptions=True,
+    )
+
+    written = []
+    for fn, result in zip(fn_list, results):
+        if isinstance(result, Exception):
+            logger.error("Could not decode `%s`: %r", fn, result)
+            metrics.n_errors += 1
+            continue
+        data, metadata, file_info = result
+        try:
+            is_written = writer.write(fn, data, metadata, file_info)
+        except ValueError as e:
+            logger.error("Could not write `%s`: %s", fn, e)
+            metrics.n_errors += 1
+            continue
+        if is_written:
+            written.append((file_info, metadata["datetime"]))
+        else:
+            logger.warning("Skipping `%s`, its time stamp was already ingested", fn)
+            metrics.n_duplicates += 1
+
+    # Writing is done in a thread, since it takes some time
+    await loop.run_in_executor(None, writer.flush)
+    t_synced = time.time()
+    for file_info, data_datetime in written:
+        lag = t_synced - file_info["mtime_ns"] / 1e9
+        metrics.record(lag, data_datetime)
+        logger.info("Ingested %s with a lag of %.2f s", data_datetime, lag)
+
+
+def _write_metrics(fn_metrics, metrics):
+    content = json.dumps(metrics.as_dict(), indent=1).encode("utf-8")
+    save_atomic(fn_metrics, lambda fh: fh.write(content))
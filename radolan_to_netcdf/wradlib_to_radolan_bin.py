@@ -1,6 +1,9 @@
 import datetime
+import concurrent.futures
 import numpy as np
 
+from .utils import ordered_bounded_map
+
 
 def metadata_to_header(metadata):
     """
@@ -21,107 +24,96 @@ def metadata_to_header(metadata):
     if metadata["producttype"] != "RW":
         raise NotImplementedError("Currently only RADOALN-RW is supported")
 
+    radar_locations = "<" + ",".join(metadata["radarlocations"]) + "> "
+
     len_header_fixed_part = 82
-    len_header_radar_locations = len("<" + ",".join(metadata["radarlocations"]) + "> ")
+    len_header_radar_locations = len(radar_locations)
 
     len_header = len_header_fixed_part + len_header_radar_locations
 
-    # Generate empty header with only whitespaces
-    header_out = np.array(
+    header_out = "".join(
         [
-            "",
+            metadata["producttype"],
+            datetime.datetime.strftime(metadata["datetime"], "%d%H%M"),
+            metadata["radarid"],
+            datetime.datetime.strftime(metadata["datetime"], "%m%y"),
+            "BY",
+            # Have to add one here to get correct length in header string.
+            # Do not know why. Maybe because of the 'etx' char
+            str(metadata["datasize"] + len_header + 1).rjust(7),
+            "VS",
+            {
+                "100 km and 128 km (mixed)": " 0",
+                "100 km": " 1",
+                "128 km": " 2",
+                "150 km": " 3",
+            }.get(metadata["maxrange"]),
+            "SW",
+            metadata["radolanversion"].rjust(9),
+            "PR",
+            {
+                0.01: " E-02",
+                0.1: " E-01",
+                1: " E-00",
+            }.get(metadata["precision"]),
+            "INT",
+            str(int(metadata["intervalseconds"] / 60)).rjust(4),
+            "GP",
+            str(metadata["nrow"]).rjust(4) + "x" + str(metadata["ncol"]).rjust(4),
+            "MF",
+            " ",
+            str(int(metadata["moduleflag"])).zfill(8),
+            "MS",
+            str(int(len_header_radar_locations)).rjust(3),
+            radar_locations,
         ]
-        * len_header,
-        dtype="S1",
-    )
-    header_out[:] = " "
-
-    # Fill header with metadata and tokens
-    header_out[0:2] = list(metadata["producttype"])
-    header_out[2:8] = list(datetime.datetime.strftime(metadata["datetime"], "%d%H%M"))
-    header_out[8:13] = list(metadata["radarid"])
-    header_out[13:17] = list(datetime.datetime.strftime(metadata["datetime"], "%m%y"))
-
-    header_out[17:19] = list("BY")
-    # Have to add one here to get correct length in header string.
-    # Do not know why. Maybe because of the 'etx' char
-    header_out[19:26] = list(str(metadata["datasize"] + len_header + 1))
-
-    header_out[26:28] = list("VS")
-    header_out[28:30] = list(
-        {
-            "100 km and 128 km (mixed)": " 0",
-            "100 km": " 1",
-            "128 km": " 2",
-            "150 km": " 3",
-        }.get(metadata["maxrange"])
-    )
-
-    header_out[30:32] = list("SW")
-    header_out[32:41] = list(metadata["radolanversion"].rjust(9))
-
-    header_out[41:43] = list("PR")
-    header_out[43:48] = list(
-        {
-            0.01: " E-02",
-            0.1: " E-01",
-            1: " E-00",
-        }.get(metadata["precision"])
-    )
-
-    header_out[48:51] = list("INT")
-    header_out[51:55] = list(str(int(metadata["intervalseconds"] / 60)).rjust(4))
-
-    header_out[55:57] = list("GP")
-    header_out[57:66] = list(
-        str(metadata["nrow"]).rjust(4) + "x" + str(metadata["ncol"]).rjust(4)
-    )
-
-    header_out[66:68] = list("MF")
-    header_out[69:77] = list(str(int(metadata["moduleflag"])).zfill(8))
-
-    header_out[77:79] = list("MS")
-    header_out[79:82] = list(str(int(len_header_radar_locations)).rjust(3))
-
-    header_out[82 : (82 + len_header_radar_locations)] = list(
-        "<" + ",".join(metadata["radarlocations"]) + "> "
     )
 
-    header_out = b"".join(header_out).decode()
-
     return header_out
 
 
-def data_to_byte_array(data, metadata):
+def data_to_byte_array(data, metadata, out=None):
     """
 
     Parameters
     ----------
-    data
-    metadata
+    data : np.ndarray
+        RADOLAN data as returned by wradlib.io.read_radolan_composite
+    metadata : dict
+        Dict of metadata as returned by wradlib.io.read_radolan_composite
+    out : np.ndarray, optional
+        Preallocated flat `uint16` array of the size of `data` which is
+        used for encoding. Supply this when encoding many time steps to
+        avoid allocating a new array for each of them.
 
     Returns
     -------
 
+    byte_str : byte string
+        Data and flags encoded as in RADOLAN binary files
+
     """
 
-    if metadata["producttype"] != "RW":
-        raise NotImplementedError("Currently only RADOALN-RW is supported")
+    return _encode_data(data, metadata, out=out).tobytes()
 
-    arr = (data / metadata["precision"]).flatten().astype(np.uint16)
 
-    secondary = np.zeros_like(arr, dtype=np.uint16)
-    secondary[metadata["secondary"]] = 0x1000
+def _encode_data(data, metadata, out=None):
+    if metadata["producttype"] != "RW":
+        raise NotImplementedError("Currently only RADOALN-RW is supported")
 
-    nodatamask = np.zeros_like(arr, dtype=np.uint16)
-    nodatamask[metadata["nodatamask"]] = 0b0010100111000100
+    if out is None:
+        out = np.empty(data.size, dtype=np.uint16)
 
-    cluttermask = np.zeros_like(arr, dtype=np.uint16)
-    cluttermask[metadata["cluttermask"]] = 0x8000
+    # Scale and cast directly into `out`. NaNs are cast to 0 and the
+    # corresponding pixels get their value from the `nodatamask` bits below.
+    with np.errstate(invalid="ignore"):
+        np.divide(data.ravel(), metadata["precision"], out=out, casting="unsafe")
 
-    arr = arr | secondary | nodatamask | cluttermask
+    out[metadata["secondary"]] |= 0x1000
+    out[metadata["nodatamask"]] |= 0b0010100111000100
+    out[metadata["cluttermask"]] |= 0x8000
 
-    return arr.tobytes()
+    return out
 
 
 def write_to_radolan_bin_file(fn, data, metadata):
@@ -138,10 +130,59 @@ def write_to_radolan_bin_file(fn, data, metadata):
 
     """
 
-    data_as_byte_str = data_to_byte_array(data, metadata)
-    header_as_byte_str = metadata_to_header(metadata)
+    _write_file((fn, _file_content(data, metadata)))
+
+
+def write_to_radolan_bin_files(fn_list, data, metadata_list, max_workers=4):
+    """Write many time steps to RADOLAN binary files
+
+    The time steps are encoded one after another using one preallocated
+    buffer and the resulting files are written to disk by a thread pool.
+
+    Parameters
+    ----------
+    fn_list : list of str
+        Filenames, one per time step
+    data : np.ndarray or list of np.ndarray
+        RADOLAN data with shape (time, y, x)
+    metadata_list : list of dict
+        Dicts of metadata as returned by wradlib.io.read_radolan_composite,
+        one per time step
+    max_workers : int, optional
+        Number of threads writing the files
+
+    """
+
+    if not len(fn_list) == len(data) == len(metadata_list):
+        raise ValueError(
+            "`fn_list`, `data` and `metadata_list` must have the same length"
+        )
+    if len(fn_list) == 0:
+        return
+
+    buffer = np.empty(data[0].size, dtype=np.uint16)
+    file_contents = (
+        (fn, _file_content(data_i, metadata, out=buffer))
+        for fn, data_i, metadata in zip(fn_list, data, metadata_list)
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in ordered_bounded_map(
+            executor, _write_file, file_contents, max_in_flight=2 * max_workers
+        ):
+            pass
+
+
+def _file_content(data, metadata, out=None):
+    return b"".join(
+        [
+            metadata_to_header(metadata).encode(),
+            b"\x03",
+            data_to_byte_array(data, metadata, out=out),
+        ]
+    )
+
 
+def _write_file(fn_and_content):
+    fn, content = fn_and_content
     with open(fn, mode="wb") as f:
-        f.write(header_as_byte_str.encode())
-        f.write(b"\x03")
-        f.write(data_as_byte_str)
+        f.write(content)
@@ -17,6 +17,15 @@ requirements = [
     "numpy",
 ]
 
+# Optional dependencies, e.g. `pip install radolan_to_netcdf[zarr]`
+extras_requirements = {
+    "zarr": ["zarr>=3"],
+    "dask": ["dask[array]"],
+    "xarray": ["xarray"],
+    "h5py": ["h5py"],
+    "extract": ["scipy"],
+}
+
 setup_requirements = []
 
 test_requirements = []
@@ -29,16 +38,21 @@ setup(
         "Intended Audience :: Developers",
         "License :: OSI Approved :: BSD License",
         "Natural Language :: English",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.4",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
     ],
     description="Python package to parser RADOLAN binary data files to NetCDF",
+    entry_points={
+        "console_scripts": ["radolan-to-netcdf=radolan_to_netcdf.cli:main"],
+    },
     install_requires=requirements,
+    # asyncio.run and datetime.fromisoformat are used
+    python_requires=">=3.7",
+    extras_require=extras_requirements,
     license="BSD license",
     long_description=readme + "\n\n" + history,
     include_package_data=True,